@@ -1,8 +1,12 @@
 import streamlit as st
-from workflow import create_workflow
+from workflow import get_workflow
+from catalog import get_catalog
+from streaming import stream_order_events
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 from logger_config import logger
+from config import METRICS_PORT, METRICS_HOST
+from metrics import start_http_server, timer
 
 
 def init_session_state():
@@ -110,7 +114,10 @@ def main():
 
     init_session_state()
     load_dotenv()
-    agent = create_workflow()
+    get_catalog().start_watcher()
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT, METRICS_HOST)
+    agent = get_workflow()
 
     # Page Header
     with st.container():
@@ -150,6 +157,9 @@ def main():
                     <div style="font-size: 0.9rem;">
                         <code>I want to place an order for item_XX, quantity Y, my customer id is customer_ZZ</code>
                     </div>
+                    <div style="font-size: 0.9rem; margin-top: 0.5rem;">
+                        <code>I want to place an order for item_XX x2, item_YY x1, my customer id is customer_ZZ</code>
+                    </div>
                     <div style="font-size: 0.9rem; margin-top: 0.5rem;">
                         <code>Cancel order 223</code>
                     </div>
@@ -178,7 +188,6 @@ def main():
                             messages_dict = {"messages": [human_message]}
 
                             response_received = False
-                            seen_messages = set()  # Track unique messages
 
                             with col2:
                                 with st.container():
@@ -189,27 +198,36 @@ def main():
 
                                     with st.spinner("🔍 Validating transaction..."):
                                         response_received = False
-                                        for chunk in agent.stream(messages_dict, stream_mode="values"):
-                                            if 'messages' in chunk and chunk['messages']:
-                                                last_message = chunk['messages'][-1]
-                                                if hasattr(last_message, 'content'):
-                                                    message_hash = hash(
-                                                        f"{last_message.content}")  # Create unique hash for message
-                                                    if message_hash not in seen_messages:  # Only process new messages
-                                                        seen_messages.add(message_hash)
-                                                        response_received = True
-                                                        try:
-                                                            import json
-                                                            content = json.loads(last_message.content)
-                                                            formatted_content = json.dumps(content, indent=2)
-                                                        except:
-                                                            formatted_content = last_message.content
-
-                                                        st.session_state.messages.append(
-                                                            ("assistant", formatted_content))
-                                                        display_chat_message("assistant", formatted_content,
-                                                                             response_container
-                                                        )
+                                        status_container = response_container.container()
+                                        stage_lines = {}
+                                        live_reply = response_container.empty()
+                                        partial = ""
+                                        for event in stream_order_events(agent, messages_dict):
+                                            with timer("app_render_seconds", event=event["type"]):
+                                                if event["type"] == "token":
+                                                    # Show the model's reply as it is generated
+                                                    partial += event["text"]
+                                                    live_reply.code(partial)
+                                                elif event["type"] == "route":
+                                                    # The category streamed first; the stage event confirms it
+                                                    if "Route" not in stage_lines:
+                                                        stage_lines["Route"] = status_container.empty()
+                                                    stage_lines["Route"].markdown(f"⏳ **Route** — {event['category']}")
+                                                elif event["type"] == "stage":
+                                                    partial = ""
+                                                    live_reply.empty()
+                                                    if event["stage"] not in stage_lines:
+                                                        stage_lines[event["stage"]] = status_container.empty()
+                                                    icon = "❌" if event["error"] else "✅"
+                                                    detail = f" — {event['error']}" if event["error"] else ""
+                                                    stage_lines[event["stage"]].markdown(
+                                                        f"{icon} **{event['stage']}**{detail}"
+                                                    )
+                                                else:
+                                                    response_received = True
+                                                    st.session_state.messages.append(("assistant", event["content"]))
+                                                    display_chat_message("assistant", event["content"],
+                                                                         response_container)
 
                                         if not response_received:
                                             st.error("⚠️ Transaction validation failed")
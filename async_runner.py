@@ -0,0 +1,53 @@
+import asyncio
+from typing import Dict, Any, List, Iterable, Optional
+
+from langchain_core.messages import HumanMessage
+
+from config import ORDER_CONCURRENCY, ORDER_LLM_BUDGET
+from logger_config import logger
+from resilience import order_config
+from workflow import get_workflow
+
+
+async def _run_order(agent, query: str) -> Dict[str, Any]:
+    """Drive one request through the async graph and collect its final state."""
+    try:
+        final_state = await agent.ainvoke({"messages": [HumanMessage(content=query)]},
+                                          config=order_config(ORDER_LLM_BUDGET))
+        order_state = final_state.get("order_state")
+        return {
+            "query": query,
+            "messages": final_state.get("messages", []),
+            "order_state": order_state.as_dict() if order_state is not None else None,
+            "error": final_state.get("error")
+        }
+    except Exception as e:
+        logger.exception(f"Error running order asynchronously: {str(e)}")
+        return {"query": query, "messages": [], "order_state": None, "error": str(e)}
+
+
+async def run_orders(queries: Iterable[str], concurrency: Optional[int] = None, agent=None) -> List[Dict[str, Any]]:
+    """Run requests through the async graph keeping at most `concurrency` orders in flight.
+
+    Results are returned in the same order as the input queries.
+    """
+    concurrency = concurrency or ORDER_CONCURRENCY
+    agent = agent or get_workflow(async_mode=True)
+    queries = list(queries)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    pending = iter(enumerate(queries))
+
+    async def worker():
+        # The shared iterator hands each query to exactly one worker
+        for index, query in pending:
+            results[index] = await _run_order(agent, query)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(queries)))]
+    await asyncio.gather(*workers)
+    logger.info(f"Processed {len(queries)} orders with concurrency {concurrency}")
+    return results
+
+
+def run_orders_sync(queries: Iterable[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Blocking wrapper around run_orders for callers without an event loop."""
+    return asyncio.run(run_orders(queries, concurrency))
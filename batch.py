@@ -0,0 +1,224 @@
+import datetime
+import uuid
+from functools import reduce
+from typing import Dict, Any, List
+
+import pandas as pd
+
+from config import BATCH_MAX_CONCURRENCY
+from logger_config import logger
+from llm_cache import extraction_cache
+from order_parser import fast_parse_order
+from state_manager import state_manager
+from inventory_engine import get_inventory_engine
+from catalog import get_catalog
+from tools import cancel_by_id, cancel_stats, TOOL_LOOP_LLM_CALLS
+from prompts import CATEGORIZE_PROMPT
+from extraction import OrderExtraction, extract, get_order_extractor
+from order_record import order_lines
+from state import merge_errors
+from shipping import format_cents, get_shipping_engine
+from nodes import CATEGORIZE_PROMPT_VERSION, _missing_items_error, _stock_error, _validate_extraction
+
+
+def _extract_batch(queries: List[str]) -> List[Any]:
+    """Extract every query, sending only fast-path and cache misses to one llm.batch call.
+
+    Each entry of the result is either the parsed dict or the exception raised for it.
+    """
+    extracted: List[Any] = [None] * len(queries)
+    pending = []
+    for index, query in enumerate(queries):
+        if not query or not query.strip():
+            extracted[index] = ValueError("Empty query received")
+            continue
+        data = fast_parse_order(query) or extraction_cache.get(CATEGORIZE_PROMPT_VERSION, query)
+        if data is None:
+            pending.append(index)
+        else:
+            extracted[index] = data
+
+    if pending:
+        logger.debug("Sending %d of %d batch queries to the LLM", len(pending), len(queries))
+        extractor = get_order_extractor()
+        prompts = [CATEGORIZE_PROMPT.messages(text=queries[index]) for index in pending]
+        replies = extractor.batch(prompts, config={"max_concurrency": BATCH_MAX_CONCURRENCY}, return_exceptions=True)
+        for index, prompt, reply in zip(pending, prompts, replies):
+            if isinstance(reply, Exception):
+                extracted[index] = reply
+                continue
+            try:
+                # Replies that do not match the schema are retried one at a time
+                data = extract(extractor, prompt, OrderExtraction, reply=reply)
+            except Exception as e:
+                extracted[index] = e
+                continue
+            extraction_cache.set(CATEGORIZE_PROMPT_VERSION, queries[index], data)
+            extracted[index] = data
+
+    for index, data in enumerate(extracted):
+        if isinstance(data, dict):
+            try:
+                _validate_extraction(data)
+            except ValueError as e:
+                extracted[index] = e
+
+    return extracted
+
+
+def _process_place_orders(orders: pd.DataFrame) -> pd.DataFrame:
+    """Run the inventory, shipping and payment stages over all PlaceOrder rows at once.
+
+    Orders are spread into one row per line (a single-item order is one
+    line) so weights and checks are computed across every line of the batch
+    together, then gathered back to one row per order.
+    """
+    tables = get_catalog().current()
+    inventory_engine = get_inventory_engine()
+    lines = orders[["order_id", "lines"]].explode("lines", ignore_index=True)
+    lines["item_id"] = lines["lines"].str[0]
+    lines["quantity"] = pd.to_numeric(lines["lines"].str[1], errors="coerce")
+    lines = lines.merge(tables.inventory_df[["item_id", "weight"]], on="item_id", how="left")
+    lines["invalid_quantity"] = lines["quantity"].isna() | (lines["quantity"] <= 0)
+    lines["missing_item"] = lines["weight"].isna()
+    lines["line_weight"] = lines["weight"] * lines["quantity"]
+
+    by_order = lines.groupby("order_id", sort=False)
+    merged = orders.set_index("order_id").join(by_order[["invalid_quantity", "missing_item"]].any())
+    merged["total_weight"] = by_order["line_weight"].sum()
+    missing_items = lines[lines["missing_item"]].groupby("order_id", sort=False)["item_id"].agg(list)
+    merged = merged.reset_index()
+
+    invalid_quantity = merged["invalid_quantity"]
+    missing_item = merged["missing_item"]
+    unknown_customer = ~merged["customer_id"].isin(tables.customers_df["customer_id"])
+
+    # Reserve stock for every order that passed the other checks: single items in one critical
+    # section, carts all-or-nothing each
+    lines_valid = ~(invalid_quantity | missing_item)
+    candidates = lines_valid & ~unknown_customer
+    single = merged["lines"].str.len() == 1
+    reserved = pd.Series(False, index=merged.index)
+    if (candidates & single).any():
+        reserved[candidates & single] = inventory_engine.reserve_batch(
+            merged.loc[candidates & single, "order_id"].tolist(),
+            merged.loc[candidates & single, "lines"].str[0].str[0].tolist(),
+            merged.loc[candidates & single, "lines"].str[0].str[1].astype(int).tolist()
+        )
+    stock_errors = {}
+    for index in merged.index[candidates & ~single]:
+        order_id, order_lines = merged.at[index, "order_id"], merged.at[index, "lines"]
+        short = inventory_engine.reserve_lines(order_id, [item_id for item_id, _ in order_lines],
+                                               [quantity for _, quantity in order_lines])
+        reserved[index] = not short
+        if short:
+            stock_errors[index] = _stock_error(order_lines, short)
+    insufficient = candidates & ~reserved
+    for index in merged.index[insufficient & single]:
+        ((item_id, quantity),) = merged.at[index, "lines"]
+        stock_errors[index] = _stock_error([(item_id, quantity)], {item_id: inventory_engine.available(item_id)})
+    # The graph checks stock alongside the customer, so an unknown customer's order still reports a
+    # shortfall; nothing is held for it
+    for index in merged.index[lines_valid & unknown_customer]:
+        order_lines = merged.at[index, "lines"]
+        available = {item_id: inventory_engine.available(item_id) for item_id, _ in order_lines}
+        short = {item_id: available[item_id] for item_id, quantity in order_lines if available[item_id] < quantity}
+        if short:
+            stock_errors[index] = _stock_error(order_lines, short)
+
+    # One error per stage, joined as the graph merges its parallel stages: LangGraph applies their
+    # writes in node-name order (CheckInventory, ComputeShipping, ValidateCustomer)
+    errors = []
+    for index, order_id, customer_id in zip(merged.index, merged["order_id"], merged["customer_id"]):
+        inventory_error = shipping_error = customer_error = None
+        if invalid_quantity[index]:
+            inventory_error, shipping_error = ("Missing item_id or quantity in order state",
+                                               "Missing order details for shipping")
+        elif missing_item[index]:
+            inventory_error = shipping_error = _missing_items_error(missing_items[order_id])
+        else:
+            inventory_error = stock_errors.get(index)
+        if pd.isna(customer_id):
+            customer_error = "Missing customer_id in order state"
+        elif unknown_customer[index]:
+            customer_error = f"Customer {customer_id} not found"
+        errors.append(reduce(merge_errors, (inventory_error, shipping_error, customer_error), None))
+    merged["error"] = errors
+
+    for order_id in merged.loc[reserved, "order_id"]:
+        inventory_engine.commit(order_id)
+
+    # Price every order in one call; failed orders have no weight and are priced at zero
+    merged["shipping_cents"] = get_shipping_engine().quote_batch(
+        merged["location"].tolist(), merged["total_weight"].fillna(0).to_numpy()
+    )
+    merged["shipping_cost"] = merged["shipping_cents"].map(format_cents)
+    merged["payment_status"] = merged["error"].isna().map({True: "Success", False: None})
+    return merged
+
+
+def process_order_batch(queries: List[str]) -> List[Dict[str, Any]]:
+    """Process a burst of order requests and return one result per request, in order.
+
+    Successful results carry the same order details as the per-message workflow
+    and are stored in the state manager; failures carry an error message.
+    """
+    results: List[Dict[str, Any]] = [{"query": query} for query in queries]
+    extracted = _extract_batch(queries)
+
+    place_rows = []
+    for index, data in enumerate(extracted):
+        if isinstance(data, Exception):
+            results[index].update({"status": "error", "error": f"Error processing query: {str(data)}"})
+        elif data.get("category") == "PlaceOrder":
+            place_rows.append({
+                "position": index,
+                "order_id": str(uuid.uuid4()),
+                "customer_id": data.get("customer_id"),
+                "lines": order_lines(data),
+                "cart": bool(data.get("lines")),
+                "location": data.get("location", "domestic")
+            })
+        elif data.get("category") == "CancelOrder":
+            # The extraction already named the order, so no cancellation LLM call is needed
+            outcome = cancel_by_id({"order_id": data.get("cancel_order_id")})
+            cancel_stats.record(direct=True, calls_avoided=TOOL_LOOP_LLM_CALLS)
+            if "error" in outcome:
+                results[index].update({"status": "error", "error": outcome["error"]})
+            else:
+                results[index].update({"status": "success", "order": outcome})
+        else:
+            results[index].update({"status": "error", "error": f"Unknown category: {data.get('category')}"})
+
+    if place_rows:
+        processed = _process_place_orders(pd.DataFrame(place_rows))
+        timestamp = datetime.datetime.now().isoformat()
+        for row in processed.itertuples(index=False):
+            if row.error is not None:
+                results[row.position].update({"status": "error", "error": row.error})
+                continue
+
+            response_details = {
+                "status": "Order Successfully Placed",
+                "order_id": row.order_id,
+                "customer_id": row.customer_id
+            }
+            if row.cart:
+                response_details["lines"] = [{"item_id": item_id, "quantity": int(quantity)}
+                                             for item_id, quantity in row.lines]
+            else:
+                response_details["item_id"], response_details["quantity"] = row.lines[0][0], int(row.lines[0][1])
+            response_details.update({
+                "location": row.location,
+                "shipping_cost": row.shipping_cost,
+                "payment_status": row.payment_status
+            })
+            state_manager.archive_state(row.order_id, {
+                "order_state": response_details,
+                "timestamp": timestamp
+            })
+            results[row.position].update({"status": "success", "order": response_details})
+
+    logger.info(f"Processed batch of {len(queries)} requests, "
+                f"{sum(result['status'] == 'success' for result in results)} succeeded")
+    return results
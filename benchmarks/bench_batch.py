@@ -0,0 +1,55 @@
+"""Throughput of the batch intake API against the per-message workflow.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch --orders 500
+"""
+import argparse
+import time
+
+from langchain_core.messages import HumanMessage
+
+from batch import process_order_batch
+from workflow import create_workflow
+
+
+def make_queries(count: int):
+    items = ["item_201", "item_202", "item_203", "item_204"]
+    customers = ["customer_101", "customer_102", "customer_103", "customer_104"]
+    return [
+        f"I want to place an order for {items[i % len(items)]}, quantity 1, "
+        f"my customer id is {customers[i % len(customers)]}"
+        for i in range(count)
+    ]
+
+
+def bench_per_message(queries):
+    agent = create_workflow()
+    start = time.perf_counter()
+    for query in queries:
+        for _ in agent.stream({"messages": [HumanMessage(content=query)]}, stream_mode="values"):
+            pass
+    return time.perf_counter() - start
+
+
+def bench_batch(queries):
+    start = time.perf_counter()
+    process_order_batch(queries)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=500)
+    args = parser.parse_args()
+
+    queries = make_queries(args.orders)
+    per_message = bench_per_message(queries)
+    batched = bench_batch(queries)
+    print(f"per-message: {args.orders / per_message:,.0f} orders/s ({per_message:.3f}s)")
+    print(f"batch:       {args.orders / batched:,.0f} orders/s ({batched:.3f}s)")
+    print(f"speedup:     {per_message / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cart orders against the same items ordered one request at a time.
+
+For carts of 1 to --max-lines items (the catalog's items, so at most its
+size) this times one cart order through the graph against one single-item
+order per line, both on the fast path and through the fake LLM with
+--latency seconds per call. A second table times the inventory engine
+alone: reserve_lines for a cart against one reserve call per line, over a
+synthetic table large enough for --engine-lines. Run from the repository
+root:
+
+    python -m benchmarks.bench_cart --orders 200 --latency 0.05
+"""
+import argparse
+import itertools
+import logging
+import os
+import time
+
+CUSTOMER = "customer_101"
+# Makes each LLM-path text unique, so the extraction cache never answers it
+REFERENCES = itertools.count()
+
+
+def cart_text(items, fast: bool) -> str:
+    lines = ", ".join(f"{item_id} x1" for item_id in items)
+    if fast:
+        return f"I want to place an order for {lines}, my customer id is {CUSTOMER}"
+    return f"Hi, {CUSTOMER} here, please send me {lines} (ref r{next(REFERENCES)})"
+
+
+def single_text(item_id: str, fast: bool) -> str:
+    if fast:
+        return f"I want to place an order for {item_id}, quantity 1, my customer id is {CUSTOMER}"
+    return f"Hi, {CUSTOMER} here, please send me 1 of {item_id} (ref r{next(REFERENCES)})"
+
+
+def per_order_ms(agent, texts_per_order, orders: int) -> float:
+    from langchain_core.messages import HumanMessage
+    start = time.perf_counter()
+    for _ in range(orders):
+        for text in texts_per_order():
+            result = agent.invoke({"messages": [HumanMessage(content=text)]})
+            if result.get("error"):
+                raise RuntimeError(result["error"])
+    return (time.perf_counter() - start) / orders * 1000
+
+
+def engine_us(lines: int, repeat: int) -> tuple:
+    from inventory_engine import InventoryEngine
+    item_ids = [f"item_{number}" for number in range(lines)]
+    engine = InventoryEngine.from_items(item_ids, [10 ** 12] * lines)
+    quantities = [1] * lines
+
+    start = time.perf_counter()
+    for number in range(repeat):
+        engine.reserve_lines(f"cart-{number}", item_ids, quantities)
+    cart = (time.perf_counter() - start) / repeat * 1e6
+
+    start = time.perf_counter()
+    for number in range(repeat):
+        for item_id in item_ids:
+            engine.reserve(f"single-{number}-{item_id}", item_id, 1)
+    single = (time.perf_counter() - start) / repeat * 1e6
+    return cart, single
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--llm-orders", type=int, default=10)
+    parser.add_argument("--latency", default="0.05", help="fake LLM delay per call")
+    parser.add_argument("--max-lines", type=int, default=10)
+    parser.add_argument("--engine-lines", type=int, default=1000)
+    args = parser.parse_args()
+
+    # config reads the provider on first import, so project modules are imported only after this
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = args.latency
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+
+    import workflow
+    from catalog import get_catalog
+    from inventory_engine import get_inventory_engine
+    from logger_config import logger
+
+    # Measure the orders, not the debug log handlers; keep every order in stock
+    logger.setLevel(logging.WARNING)
+    items = sorted(get_catalog().current().inventory)[:args.max_lines]
+    get_inventory_engine().apply_stock({item_id: 10 ** 9 for item_id in items})
+    agent = workflow.create_workflow()
+
+    sizes = sorted({size for size in (1, 2, 5, 10, 20, 50) if size <= len(items)} | {len(items)})
+    print(f"{'lines':>5}{'fast cart ms':>14}{'fast singles ms':>17}{'llm cart ms':>13}{'llm singles ms':>16}")
+    for size in sizes:
+        cart_items = items[:size]
+        fast_cart = per_order_ms(agent, lambda: [cart_text(cart_items, True)], args.orders)
+        fast_singles = per_order_ms(agent, lambda: [single_text(item_id, True) for item_id in cart_items], args.orders)
+        llm_cart = per_order_ms(agent, lambda: [cart_text(cart_items, False)], args.llm_orders)
+        llm_singles = per_order_ms(agent, lambda: [single_text(item_id, False) for item_id in cart_items],
+                                   args.llm_orders)
+        print(f"{size:>5}{fast_cart:>14.2f}{fast_singles:>17.2f}{llm_cart:>13.1f}{llm_singles:>16.1f}")
+
+    print(f"\n{'lines':>5}{'reserve_lines us':>18}{'reserve per line us':>21}")
+    for size in sorted({1, 10, 100, args.engine_lines}):
+        cart, single = engine_us(size, max(10, 20000 // size))
+        print(f"{size:>5}{cart:>18.1f}{single:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
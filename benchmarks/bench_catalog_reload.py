@@ -0,0 +1,46 @@
+"""Catalog reload time against catalog size.
+
+Generates inventory files of increasing size, edits 1% of the rows and times
+Catalog.reload(). Run from the repository root:
+
+    python -m benchmarks.bench_catalog_reload --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from catalog import Catalog, CUSTOMERS_PATH
+
+
+def write_inventory(path, rows, bump_every=None):
+    with open(path, "w") as inventory_file:
+        inventory_file.write("item_id,name,stock,weight,price\n")
+        for number in range(rows):
+            stock = 10 + (1 if bump_every and number % bump_every == 0 else 0)
+            inventory_file.write(f"item_{number},Item {number},{stock},1.0,9.99\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    for rows in args.sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            inventory_path = os.path.join(directory, "inventory.csv")
+            write_inventory(inventory_path, rows)
+            catalog = Catalog(inventory_path, CUSTOMERS_PATH)
+            write_inventory(inventory_path, rows, bump_every=100)
+            start = time.perf_counter()
+            catalog.reload()
+            elapsed = time.perf_counter() - start
+            print(f"{rows:>10,} rows: reload in {elapsed * 1000:8.1f} ms")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Catalog startup time: CSV parsing versus the compiled memory-mapped tables.
+
+For each size this times the original load (read_csv + set_index().T.to_dict()),
+the one-off compile, a warm start that only maps the compiled file, and
+point lookups against the mapped table. Run from the repository root:
+
+    python -m benchmarks.bench_catalog_startup --sizes 10000 1000000 10000000
+
+The transpose-based load is skipped above --max-dict-rows since it needs
+several GB of memory at that scale.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from catalog_store import load_table
+
+
+def write_inventory(path, rows):
+    frame = pd.DataFrame({
+        "item_id": [f"item_{number}" for number in range(rows)],
+        "name": [f"Item {number}" for number in range(rows)],
+        "stock": 10,
+        "weight": 1.0,
+        "price": 9.99
+    })
+    frame.to_csv(path, index=False)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--max-dict-rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    for rows in args.sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            csv_path = os.path.join(directory, "inventory.csv")
+            cache_dir = os.path.join(directory, "cache")
+            write_inventory(csv_path, rows)
+
+            if rows <= args.max_dict_rows:
+                dict_time, _ = timed(lambda: pd.read_csv(csv_path).set_index("item_id").T.to_dict())
+                dict_label = f"{dict_time:8.3f}s"
+            else:
+                dict_label = "  skipped"
+            compile_time, _ = timed(lambda: load_table(csv_path, "item_id", cache_dir))
+            open_time, (table, _) = timed(lambda: load_table(csv_path, "item_id", cache_dir))
+
+            keys = [f"item_{random.randrange(rows)}" for _ in range(10000)]
+            lookup_time, _ = timed(lambda: [table[key] for key in keys])
+            print(f"{rows:>11,} rows: csv+dict {dict_label}  compile {compile_time:8.3f}s  "
+                  f"mapped start {open_time * 1000:7.2f}ms  lookup {lookup_time / len(keys) * 1e6:6.2f}us")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Secondary-index query cost as the order store grows.
+
+For each store size this fills a fresh StateManager with orders spread over
+size/20 customers and size/100 items (so each customer and item keeps the
+same number of orders at every size), then times index-backed queries
+against a full scan of the store. Run from the repository root:
+
+    python -m benchmarks.bench_indexes --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+import uuid
+
+from order_record import OrderRecord
+from state_manager import StateManager, STRIPE_COUNT
+
+
+def filled_manager(size: int):
+    # Bypass the singleton and raise the limits so every order stays live
+    manager = object.__new__(StateManager)
+    manager._init_storage(STRIPE_COUNT, max_live=size * 2, max_archived=size * 2, max_age=float("inf"))
+    customers = max(1, size // 20)
+    items = max(1, size // 100)
+    start = time.perf_counter()
+    for number in range(size):
+        order_id = str(uuid.uuid4())
+        manager.set_state(order_id, {"order_state": OrderRecord(
+            order_id=order_id,
+            customer_id=f"customer_{number % customers}",
+            item_id=f"item_{number % items}",
+            quantity=1 + number % 3,
+            payment_status="Success" if number % 4 else None
+        )})
+    # Writes are indexed in a batch by the next query; count that work as part of the writes
+    manager.unit_count("item_0")
+    return manager, customers, items, size / (time.perf_counter() - start)
+
+
+def scan_last_order(manager, customer_id):
+    """What the store needed before the indexes: look at every order."""
+    newest = None
+    for stripe in manager._stripes:
+        for order_id, state in stripe.states.items():
+            if state["order_state"].customer_id == customer_id:
+                created = stripe.index.created[order_id]
+                if newest is None or created > newest[0]:
+                    newest = (created, order_id)
+    return newest
+
+
+def per_call_us(function, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'orders':>10} {'writes/s':>10} {'last_order':>11} {'by item':>9} {'unit_count':>11} "
+          f"{'last 1000':>10} {'full scan':>11}")
+    for size in args.sizes:
+        manager, customers, items, write_rate = filled_manager(size)
+        customer_ids = [f"customer_{random.randrange(customers)}" for _ in range(args.queries)]
+        item_ids = [f"item_{random.randrange(items)}" for _ in range(args.queries)]
+
+        last_order = per_call_us(manager.last_order, customer_ids)
+        by_item = per_call_us(lambda item_id: manager.find_orders(item_id=item_id, status="pending"), item_ids)
+        units = per_call_us(manager.unit_count, item_ids)
+        newest_time = max(stripe.index._times[-1] for stripe in manager._stripes if stripe.index._times)
+        recent_since = sorted(
+            created for stripe in manager._stripes for created in stripe.index._times[-1000:]
+        )[-1000] if size >= 1000 else None
+        recent = per_call_us(lambda _: manager.find_orders(since=recent_since, until=newest_time), range(50))
+        scan = per_call_us(lambda customer_id: scan_last_order(manager, customer_id), customer_ids[:5])
+        print(f"{size:>10,} {write_rate:>10,.0f} {last_order:>9.1f}us {by_item:>7.1f}us {units:>9.1f}us "
+              f"{recent:>8.0f}us {scan:>9,.0f}us")
+
+
+if __name__ == "__main__":
+    main()
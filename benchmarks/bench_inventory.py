@@ -0,0 +1,52 @@
+"""Reservations per second through InventoryEngine under thread contention.
+
+Each operation reserves one unit and then commits or releases it, all
+threads hammering the same small set of items. Run from the repository root:
+
+    python -m benchmarks.bench_inventory --operations 200000
+"""
+import argparse
+import threading
+import time
+
+from inventory_engine import InventoryEngine
+
+ITEMS = [f"item_{number}" for number in range(201, 211)]
+
+
+def run(threads, operations):
+    engine = InventoryEngine.from_items(ITEMS, [operations] * len(ITEMS))
+    per_thread = operations // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(thread_number):
+        barrier.wait()
+        for number in range(per_thread):
+            order_id = f"{thread_number}-{number}"
+            if engine.reserve(order_id, ITEMS[number % len(ITEMS)], 1):
+                if number % 4:
+                    engine.commit(order_id)
+                else:
+                    engine.release(order_id)
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=200000)
+    args = parser.parse_args()
+
+    for threads in (1, 8, 32):
+        print(f"{threads:>3} threads: {run(threads, args.operations):>12,.0f} reservations/s")
+
+
+if __name__ == "__main__":
+    main()
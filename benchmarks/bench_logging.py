@@ -0,0 +1,83 @@
+"""Logging cost per order on the fast path of the graph.
+
+Times the same orders with logging off (CRITICAL), at INFO and at DEBUG
+through the queue pipeline, and at DEBUG through synchronous handlers
+like the original setup, and reports each as overhead over logging off.
+Records are written to a temporary file rather than the console. Run
+from the repository root:
+
+    python -m benchmarks.bench_logging --orders 2000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage
+
+import logger_config
+import workflow
+from inventory_engine import get_inventory_engine
+from logger_config import logger
+
+ORDER = "I want to place an order for item_201, quantity 1, my customer id is customer_101"
+
+
+def timed(agent, orders):
+    start = time.perf_counter()
+    for _ in range(orders):
+        agent.invoke({"messages": [HumanMessage(content=ORDER)]})
+    return time.perf_counter() - start
+
+
+def use(level, handler):
+    for current in list(logger.handlers):
+        logger.removeHandler(current)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    get_inventory_engine().apply_stock({"item_201": 10 ** 9})
+    agent = workflow.create_workflow()
+    path = os.path.join(tempfile.mkdtemp(), "bench.log")
+    file_handler = logging.FileHandler(path)
+    file_handler.setFormatter(logging.Formatter(logger_config.TEXT_FORMAT))
+    # Keep the benchmark's own records off the console
+    logger_config.listener.handlers = (file_handler,)
+    queued = logger_config.queue_handler
+
+    setups = {
+        "off": (logging.CRITICAL, queued),
+        "INFO, queued": (logging.INFO, queued),
+        "DEBUG, queued": (logging.DEBUG, queued),
+        # The original setup: handlers formatting and writing on the request thread
+        "DEBUG, synchronous": (logging.DEBUG, file_handler),
+    }
+    timed(agent, min(args.orders, 200))
+
+    # Interleave the setups so each sees the same store size and machine state
+    totals = dict.fromkeys(setups, 0.0)
+    per_round = max(1, args.orders // args.rounds)
+    for _ in range(args.rounds):
+        for label, (level, handler) in setups.items():
+            use(level, handler)
+            totals[label] += timed(agent, per_round)
+    use(logging.DEBUG, queued)
+
+    orders = per_round * args.rounds
+    baseline = totals["off"] / orders * 1e6
+    print(f"{'logging':<22}{'us/order':>10}{'overhead':>10}")
+    for label, total in totals.items():
+        us = total / orders * 1e6
+        print(f"{label:<22}{us:>10.0f}{us - baseline:>+10.0f}")
+
+
+if __name__ == "__main__":
+    main()
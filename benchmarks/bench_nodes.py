@@ -0,0 +1,104 @@
+"""Per-node latency and allocation for the place-order path of the graph.
+
+Each node function is wrapped before the graph is compiled. A timing pass
+records wall time per node and per order; a second pass under tracemalloc
+records the peak bytes each node allocates. Orders carry --history earlier
+messages so the cost of handling the message list is visible. Run from the
+repository root:
+
+    python -m benchmarks.bench_nodes --orders 2000 --history 50
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+from collections import defaultdict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import workflow
+from inventory_engine import get_inventory_engine
+from logger_config import logger
+
+NODE_FUNCTIONS = (
+    "categorize_query", "validate_customer", "check_inventory",
+    "compute_shipping", "process_payment", "process_order_result"
+)
+
+ITEMS = ("item_201", "item_202", "item_203", "item_204")
+
+
+def instrument(timings, allocations, trace, names=NODE_FUNCTIONS):
+    for name in names:
+        node = getattr(workflow, name, None)
+        if node is None:
+            continue
+
+        def wrapper(state, _node=node, _name=name):
+            if trace["enabled"]:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                result = _node(state)
+                allocations[_name].append(tracemalloc.get_traced_memory()[1] - before)
+                return result
+            start = time.perf_counter()
+            result = _node(state)
+            timings[_name].append(time.perf_counter() - start)
+            return result
+
+        setattr(workflow, name, wrapper)
+
+
+def make_inputs(count: int, history: int):
+    earlier = []
+    for turn in range(history):
+        earlier.append(HumanMessage(content=f"Earlier question {turn}") if turn % 2 == 0
+                       else AIMessage(content=f"Earlier answer {turn}"))
+    return [
+        {"messages": earlier + [HumanMessage(
+            content=f"I want to place an order for {ITEMS[i % len(ITEMS)]}, quantity 1, "
+                    f"my customer id is customer_101"
+        )]}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=50)
+    args = parser.parse_args()
+
+    # Measure the nodes, not the debug log handlers; keep every order in stock
+    logger.setLevel(logging.WARNING)
+    get_inventory_engine().apply_stock({item_id: 10 ** 9 for item_id in ITEMS})
+
+    timings = defaultdict(list)
+    allocations = defaultdict(list)
+    trace = {"enabled": False}
+    instrument(timings, allocations, trace)
+    agent = workflow.create_workflow()
+
+    inputs = make_inputs(args.orders, args.history)
+    start = time.perf_counter()
+    for order in inputs:
+        agent.invoke(order)
+    elapsed = time.perf_counter() - start
+
+    trace["enabled"] = True
+    tracemalloc.start()
+    for order in make_inputs(min(args.orders, 500), args.history):
+        agent.invoke(order)
+    tracemalloc.stop()
+
+    print(f"{'node':<22}{'mean us':>10}{'peak alloc B':>14}")
+    for name in NODE_FUNCTIONS:
+        if name in timings:
+            mean_us = sum(timings[name]) / len(timings[name]) * 1e6
+            mean_alloc = sum(allocations[name]) / len(allocations[name])
+            print(f"{name:<22}{mean_us:>10.1f}{mean_alloc:>14,.0f}")
+    print(f"end to end: {elapsed / args.orders * 1e6:,.0f}us per order ({args.orders / elapsed:,.0f} orders/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Tail latency with hedged requests, and order handling during an LLM brownout.
+
+Runs the real OpenAI client against benchmarks/stub_llm_server.py:
+
+  - tail: --calls extraction calls from --threads threads, where a share
+    of the stub's replies are stragglers; hedging off versus on, with the
+    extra load it adds
+  - brownout: the stub stops answering within the deadline; the breaker
+    off versus on, then free-form orders through the graph, which fall
+    back to the rule-based parser while the breaker is open
+
+Run from the repository root:
+
+    python -m benchmarks.bench_resilience --calls 400 --slow-rate 0.03
+"""
+import argparse
+import os
+import socket
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROMPT = "Extract order information\n Text: customer_101 wants {quantity} of item_201 (ref r{number})\n\n"
+ORDER = "Hi, customer_101 here, please send me 1 of item_201 (ref b{number})"
+
+
+def timed_calls(llm, calls, threads):
+    def call(number):
+        start = time.perf_counter()
+        try:
+            llm.invoke(PROMPT.format(quantity=number % 5 + 1, number=number))
+            failed = False
+        except Exception:
+            failed = True
+        return time.perf_counter() - start, failed
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(call, range(calls)))
+    return [latency for latency, _ in results], sum(failed for _, failed in results)
+
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100)
+    return {"p50": cuts[49] * 1e3, "p95": cuts[94] * 1e3, "p99": cuts[98] * 1e3, "max": max(latencies) * 1e3}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.02:0.2", help="stub delay for normal replies")
+    parser.add_argument("--slow-rate", type=float, default=0.03,
+                        help="share of straggler replies; hedging at p95 only helps below 5%%")
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=0.3, help="per-call deadline during the brownout")
+    parser.add_argument("--orders", type=int, default=50, help="orders placed during the brownout")
+    args = parser.parse_args()
+
+    # config reads these on first import, so project modules (the stub included) are imported only after this
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    os.environ["LLM_PROVIDER"] = "openai"
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["LLM_TIMEOUT"] = str(args.timeout)
+    os.environ["LLM_MAX_RETRIES"] = "0"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import logging
+    from langchain_core.messages import HumanMessage
+    from llm_provider import LatencyModel, ResilientChatModel, build_llm
+    from logger_config import logger
+    from resilience import CircuitBreaker, ResilientCaller, order_config
+    from benchmarks.stub_llm_server import StubSettings, start
+
+    settings = StubSettings(args.latency, args.slow_rate, args.slow_latency)
+    start(settings, port=port)
+
+    logger.setLevel(logging.ERROR)
+    openai_llm = build_llm("openai", base_url=os.environ["LLM_BASE_URL"], timeout=10, max_retries=0)
+
+    print(f"tail: {args.calls} calls, {args.slow_rate:.0%} stragglers at {args.slow_latency}s")
+    print(f"{'':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'requests':>10}{'hedge wins':>12}")
+    for label, percentile in (("no hedge", 0.0), ("hedged", 0.95)):
+        guard = ResilientCaller(call_timeout=10, hedge_percentile=percentile, hedge_max_ratio=0.1,
+                                breaker=CircuitBreaker(0))
+        llm = ResilientChatModel(inner=openai_llm, guard=guard)
+        # Warm up the latency window and the connection pool before measuring
+        timed_calls(llm, 50, args.threads)
+        settings.requests, guard.calls, guard.hedge_wins = 0, 0, 0
+        latencies, _ = timed_calls(llm, args.calls, args.threads)
+        cuts = percentiles(latencies)
+        print(f"{label:<10}{cuts['p50']:>9.1f}{cuts['p95']:>9.1f}{cuts['p99']:>9.1f}{cuts['max']:>9.1f}"
+              f"{settings.requests / args.calls:>9.2f}x{guard.hedge_wins:>12}")
+
+    print(f"\nbrownout: every reply takes {args.timeout * 10:.0f}s, deadline {args.timeout}s")
+    settings.latency, settings.slow_rate = LatencyModel(str(args.timeout * 10)), 0.0
+    print(f"{'':<12}{'calls':>7}{'failed':>8}{'mean ms':>9}{'requests':>10}")
+    for label, failures in (("no breaker", 0), ("breaker", 5)):
+        guard = ResilientCaller(call_timeout=args.timeout, hedge_percentile=0.0,
+                                breaker=CircuitBreaker(failures, cooldown=60))
+        llm = ResilientChatModel(inner=openai_llm, guard=guard)
+        settings.requests = 0
+        latencies, failed = timed_calls(llm, args.orders, 1)
+        print(f"{label:<12}{args.orders:>7}{failed:>8}{statistics.fmean(latencies) * 1e3:>9.1f}{settings.requests:>10}")
+
+    # The app's own model and guard, through the graph, with every order in stock
+    import workflow
+    from inventory_engine import get_inventory_engine
+    get_inventory_engine().apply_stock({"item_201": 10 ** 9})
+    agent = workflow.create_workflow()
+    placed, start_time = 0, time.perf_counter()
+    for number in range(args.orders):
+        result = agent.invoke({"messages": [HumanMessage(content=ORDER.format(number=number))]},
+                              config=order_config(60))
+        placed += not result.get("error")
+    seconds = time.perf_counter() - start_time
+    print(f"\ngraph during brownout: {placed}/{args.orders} orders placed in {seconds:.2f}s "
+          "(rule-based fallback while the circuit is open)")
+
+
+if __name__ == "__main__":
+    main()
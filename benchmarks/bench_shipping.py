@@ -0,0 +1,59 @@
+"""Shipping quote throughput: batch pricing, per-pair pricing and the quote cache.
+
+Prices --pairs random (location, weight) pairs with one quote_batch call
+and with one quote call per pair, then times quote_item for single-item
+orders drawn from --distinct (location, item, quantity) combinations, so
+the cache hit rate is visible. Run from the repository root:
+
+    python -m benchmarks.bench_shipping --pairs 100000 --distinct 500
+"""
+import argparse
+import random
+import time
+
+from catalog import get_catalog
+from shipping import ShippingEngine
+
+LOCATIONS = ("local", "domestic", "international")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    engine = ShippingEngine.from_csv()
+    locations = [rng.choice(LOCATIONS) for _ in range(args.pairs)]
+    weights = [round(rng.uniform(0.1, 80), 3) for _ in range(args.pairs)]
+
+    start = time.perf_counter()
+    batch = engine.quote_batch(locations, weights)
+    batch_us = (time.perf_counter() - start) / args.pairs * 1e6
+
+    sample = min(args.pairs, 20000)
+    start = time.perf_counter()
+    single = [engine.quote(location, weight) for location, weight in zip(locations[:sample], weights[:sample])]
+    single_us = (time.perf_counter() - start) / sample * 1e6
+    assert single == batch[:sample].tolist()
+
+    tables = get_catalog().current()
+    items = list(tables.inventory)
+    orders = [(rng.choice(LOCATIONS), rng.choice(items), rng.randint(1, 20)) for _ in range(args.distinct)]
+    requests = [rng.choice(orders) for _ in range(args.pairs)]
+    start = time.perf_counter()
+    for location, item_id, quantity in requests:
+        engine.quote_item(location, item_id, quantity, tables)
+    item_us = (time.perf_counter() - start) / args.pairs * 1e6
+
+    stats = engine.stats()
+    print(f"quote_batch:  {batch_us:8.3f} us per pair ({args.pairs:,} pairs in one call)")
+    print(f"quote:        {single_us:8.3f} us per pair")
+    print(f"quote_item:   {item_us:8.3f} us per order, cache hit rate "
+          f"{stats['hits'] / (stats['hits'] + stats['misses']):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""LLM calls and wall time for duplicated requests, with and without single-flight.
+
+Simulates double submits and partner retries: each of --prompts distinct
+extraction prompts is sent --copies times at once from a thread pool, to
+the fake model with a fixed --latency. Run from the repository root:
+
+    python -m benchmarks.bench_single_flight --prompts 50 --copies 3 --latency 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_provider import FakeChatModel, LatencyModel, SingleFlightChatModel
+from single_flight import SingleFlight
+
+PROMPT = "Extract order information\n Text: customer_101 wants {quantity} of item_201\n\n"
+
+
+def run(llm, prompts, copies, threads):
+    requests = [PROMPT.format(quantity=number + 1) for number in range(prompts) for _ in range(copies)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(llm.invoke, requests))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=50)
+    parser.add_argument("--copies", type=int, default=3)
+    parser.add_argument("--latency", default="0.05")
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    fake = FakeChatModel(latency=LatencyModel(args.latency))
+    flights = SingleFlight()
+    coalescing = SingleFlightChatModel(inner=fake, flights=flights)
+
+    requests = args.prompts * args.copies
+    plain_seconds = run(fake, args.prompts, args.copies, args.threads)
+    shared_seconds = run(coalescing, args.prompts, args.copies, args.threads)
+    print(f"{'':<16}{'LLM calls':>10}{'wall s':>9}")
+    print(f"{'plain':<16}{requests:>10}{plain_seconds:>9.2f}")
+    print(f"{'single-flight':<16}{flights.calls:>10}{shared_seconds:>9.2f}  ({flights.coalesced} coalesced)")
+
+
+if __name__ == "__main__":
+    main()
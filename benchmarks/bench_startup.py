@@ -0,0 +1,69 @@
+"""Cold-start budget: time to import the workflow and to serve the first order.
+
+Each measurement runs in a fresh interpreter so nothing is already imported
+or built. The first order uses the fast-path wording, so no LLM call is
+made. Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 5 --import-budget 2.0 --first-order-budget 1.0
+
+Exits non-zero when the median of either figure exceeds its budget, so it
+can gate CI on startup regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FIRST_ORDER = "I want to place an order for item_201, quantity 1, my customer id is customer_101"
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import workflow
+imported = time.perf_counter()
+from langchain_core.messages import HumanMessage
+agent = workflow.get_workflow()
+for _ in agent.stream({"messages": [HumanMessage(content=%r)]}, stream_mode="values"):
+    pass
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_order": done - imported}))
+""" % FIRST_ORDER
+
+
+def measure() -> dict:
+    env = dict(os.environ)
+    # The client is never called on the fast path, but constructing it needs a key
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=None, help="seconds")
+    parser.add_argument("--first-order-budget", type=float, default=None, help="seconds")
+    args = parser.parse_args()
+
+    samples = [measure() for _ in range(args.runs)]
+    import_time = statistics.median(sample["import"] for sample in samples)
+    first_order = statistics.median(sample["first_order"] for sample in samples)
+    print(f"import workflow: {import_time * 1000:8.1f}ms (median of {args.runs})")
+    print(f"first order:     {first_order * 1000:8.1f}ms (median of {args.runs})")
+
+    failed = False
+    if args.import_budget is not None and import_time > args.import_budget:
+        print(f"FAIL: import exceeds budget of {args.import_budget * 1000:.0f}ms")
+        failed = True
+    if args.first_order_budget is not None and first_order > args.first_order_budget:
+        print(f"FAIL: first order exceeds budget of {args.first_order_budget * 1000:.0f}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
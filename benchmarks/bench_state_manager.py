@@ -0,0 +1,81 @@
+"""Contention benchmark for StateManager with one lock against lock striping.
+
+Both stores are the same StateManager doing the same index and retention
+work; the baseline keeps every order in a single stripe, so all writers
+share one lock. Each simulated order performs the same eight
+set/get/update calls the graph nodes make.
+
+Under the GIL a thread only holds a stripe lock across a thread switch when
+it is preempted inside one; --switch-interval shortens the interpreter's
+switch interval so that happens as often as it would with threads running
+in parallel; by default the default interval and 0.5ms are both run. Run
+from the repository root:
+
+    python -m benchmarks.bench_state_manager --orders 20000
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+
+from state_manager import StateManager, STRIPE_COUNT
+
+
+def manager_with(stripes: int) -> StateManager:
+    # Bypass the singleton so every run starts from an empty store
+    manager = object.__new__(StateManager)
+    manager._init_storage(stripes)
+    return manager
+
+
+def simulate_order(manager, order_id):
+    order_state = {"order_id": order_id, "item_id": "item_201", "quantity": 1}
+    manager.set_state(order_id, {"order_state": order_state})
+    for stage in ("inventory", "shipping", "payment"):
+        manager.get_state(order_id)
+        manager.update_state(order_id, {"order_state": {**order_state, stage: True}})
+    manager.get_state(order_id)
+
+
+def run(manager, threads, orders):
+    per_thread = orders // threads
+    order_ids = [[str(uuid.uuid4()) for _ in range(per_thread)] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(ids):
+        barrier.wait()
+        for order_id in ids:
+            simulate_order(manager, order_id)
+
+    workers = [threading.Thread(target=worker, args=(ids,)) for ids in order_ids]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per cell; the best is reported")
+    parser.add_argument("--switch-interval", type=float, nargs="+", default=[sys.getswitchinterval(), 0.0005],
+                        help="interpreter switch intervals to run at, in seconds")
+    args = parser.parse_args()
+
+    print(f"{'switch':>7} {'threads':>7} {'one lock':>14} {f'{STRIPE_COUNT} stripes':>14}")
+    for interval in args.switch_interval:
+        sys.setswitchinterval(interval)
+        for threads in (1, 8, 32):
+            single, striped = (
+                max(run(manager_with(stripes), threads, args.orders) for _ in range(args.repeat))
+                for stripes in (1, STRIPE_COUNT)
+            )
+            print(f"{interval * 1000:>5g}ms {threads:>7} {single:>10,.0f} o/s {striped:>10,.0f} o/s")
+
+
+if __name__ == "__main__":
+    main()
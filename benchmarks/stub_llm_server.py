@@ -0,0 +1,185 @@
+"""OpenAI-compatible chat completions stub for exercising the real LLM client offline.
+
+Answers POST /v1/chat/completions, plain or streamed, with the fake model's
+rule-based replies after a sampled delay, and can inject faults: a share
+of slow stragglers and a share of 503 errors. Run it and point the app at it:
+
+    python -m benchmarks.stub_llm_server --port 8089 --latency lognormal:0.2:0.4 --slow-rate 0.05
+    LLM_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub streamlit run app.py
+
+In-process, start() returns the server; its `settings` can be changed
+while it runs, e.g. to begin a brownout halfway through a benchmark.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+from llm_provider import LatencyModel, fake_reply
+
+MODEL = "stub-order-llm"
+# OpenAI roles as the message types fake_reply expects
+MESSAGE_TYPES = {"user": "human", "assistant": "ai", "tool": "tool", "system": "system"}
+CHUNK_SIZE = 8
+
+
+class StubSettings:
+    """Delay and fault injection for the stub, plus a count of requests served."""
+
+    def __init__(self, latency: str = "0", slow_rate: float = 0.0, slow_latency: float = 1.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = LatencyModel(latency, seed)
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def next_request(self):
+        """Count a request and return (delay in seconds, whether to fail it)."""
+        with self._lock:
+            self.requests += 1
+            slow = self._random.random() < self.slow_rate
+            failed = self._random.random() < self.error_rate
+        delay = self.slow_latency if slow else self.latency.sample()
+        return delay, failed
+
+
+def _message_text(message) -> str:
+    content = message.get("content") or ""
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def _tool_calls(reply):
+    return [
+        {"index": index, "id": call["id"], "type": "function",
+         "function": {"name": call["name"], "arguments": json.dumps(call["args"])}}
+        for index, call in enumerate(reply.tool_calls)
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per reply
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+            return
+
+        delay, failed = self.server.settings.next_request()
+        time.sleep(delay)
+        if failed:
+            self._send_json(503, {"error": {"message": "Injected stub failure", "type": "server_error"}})
+            return
+
+        turns = [(MESSAGE_TYPES.get(message.get("role"), message.get("role")), _message_text(message))
+                 for message in request.get("messages", [])]
+        prompt = "\n".join(text for _, text in turns)
+        reply = fake_reply(turns, request.get("tools"))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        if request.get("stream"):
+            self._stream(completion_id, reply)
+            return
+
+        message = {"role": "assistant", "content": reply.content or None}
+        if reply.tool_calls:
+            message["tool_calls"] = [{key: value for key, value in call.items() if key != "index"}
+                                     for call in _tool_calls(reply)]
+        prompt_tokens, completion_tokens = len(prompt) // 4, max(1, len(reply.content) // 4)
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": MODEL,
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if reply.tool_calls else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def _stream(self, completion_id: str, reply) -> None:
+        # Server-sent events; the connection is closed after [DONE] instead of sending a length
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish_reason=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": MODEL, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        event({"role": "assistant", "content": ""})
+        for call in _tool_calls(reply):
+            # Name and id first, then the arguments in pieces, as OpenAI streams function calls
+            arguments = call["function"]["arguments"]
+            event({"tool_calls": [{**call, "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            for start in range(0, len(arguments), CHUNK_SIZE):
+                event({"tool_calls": [{"index": call["index"],
+                                       "function": {"arguments": arguments[start:start + CHUNK_SIZE]}}]})
+        for start in range(0, len(reply.content), CHUNK_SIZE):
+            event({"content": reply.content[start:start + CHUNK_SIZE]})
+        event({}, "tool_calls" if reply.tool_calls else "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings: StubSettings):
+        super().__init__(address, StubHandler)
+        self.settings = settings
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up on a slow reply (timeouts, lost hedges) close the connection early
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start(settings: StubSettings, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Serve from a daemon thread; port 0 picks a free port (see server.server_address)."""
+    server = StubServer((host, port), settings)
+    threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="0.2", help='delay per request, e.g. "0.2" or "lognormal:0.2:0.4"')
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    settings = StubSettings(args.latency, args.slow_rate, args.slow_latency, args.error_rate, args.seed)
+    server = StubServer((args.host, args.port), settings)
+    print(f"Stub LLM listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
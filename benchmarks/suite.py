@@ -0,0 +1,240 @@
+"""Offline benchmark suite with JSON results for comparing revisions.
+
+Runs against the deterministic fake LLM (or a recorded cassette with
+--provider replay), so no API key or network is needed. Covers:
+
+  - end-to-end latency, orders/s and LLM input tokens per order for the
+    place and cancel flows, both on the fast path and through the LLM
+  - per-node latency on the LLM paths
+  - StateManager and InventoryEngine throughput under thread contention
+
+Run from the repository root, then rerun on another revision and compare:
+
+    python -m benchmarks.suite --output base.json
+    python -m benchmarks.suite --output new.json --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+FLOWS = ("place_fast", "place_llm", "cancel_fast", "cancel_llm", "cancel_tool_loop")
+SUITE_NODES = (
+    "categorize_query", "validate_customer", "check_inventory", "compute_shipping",
+    "process_payment", "process_order_result", "direct_cancel", "call_model_2"
+)
+ITEMS = ("item_201", "item_202", "item_203", "item_204")
+
+PLACE_FAST = "I want to place an order for {item}, quantity 1, my customer id is customer_101"
+# Free-form wordings the fast-path parser rejects, so they go to the LLM;
+# the reference number keeps every text unique so the extraction cache never hits
+PLACE_LLM = "Hi, customer_101 here, please send me 1 of {item} (ref r{number})"
+CANCEL_FAST = "Cancel order {order_id}"
+CANCEL_LLM = "Drop the purchase {order_id}, please cancel it"
+# Two ids leave the extraction without a cancel_order_id, which forces the tool loop
+CANCEL_TOOL_LOOP = "Scrap {decoy}... no wait, cancel {order_id} instead"
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "orders": len(latencies),
+        "orders_per_s": len(latencies) / sum(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1e3,
+        "p50_ms": cuts[49] * 1e3,
+        "p95_ms": cuts[94] * 1e3,
+        "p99_ms": cuts[98] * 1e3
+    }
+
+
+def invoke_all(agent, texts):
+    from langchain_core.messages import HumanMessage
+
+    latencies, errors = [], 0
+    for text in texts:
+        start = time.perf_counter()
+        result = agent.invoke({"messages": [HumanMessage(content=text)]})
+        latencies.append(time.perf_counter() - start)
+        errors += bool(result.get("error"))
+    return latencies, errors
+
+
+def place_orders(agent, count):
+    """Place orders on the fast path (untimed) for the cancel flows to cancel."""
+    from langchain_core.messages import HumanMessage
+
+    order_ids = []
+    for number in range(count):
+        result = agent.invoke({"messages": [HumanMessage(content=PLACE_FAST.format(item=ITEMS[number % len(ITEMS)]))]})
+        order_ids.append(result["order_state"].get("order_id"))
+    return order_ids
+
+
+def flow_texts(agent, flow, count):
+    if flow == "place_fast":
+        return [PLACE_FAST.format(item=ITEMS[number % len(ITEMS)]) for number in range(count)]
+    if flow == "place_llm":
+        return [PLACE_LLM.format(item=ITEMS[number % len(ITEMS)], number=number) for number in range(count)]
+    order_ids = place_orders(agent, count)
+    if flow == "cancel_fast":
+        return [CANCEL_FAST.format(order_id=order_id) for order_id in order_ids]
+    if flow == "cancel_llm":
+        return [CANCEL_LLM.format(order_id=order_id) for order_id in order_ids]
+    decoys = place_orders(agent, count)
+    return [CANCEL_TOOL_LOOP.format(decoy=decoy, order_id=order_id) for decoy, order_id in zip(decoys, order_ids)]
+
+
+def input_tokens():
+    """LLM input tokens recorded so far (estimated by the fake model, reported by real ones)."""
+    from metrics import registry
+
+    return sum(counter["value"] for counter in registry.snapshot()["counters"]
+               if counter["name"] == "llm_tokens_total" and counter["labels"].get("kind") == "input")
+
+
+def bench_flows(orders):
+    import workflow
+
+    agent = workflow.create_workflow()
+    results = {}
+    for flow in FLOWS:
+        texts = flow_texts(agent, flow, orders)
+        tokens = input_tokens()
+        latencies, errors = invoke_all(agent, texts)
+        results[flow] = {**summarize(latencies), "errors": errors,
+                         "input_tokens_per_order": (input_tokens() - tokens) / orders}
+    return results
+
+
+def bench_nodes(orders):
+    import workflow
+    from benchmarks.bench_nodes import instrument
+
+    # Set up the orders to cancel before instrumenting, so only the measured flows are timed
+    setup = workflow.create_workflow()
+    texts = flow_texts(setup, "place_llm", orders) + flow_texts(setup, "cancel_tool_loop", orders)
+    timings = defaultdict(list)
+    instrument(timings, {}, {"enabled": False}, names=SUITE_NODES)
+    invoke_all(workflow.create_workflow(), texts)
+    return {
+        name: {
+            "calls": len(timings[name]),
+            "mean_us": statistics.fmean(timings[name]) * 1e6,
+            "p95_us": statistics.quantiles(timings[name], n=20)[18] * 1e6 if len(timings[name]) > 1 else 0.0
+        }
+        for name in SUITE_NODES if timings[name]
+    }
+
+
+def bench_micro(orders, operations):
+    from benchmarks import bench_inventory, bench_state_manager
+    from state_manager import STRIPE_COUNT
+
+    return {
+        "state_manager_orders_per_s": {
+            str(threads): bench_state_manager.run(bench_state_manager.manager_with(STRIPE_COUNT), threads, orders)
+            for threads in (1, 8)
+        },
+        "inventory_reservations_per_s": {
+            str(threads): bench_inventory.run(threads, operations) for threads in (1, 8)
+        }
+    }
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}{key}", value
+
+
+def compare(baseline, current):
+    old = dict(flatten(baseline["results"]))
+    print(f"\nvs {baseline['meta'].get('revision')}:")
+    print(f"{'metric':<52}{'before':>14}{'after':>14}{'change':>9}")
+    for key, value in flatten(current["results"]):
+        if key in old:
+            change = f"{(value - old[key]) / old[key] * 100:+.1f}%" if old[key] else "n/a"
+            print(f"{key:<52}{old[key]:>14,.2f}{value:>14,.2f}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200, help="orders per flow")
+    parser.add_argument("--micro-orders", type=int, default=20000)
+    parser.add_argument("--micro-operations", type=int, default=200000)
+    parser.add_argument("--provider", choices=("fake", "replay"), default="fake")
+    parser.add_argument("--latency", default=os.getenv("FAKE_LLM_LATENCY", "0"),
+                        help='fake LLM delay per call, e.g. "0.2" or "lognormal:0.3:0.4"')
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="print changes against an earlier results file")
+    args = parser.parse_args()
+
+    # config reads the provider on first import, so project modules are imported only after this
+    os.environ["LLM_PROVIDER"] = args.provider
+    os.environ["FAKE_LLM_LATENCY"] = args.latency
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+
+    import logging
+    from inventory_engine import get_inventory_engine
+    from logger_config import logger
+
+    # Measure the order path, not the debug log handlers; keep every order in stock
+    logger.setLevel(logging.WARNING)
+    get_inventory_engine().apply_stock({item_id: 10 ** 9 for item_id in ITEMS})
+
+    started = time.time()
+    report = {
+        "meta": {
+            "revision": revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(started)),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "provider": args.provider,
+            "latency": args.latency,
+            "orders": args.orders
+        },
+        "results": {
+            "flows": bench_flows(args.orders),
+            "nodes": bench_nodes(args.orders),
+            **bench_micro(args.micro_orders, args.micro_operations)
+        }
+    }
+    report["meta"]["duration_s"] = time.time() - started
+
+    print(f"{'flow':<18}{'orders/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'tokens':>8}{'errors':>8}")
+    for flow, result in report["results"]["flows"].items():
+        print(f"{flow:<18}{result['orders_per_s']:>10,.0f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{result['input_tokens_per_order']:>8.0f}{result['errors']:>8}")
+    print(f"\n{'node':<22}{'mean us':>10}{'p95 us':>10}")
+    for name, result in report["results"]["nodes"].items():
+        print(f"{name:<22}{result['mean_us']:>10.1f}{result['p95_us']:>10.1f}")
+    for name in ("state_manager_orders_per_s", "inventory_reservations_per_s"):
+        rates = ", ".join(f"{threads} threads {rate:,.0f}" for threads, rate in report["results"][name].items())
+        print(f"\n{name}: {rates}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            compare(json.load(baseline), report)
+
+
+if __name__ == "__main__":
+    main()
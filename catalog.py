@@ -0,0 +1,283 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+from config import CATALOG_RELOAD_INTERVAL, CATALOG_CACHE_DIR
+from lazy import once
+from logger_config import logger
+
+# pandas and numpy are imported where the tables are loaded, keeping `import catalog` cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+INVENTORY_PATH = "data/inventory.csv"
+CUSTOMERS_PATH = "data/customers.csv"
+
+# Catalog versions kept so orders in flight finish against the tables they started with
+CATALOG_HISTORY = 8
+
+
+class CatalogSnapshot:
+    """Immutable lookup tables for one version of the data files.
+
+    Tables are dict-of-dicts or memory-mapped tables with the same interface;
+    the DataFrame views are built on first use when only a mapped table exists.
+    """
+    __slots__ = ("version", "inventory", "customers", "_inventory_df", "_customers_df")
+
+    def __init__(self, version: int, inventory: Mapping[str, Dict[str, Any]],
+                 customers: Mapping[str, Dict[str, Any]], inventory_df: Optional["pd.DataFrame"] = None,
+                 customers_df: Optional["pd.DataFrame"] = None):
+        self.version = version
+        self.inventory = inventory
+        self.customers = customers
+        self._inventory_df = inventory_df
+        self._customers_df = customers_df
+
+    @property
+    def inventory_df(self) -> "pd.DataFrame":
+        if self._inventory_df is None:
+            self._inventory_df = self.inventory.to_frame()
+        return self._inventory_df
+
+    @property
+    def customers_df(self) -> "pd.DataFrame":
+        if self._customers_df is None:
+            self._customers_df = self.customers.to_frame()
+        return self._customers_df
+
+    def item_values(self, column: str, item_ids: Sequence[str]) -> "np.ndarray":
+        """One inventory column for the given items, in order; raises KeyError for unknown items.
+
+        A mapped table is read with a single gather from the column array.
+        """
+        import numpy as np
+        inventory = self.inventory
+        if hasattr(inventory, "position"):
+            positions = [inventory.position(item_id) for item_id in item_ids]
+            if None in positions:
+                raise KeyError(item_ids[positions.index(None)])
+            return inventory.column(column)[positions]
+        return np.array([inventory[item_id][column] for item_id in item_ids])
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _to_lookup(df: "pd.DataFrame", key: str) -> Dict[str, Dict[str, Any]]:
+    return df.set_index(key).to_dict("index")
+
+
+def _diff_frames(old_df: "pd.DataFrame", new_df: "pd.DataFrame", key: str):
+    """Compare two versions of a table column-wise; returns changed or added rows and removed keys."""
+    old = old_df.set_index(key)
+    new = new_df.set_index(key)
+    if list(old.columns) != list(new.columns) or not new.index.is_unique:
+        return new.to_dict("index"), old.index.difference(new.index).tolist()
+
+    aligned = old.reindex(new.index)
+    differs = (aligned != new) & ~(aligned.isna() & new.isna())
+    return new[differs.any(axis=1)].to_dict("index"), old.index.difference(new.index).tolist()
+
+
+class Catalog:
+    """Versioned inventory/customer tables that can be reloaded while serving orders.
+
+    Readers take a snapshot with current() or pin one with get(version); a
+    reload parses the files on the caller's thread (the watcher thread in
+    production) and swaps in a new snapshot with a single assignment.
+
+    With a cache directory, each CSV is compiled once per content hash to a
+    columnar file and memory-mapped instead of being parsed at startup. A
+    reload layers the changed rows over the mapped table rather than
+    compiling the new file, and tables no snapshot maps are deleted.
+    """
+
+    def __init__(self, inventory_path: str = INVENTORY_PATH, customers_path: str = CUSTOMERS_PATH,
+                 cache_dir: Optional[str] = CATALOG_CACHE_DIR):
+        self.inventory_path = inventory_path
+        self.customers_path = customers_path
+        self.cache_dir = cache_dir
+        self._stock_listeners: List[Callable[[Dict[str, int], List[str]], None]] = []
+        self._reload_lock = threading.Lock()
+        self._history: "OrderedDict[int, CatalogSnapshot]" = OrderedDict()
+        self._signatures: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_reload_seconds = 0.0
+
+        for path in (inventory_path, customers_path):
+            self._signatures[path] = (_file_signature(path), self._hash(path))
+        inventory, inventory_df = self._load(inventory_path, "item_id")
+        customers, customers_df = self._load(customers_path, "customer_id")
+        self._publish(CatalogSnapshot(1, inventory, customers, inventory_df, customers_df))
+
+    def _hash(self, path: str) -> str:
+        # The compiled-table manifest remembers hashes, so unchanged files are not re-read
+        if self.cache_dir:
+            from catalog_store import source_hash
+            return source_hash(path, self.cache_dir)
+        return _file_hash(path)
+
+    def _load(self, path: str, key: str) -> Tuple[Mapping[str, Dict[str, Any]], Optional["pd.DataFrame"]]:
+        """Lookup table for a data file, plus its DataFrame if one was parsed."""
+        if self.cache_dir:
+            from catalog_store import load_table
+            return load_table(path, key, self.cache_dir)
+        import pandas as pd
+        df = pd.read_csv(path)
+        return _to_lookup(df, key), df
+
+    def _reload_table(self, path: str, key: str, previous: Mapping[str, Dict[str, Any]], previous_df: "pd.DataFrame"):
+        """Parse a changed file and diff it against the previous version.
+
+        Only the changed rows are applied: over the previous dict, sharing
+        unchanged row dicts, or over the previous mapped table as a patch.
+        """
+        import pandas as pd
+        from catalog_store import MappedTable, PatchedTable, patch_table
+        df = pd.read_csv(path)
+        changed, removed = _diff_frames(previous_df, df, key)
+        if isinstance(previous, (MappedTable, PatchedTable)):
+            return patch_table(previous, changed, removed), df, changed, removed
+        lookup = dict(previous)
+        lookup.update(changed)
+        for row_key in removed:
+            lookup.pop(row_key, None)
+        return lookup, df, changed, removed
+
+    def on_stock_change(self, callback: Callable[[Dict[str, int], List[str]], None]) -> None:
+        """Register callback(stock_by_item, removed_items), called when a reload changes stock."""
+        self._stock_listeners.append(callback)
+
+    def _publish(self, snapshot: CatalogSnapshot) -> None:
+        self._history[snapshot.version] = snapshot
+        while len(self._history) > CATALOG_HISTORY:
+            self._history.popitem(last=False)
+        self._current = snapshot
+        if self.cache_dir:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete compiled tables that no snapshot in the history maps any more."""
+        from catalog_store import prune_tables
+        for path, table_of in ((self.inventory_path, lambda snapshot: snapshot.inventory),
+                               (self.customers_path, lambda snapshot: snapshot.customers)):
+            keep = [table_of(snapshot).path for snapshot in self._history.values()
+                    if hasattr(table_of(snapshot), "path")]
+            removed = prune_tables(path, self.cache_dir, keep)
+            if removed:
+                logger.info(f"Removed {removed} superseded compiled tables of {path}")
+
+    def current(self) -> CatalogSnapshot:
+        return self._current
+
+    def get(self, version: Optional[int]) -> CatalogSnapshot:
+        """Snapshot for a pinned version, or the current one if it has aged out."""
+        if version is None:
+            return self._current
+        return self._history.get(version, self._current)
+
+    def _check(self, path: str) -> Tuple[bool, Tuple[Tuple[int, int], str]]:
+        """Whether a file's contents changed, and its new signature; nothing is recorded yet."""
+        signature = _file_signature(path)
+        previous = self._signatures[path]
+        if signature == previous[0]:
+            return False, previous
+        file_hash = self._hash(path)
+        return file_hash != previous[1], (signature, file_hash)
+
+    def reload(self) -> bool:
+        """Reload any data file whose contents changed; returns True if a new version was published.
+
+        Both tables are parsed and diffed before anything is published. The
+        file signatures are recorded and the stock listeners called only
+        after the snapshot is swapped in, so a failed reload changes nothing
+        and the watcher retries it on its next poll.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            inventory_changed, inventory_signature = self._check(self.inventory_path)
+            customers_changed, customers_signature = self._check(self.customers_path)
+            signatures = {self.inventory_path: inventory_signature, self.customers_path: customers_signature}
+            if not inventory_changed and not customers_changed:
+                # Touched but identical files: remember the new signatures so they are not hashed again
+                self._signatures.update(signatures)
+                return False
+
+            current = self._current
+            inventory, inventory_df = current.inventory, None
+            customers, customers_df = current.customers, None
+            stock, removed_items = None, []
+
+            if inventory_changed:
+                previous = inventory
+                inventory, inventory_df, changed, removed_items = self._reload_table(
+                    self.inventory_path, "item_id", previous, current.inventory_df
+                )
+                # Only a changed stock figure resets the live counter; price/weight edits leave sales intact
+                stock = {
+                    item_id: row["stock"] for item_id, row in changed.items()
+                    if item_id not in previous or previous[item_id]["stock"] != row["stock"]
+                }
+                logger.info(f"Inventory reload: {len(changed)} rows changed, {len(removed_items)} removed")
+
+            if customers_changed:
+                customers, customers_df, changed, removed = self._reload_table(
+                    self.customers_path, "customer_id", customers, current.customers_df
+                )
+                logger.info(f"Customer reload: {len(changed)} rows changed, {len(removed)} removed")
+
+            self._publish(CatalogSnapshot(
+                current.version + 1, inventory, customers,
+                inventory_df if inventory_changed else current._inventory_df,
+                customers_df if customers_changed else current._customers_df
+            ))
+            self._signatures.update(signatures)
+            if stock is not None:
+                for listener in self._stock_listeners:
+                    listener(stock, removed_items)
+            self.last_reload_seconds = time.perf_counter() - start
+            logger.info(f"Published catalog version {current.version + 1} in {self.last_reload_seconds:.3f}s")
+            return True
+
+    def start_watcher(self, interval: float = CATALOG_RELOAD_INTERVAL) -> None:
+        """Poll the data files in a background thread; safe to call more than once."""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.exception(f"Error reloading catalog: {str(e)}")
+
+
+@once
+def get_catalog() -> Catalog:
+    """Process-wide catalog, loaded on first use."""
+    return Catalog()
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import struct
+from collections.abc import Mapping
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from logger_config import logger
+
+MAGIC = b"OMSCAT01"
+HEADER_SIZE = struct.Struct("<I")
+ALIGNMENT = 64
+MANIFEST_NAME = "sources.json"
+
+# 64-bit FNV-1a over the fixed-width key bytes, computed identically in numpy and in Python
+FNV_OFFSET = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _hash_keys(keys: np.ndarray) -> np.ndarray:
+    """FNV-1a of every fixed-width key in one pass per byte column."""
+    width = keys.dtype.itemsize
+    key_bytes = keys.view(np.uint8).reshape(len(keys), width)
+    hashes = np.full(len(keys), FNV_OFFSET, dtype=np.uint64)
+    prime = np.uint64(FNV_PRIME)
+    for column in range(width):
+        hashes ^= key_bytes[:, column]
+        hashes *= prime
+    return hashes
+
+
+def _hash_key(key: bytes) -> int:
+    value = FNV_OFFSET
+    for byte in key:
+        value = ((value ^ byte) * FNV_PRIME) & MASK_64
+    return value
+
+
+def _build_index(keys: np.ndarray) -> np.ndarray:
+    """Open-addressing table of row+1 per slot (0 = empty), filled with vectorized linear probing."""
+    slot_count = 1 << max(4, int(2 * len(keys) - 1).bit_length())
+    mask = slot_count - 1
+    slots = np.zeros(slot_count, dtype=np.int64)
+    positions = (_hash_keys(keys) & np.uint64(mask)).astype(np.int64)
+    pending = np.arange(len(keys), dtype=np.int64)
+    while pending.size:
+        probe = positions[pending]
+        free = slots[probe] == 0
+        # The first pending row aimed at each free slot claims it; the rest probe on
+        claimed, first = np.unique(probe[free], return_index=True)
+        winners = pending[free][first]
+        slots[claimed] = winners + 1
+        placed = np.zeros(len(keys), dtype=bool)
+        placed[winners] = True
+        pending = pending[~placed[pending]]
+        positions[pending] = (positions[pending] + 1) & mask
+    return slots
+
+
+def _column_array(series: pd.Series) -> np.ndarray:
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.bool_)
+    if pd.api.types.is_integer_dtype(series):
+        return series.to_numpy(dtype="<i8")
+    if pd.api.types.is_float_dtype(series):
+        return series.to_numpy(dtype="<f8")
+    encoded = series.fillna("").astype(str).str.encode("utf-8")
+    return np.array(encoded.tolist(), dtype=f"S{max(1, encoded.str.len().max() or 1)}")
+
+
+def write_table(df: pd.DataFrame, key: str, path: str) -> None:
+    """Write a DataFrame as an aligned columnar file with a hash index on `key`."""
+    if not df[key].is_unique:
+        raise ValueError(f"Catalog key column {key} contains duplicates")
+
+    arrays = {name: _column_array(df[name]) for name in df.columns}
+    arrays["__index__"] = _build_index(arrays[key])
+
+    columns = []
+    offset = 0
+    for name, values in arrays.items():
+        columns.append({"name": name, "dtype": values.dtype.str, "length": len(values), "offset": offset})
+        offset += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({"rows": len(df), "key": key, "columns": columns}).encode("utf-8")
+    data_start = -(-(len(MAGIC) + HEADER_SIZE.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as table_file:
+        table_file.write(MAGIC + HEADER_SIZE.pack(len(header)) + header)
+        for column, values in zip(columns, arrays.values()):
+            table_file.seek(data_start + column["offset"])
+            table_file.write(values.tobytes())
+        table_file.truncate(data_start + offset)
+    # Atomic so concurrent workers compiling the same source never see a partial file
+    os.replace(temp_path, path)
+
+
+class MappedTable(Mapping):
+    """Read-only dict-of-dicts view over a compiled catalog file.
+
+    Columns are memory-mapped, so the OS shares their pages between every
+    process that maps the same file and only touched pages are read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as table_file:
+            if table_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compiled catalog")
+            (header_length,) = HEADER_SIZE.unpack(table_file.read(HEADER_SIZE.size))
+            header = json.loads(table_file.read(header_length))
+        data_start = -(-(len(MAGIC) + HEADER_SIZE.size + header_length) // ALIGNMENT) * ALIGNMENT
+
+        self.key = header["key"]
+        self._rows = header["rows"]
+        self._columns: Dict[str, np.ndarray] = {}
+        for column in header["columns"]:
+            # Plain ndarray views over the mapping skip memmap's per-access overhead
+            self._columns[column["name"]] = np.memmap(
+                path, dtype=np.dtype(column["dtype"]), mode="r",
+                offset=data_start + column["offset"], shape=(column["length"],)
+            ).view(np.ndarray)
+        self._slots = self._columns.pop("__index__")
+        self._keys = self._columns[self.key]
+        self._key_width = self._keys.dtype.itemsize
+        self._value_columns = [(name, values) for name, values in self._columns.items() if name != self.key]
+
+    def position(self, key: str) -> Optional[int]:
+        """Row number of `key`, or None."""
+        raw = key.encode("utf-8")
+        if len(raw) > self._key_width:
+            return None
+        mask = len(self._slots) - 1
+        slot = _hash_key(raw.ljust(self._key_width, b"\0")) & mask
+        while True:
+            row = int(self._slots[slot]) - 1
+            if row < 0:
+                return None
+            if self._keys[row] == raw:
+                return row
+            slot = (slot + 1) & mask
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        row = self.position(key)
+        if row is None:
+            raise KeyError(key)
+        record = {}
+        for name, values in self._value_columns:
+            value = values[row]
+            record[name] = value.decode("utf-8") if isinstance(value, bytes) else value.item()
+        return record
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.position(key) is not None
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        for raw in self._keys:
+            yield raw.decode("utf-8")
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the table as a DataFrame, decoding string columns."""
+        data = {}
+        for name, values in self._columns.items():
+            data[name] = np.char.decode(values, "utf-8").astype(object) if values.dtype.kind == "S" else np.asarray(values)
+        return pd.DataFrame(data)
+
+
+class PatchedTable(Mapping):
+    """A mapped table with the rows a live reload changed, added or removed layered over it.
+
+    Reloads patch the table instead of compiling the new file, so their cost
+    follows the number of changed rows; the next startup compiles the file.
+    Row positions differ from the mapped file's, so there is no position().
+    """
+
+    def __init__(self, base: MappedTable, changed: Dict[str, Dict[str, Any]], removed: Iterable[str]):
+        self.base = base
+        self.path = base.path
+        self.key = base.key
+        self.changed = changed
+        # Only keys of the mapped file need hiding; added rows are simply left out of changed
+        self.removed = frozenset(key for key in removed if key in base and key not in changed)
+        self._added = [key for key in changed if key not in base]
+
+    def patch(self, changed: Dict[str, Dict[str, Any]], removed: Iterable[str]) -> "PatchedTable":
+        """This table with another reload's changes applied."""
+        removed = list(removed)
+        merged = {**self.changed, **changed}
+        for key in removed:
+            merged.pop(key, None)
+        return PatchedTable(self.base, merged, (self.removed - changed.keys()) | set(removed))
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        row = self.changed.get(key)
+        if row is not None:
+            return row
+        if key in self.removed:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.changed or (key not in self.removed and key in self.base)
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.removed) + len(self._added)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.base:
+            if key not in self.removed:
+                yield key
+        yield from self._added
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([{self.key: key, **self[key]} for key in self])
+
+
+def patch_table(table: Mapping, changed: Dict[str, Dict[str, Any]], removed: Iterable[str]) -> PatchedTable:
+    """Layer a reload's changes over a mapped or already patched table."""
+    if isinstance(table, PatchedTable):
+        return table.patch(changed, removed)
+    return PatchedTable(table, changed, removed)
+
+
+def _read_manifest(manifest_path: str) -> Dict[str, Any]:
+    try:
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest_path: str, manifest: Dict[str, Any]) -> None:
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(temp_path, manifest_path)
+
+
+def source_hash(path: str, cache_dir: str) -> str:
+    """Content hash of a source file, reusing the recorded hash while its stat is unchanged."""
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+
+    stat = os.stat(path)
+    signature = [stat.st_mtime_ns, stat.st_size]
+    source_key = os.path.abspath(path)
+    entry = manifest.get(source_key)
+    if entry and entry["signature"] == signature:
+        return entry["hash"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(block)
+    manifest[source_key] = {"signature": signature, "hash": digest.hexdigest()}
+    _write_manifest(manifest_path, manifest)
+    return digest.hexdigest()
+
+
+def _table_prefix(csv_path: str) -> str:
+    # Tagged with the source's path, so sources with the same file name never share or prune each other's tables
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return f"{name}-{hashlib.sha256(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:8]}-"
+
+
+def load_table(csv_path: str, key: str, cache_dir: str) -> Tuple[MappedTable, Optional[pd.DataFrame]]:
+    """Map the compiled form of a CSV, compiling it first if this source has not been seen.
+
+    Returns the mapped table and, when a compile was needed, the parsed DataFrame.
+    """
+    source_hash_value = source_hash(csv_path, cache_dir)
+    table_path = os.path.join(cache_dir, f"{_table_prefix(csv_path)}{source_hash_value[:16]}.cat")
+
+    df = None
+    if not os.path.exists(table_path):
+        df = pd.read_csv(csv_path)
+        write_table(df, key, table_path)
+        logger.info(f"Compiled {csv_path} ({len(df)} rows) to {table_path}")
+    return MappedTable(table_path), df
+
+
+def prune_tables(csv_path: str, cache_dir: str, keep: Iterable[str]) -> int:
+    """Delete this source's compiled tables other than `keep`, and everything of sources that no longer exist.
+
+    Processes that still map a deleted table keep reading it; the file's
+    space is freed when the last of them unmaps it. Returns the files removed.
+    """
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+    vanished = [source for source in manifest if not os.path.exists(source)]
+    prefixes = tuple(_table_prefix(source) for source in vanished)
+    prefix = _table_prefix(csv_path)
+    keep = {os.path.basename(path) for path in keep}
+
+    removed = 0
+    for file_name in os.listdir(cache_dir):
+        if not file_name.endswith(".cat"):
+            continue
+        if (file_name.startswith(prefix) and file_name not in keep) or (prefixes and file_name.startswith(prefixes)):
+            try:
+                os.remove(os.path.join(cache_dir, file_name))
+                removed += 1
+            except FileNotFoundError:
+                pass  # Another process pruned it first
+
+    if vanished:
+        for source in vanished:
+            del manifest[source]
+        _write_manifest(manifest_path, manifest)
+    return removed
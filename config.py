@@ -1,10 +1,117 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from lazy import once
 
 # Load environment variables
 load_dotenv()
 
-# Initialize shared LLM instance
-from langchain_openai import ChatOpenAI
-llm = ChatOpenAI(model="gpt-4-turbo-preview", temperature=0)
\ No newline at end of file
+
+@once
+def get_llm():
+    """Shared LLM instance for the configured LLM_PROVIDER, created on first use."""
+    from llm_provider import build_llm, ResilientChatModel, SingleFlightChatModel
+    from metrics import llm_callbacks
+    llm = build_llm(LLM_PROVIDER, LLM_CASSETTE_PATH, FAKE_LLM_LATENCY, FAKE_LLM_SEED,
+                    LLM_BASE_URL, LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_POOL_SIZE)
+    if LLM_RESILIENT:
+        llm = ResilientChatModel(inner=llm)
+    # Coalescing goes outside, so a shared call is hedged and timed once
+    if LLM_SINGLE_FLIGHT:
+        llm = SingleFlightChatModel(inner=llm)
+    llm.callbacks = llm_callbacks()
+    return llm
+
+
+def __getattr__(name):
+    # Keep `from config import llm` working for callers outside this package
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# LLM backend: "openai", "fake" (offline, rule-based), "record" (openai, saved to the
+# cassette) or "replay" (answers only from the cassette)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "llm_cassette.json")
+# Fake model delay per call, e.g. "0.2", "uniform:0.1:0.5" or "lognormal:0.3:0.4" (seconds)
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "0")
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+# Concurrent identical LLM requests share one call
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+
+# Resilient LLM client. OpenAI endpoint (empty for the default; point it at
+# benchmarks/stub_llm_server.py to test locally), per-call timeout, client
+# retries and HTTP connection pool size
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))
+# Wrap the model with deadlines, hedging and a circuit breaker
+LLM_RESILIENT = os.getenv("LLM_RESILIENT", "true").lower() == "true"
+# Seconds all LLM calls for one order may take together (0 for per-call timeouts only)
+ORDER_LLM_BUDGET = float(os.getenv("ORDER_LLM_BUDGET", "60"))
+# Send a duplicate request when a call is slower than this latency percentile of
+# recent calls (and the minimum delay), for at most this share of calls (0 disables)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05"))
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+# Fail fast for the cooldown after this many consecutive failed calls (0 disables);
+# meanwhile order extraction falls back to the rule-based parser if enabled
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+LLM_FALLBACK_PARSER = os.getenv("LLM_FALLBACK_PARSER", "true").lower() == "true"
+# Extra attempts when an extraction reply does not match its schema
+LLM_EXTRACTION_RETRIES = int(os.getenv("LLM_EXTRACTION_RETRIES", "1"))
+# Approximate tokens of conversation sent to the tool-calling model per step
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "2000"))
+
+# Logging: root level, per-module levels ("nodes=INFO,batch=WARNING"), "text" or "json"
+# records, log file (empty for console only) and a cap on DEBUG lines per second per
+# call site (0 for no cap). Records go through a bounded queue to a background thread.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_FILE = os.getenv("LOG_FILE", "order_management.log")
+LOG_DEBUG_RATE = float(os.getenv("LOG_DEBUG_RATE", "0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Node, LLM-call and lock-wait metrics; set METRICS_PORT to serve them at /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Time waits on the order store's stripe locks while metrics are enabled; false keeps them plain Locks
+METRICS_LOCK_WAITS = os.getenv("METRICS_LOCK_WAITS", "true").lower() == "true"
+
+# Extraction cache settings (set EXTRACTION_CACHE_PATH to enable the on-disk tier)
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "1024"))
+EXTRACTION_CACHE_TTL = float(os.getenv("EXTRACTION_CACHE_TTL", "3600"))
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH") or None
+
+# Maximum concurrent LLM requests issued by the batch intake API
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Orders kept in flight by the asyncio runner
+ORDER_CONCURRENCY = int(os.getenv("ORDER_CONCURRENCY", "32"))
+
+# Most distinct items one cart order may hold
+ORDER_MAX_LINES = int(os.getenv("ORDER_MAX_LINES", "100"))
+
+# Order store retention: live orders beyond these limits are archived in
+# compact form, and archived orders beyond them are dropped
+STATE_MAX_LIVE_ORDERS = int(os.getenv("STATE_MAX_LIVE_ORDERS", "100000"))
+STATE_MAX_ARCHIVED_ORDERS = int(os.getenv("STATE_MAX_ARCHIVED_ORDERS", "1000000"))
+STATE_MAX_ORDER_AGE = float(os.getenv("STATE_MAX_ORDER_AGE", "86400"))
+
+# Durable order store: set STATE_JOURNAL_DIR to journal writes and recover on startup
+STATE_JOURNAL_DIR = os.getenv("STATE_JOURNAL_DIR") or None
+STATE_SNAPSHOT_EVERY = int(os.getenv("STATE_SNAPSHOT_EVERY", "100000"))
+STATE_JOURNAL_FSYNC = os.getenv("STATE_JOURNAL_FSYNC", "true").lower() == "true"
+
+# Seconds between checks of the data files for changes (0 disables live reload)
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "2"))
+
+# Directory for compiled, memory-mapped catalog tables (empty to parse the CSVs directly)
+CATALOG_CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", ".catalog_cache") or None
+
+# Shipping tariff (zone, weight band, base and per-weight cents) and the number of quotes cached
+SHIPPING_RATES_PATH = os.getenv("SHIPPING_RATES_PATH", "data/shipping_rates.csv")
+SHIPPING_QUOTE_CACHE_SIZE = int(os.getenv("SHIPPING_QUOTE_CACHE_SIZE", "4096"))
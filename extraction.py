@@ -0,0 +1,154 @@
+from threading import Lock
+from typing import Any, Dict, List, Literal, Optional, Type
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from pydantic import BaseModel, Field, ValidationError
+
+from config import get_llm, LLM_EXTRACTION_RETRIES
+from lazy import once
+from logger_config import get_logger
+
+logger = get_logger("extraction")
+
+
+class OrderLine(BaseModel):
+    """One item of a cart order."""
+    item_id: str = Field(description="Format item_XX")
+    quantity: int = Field(gt=0, description="Units of this item")
+
+
+class OrderExtraction(BaseModel):
+    """Order details from a customer's message."""
+    # category comes first so it is the first field the model streams
+    category: Literal["PlaceOrder", "CancelOrder"] = Field(
+        description="PlaceOrder for a new order, CancelOrder for a cancellation")
+    customer_id: Optional[str] = Field(None, description="Format customer_XX; required for PlaceOrder")
+    item_id: Optional[str] = Field(None, description="Format item_XX; required for PlaceOrder")
+    quantity: Optional[int] = Field(None, gt=0, description="Units ordered; required for PlaceOrder")
+    lines: Optional[List[OrderLine]] = Field(
+        None, description="Every item with its quantity, when the order is for more than one item; "
+                          "item_id and quantity are left out then")
+    location: Literal["local", "domestic", "international"] = Field(
+        "domestic", description="Shipping destination")
+    cancel_order_id: Optional[str] = Field(
+        None, description="The order to cancel, for CancelOrder; omit it unless the text names exactly one order")
+
+
+class CancelExtraction(BaseModel):
+    """The order a cancellation request refers to."""
+    order_id: Optional[str] = Field(description="The order id, as a string")
+
+
+class ExtractionError(ValueError):
+    """The model's reply did not match the schema, even after retrying."""
+
+
+class ExtractionStats:
+    """Structured extraction calls, and the retries parse failures caused."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def record(self, retries: int, failed: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            self.failures += failed
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"calls": self.calls, "retries": self.retries, "failures": self.failures}
+
+
+extraction_stats = ExtractionStats()
+
+
+def _bind(schema: Type[BaseModel]):
+    # Forcing the one tool makes the model answer with arguments matching the schema
+    return get_llm().bind_tools([schema], tool_choice={"type": "function", "function": {"name": schema.__name__}})
+
+
+@once
+def get_order_extractor():
+    """LLM bound to the OrderExtraction schema, created on first use."""
+    return _bind(OrderExtraction)
+
+
+@once
+def get_cancel_extractor():
+    """LLM bound to the CancelExtraction schema, created on first use."""
+    return _bind(CancelExtraction)
+
+
+def parse_reply(reply: BaseMessage, schema: Type[BaseModel]) -> BaseModel:
+    """Validate the schema tool call in a model reply; raises ExtractionError if there is none or it is invalid."""
+    for call in getattr(reply, "tool_calls", None) or []:
+        if call["name"] == schema.__name__:
+            try:
+                return schema.model_validate(call["args"])
+            except ValidationError as e:
+                raise ExtractionError(f"Invalid {schema.__name__}: {e.errors(include_url=False)}") from e
+    for call in getattr(reply, "invalid_tool_calls", None) or []:
+        raise ExtractionError(f"Malformed {schema.__name__} arguments: {call.get('error') or call.get('args')}")
+    raise ExtractionError(f"The reply did not call {schema.__name__}")
+
+
+def _repair_messages(reply: BaseMessage, schema: Type[BaseModel], error: ExtractionError) -> List[BaseMessage]:
+    """Messages telling the model what was wrong, to send along with its reply on the retry."""
+    correction = f"{error}. Call {schema.__name__} again with corrected arguments."
+    calls = (getattr(reply, "tool_calls", None) or []) + (getattr(reply, "invalid_tool_calls", None) or [])
+    if isinstance(reply, AIMessage) and calls and all(call.get("id") for call in calls):
+        # Every tool call needs a result before the next user turn
+        return [reply] + [ToolMessage(content=correction, tool_call_id=call["id"]) for call in calls]
+    return [reply, HumanMessage(content=correction)]
+
+
+def extract(extractor, messages: List[BaseMessage], schema: Type[BaseModel],
+            reply: Optional[BaseMessage] = None) -> Dict[str, Any]:
+    """Ask the extractor for `schema`, retrying up to LLM_EXTRACTION_RETRIES times on invalid replies.
+
+    `reply` is a reply already received for `messages` (e.g. from a batch
+    call) to check before asking again. Returns the validated fields,
+    leaving out the ones the model did not set.
+    """
+    for attempt in range(LLM_EXTRACTION_RETRIES + 1):
+        if reply is None:
+            reply = extractor.invoke(messages)
+        try:
+            result = parse_reply(reply, schema)
+        except ExtractionError as e:
+            if attempt == LLM_EXTRACTION_RETRIES:
+                extraction_stats.record(attempt, failed=True)
+                raise
+            logger.warning("Retrying %s extraction: %s", schema.__name__, e)
+            messages, reply = messages + _repair_messages(reply, schema, e), None
+            continue
+        extraction_stats.record(attempt, failed=False)
+        return result.model_dump(exclude_none=True)
+
+
+async def aextract(extractor, messages: List[BaseMessage], schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Async variant of extract."""
+    for attempt in range(LLM_EXTRACTION_RETRIES + 1):
+        reply = await extractor.ainvoke(messages)
+        try:
+            result = parse_reply(reply, schema)
+        except ExtractionError as e:
+            if attempt == LLM_EXTRACTION_RETRIES:
+                extraction_stats.record(attempt, failed=True)
+                raise
+            logger.warning("Retrying %s extraction: %s", schema.__name__, e)
+            messages = messages + _repair_messages(reply, schema, e)
+            continue
+        extraction_stats.record(attempt, failed=False)
+        return result.model_dump(exclude_none=True)
+
+
+def validated(data: Dict[str, Any], schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Validate already-parsed fields (e.g. from the fallback parser) against a schema."""
+    try:
+        return schema.model_validate(data).model_dump(exclude_none=True)
+    except ValidationError as e:
+        raise ExtractionError(f"Invalid {schema.__name__}: {e.errors(include_url=False)}") from e
@@ -0,0 +1,221 @@
+from array import array
+from threading import Lock
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple, Union
+
+from catalog import get_catalog
+from lazy import once
+
+
+class InventoryEngine:
+    """Stock and reserved-unit counters held in flat arrays indexed by item.
+
+    reserve holds units for an order, commit turns the hold into a sale and
+    release returns the units, whether still held or already committed (a
+    cancellation). Every operation runs under one lock, so it is atomic with
+    respect to the others.
+
+    Item positions come from a locator function, so a memory-mapped catalog's
+    hash index can be used directly instead of building a dict per item.
+
+    Committed sales are kept so a cancellation can return them; expire drops
+    an order's entry once the order store no longer retains the order.
+
+    A cart order is reserved with reserve_lines, which checks and holds all
+    of its lines in one vectorized pass over the counters, or none of them.
+    """
+
+    def __init__(self, locate: Callable[[str], Optional[int]], stock: Sequence[int]):
+        self._lock = Lock()
+        self._locate = locate
+        # Items added or removed by catalog reloads, layered over the locator
+        self._added: Dict[str, int] = {}
+        self._retired = set()
+        self._stock = array("q")
+        if hasattr(stock, "tobytes"):
+            self._stock.frombytes(stock.astype("<i8").tobytes())
+        else:
+            self._stock.extend(int(units) for units in stock)
+        self._reserved = array("q", bytes(8 * len(self._stock)))
+        # order_id -> (item position, quantity, committed); a cart holds arrays of positions and quantities
+        self._reservations: Dict[str, Tuple[Union[int, Any], Union[int, Any], bool]] = {}
+
+    @classmethod
+    def from_items(cls, item_ids: Sequence[str], stock: Sequence[int]) -> "InventoryEngine":
+        index = {item_id: position for position, item_id in enumerate(item_ids)}
+        return cls(index.get, stock)
+
+    @classmethod
+    def from_table(cls, table) -> "InventoryEngine":
+        """Build counters from a catalog inventory table (dict-of-dicts or mapped table)."""
+        if hasattr(table, "position"):
+            return cls(table.position, table.column("stock"))
+        item_ids = list(table)
+        return cls.from_items(item_ids, [table[item_id]["stock"] for item_id in item_ids])
+
+    def _position(self, item_id: str) -> Optional[int]:
+        position = self._added.get(item_id)
+        if position is None and item_id not in self._retired:
+            position = self._locate(item_id)
+        return position
+
+    def _require(self, item_id: str) -> int:
+        position = self._position(item_id)
+        if position is None:
+            raise KeyError(item_id)
+        return position
+
+    def __contains__(self, item_id: str) -> bool:
+        return self._position(item_id) is not None
+
+    def available(self, item_id: str) -> int:
+        """Units that can still be reserved."""
+        position = self._require(item_id)
+        return self._stock[position] - self._reserved[position]
+
+    def _reserve(self, order_id: str, item_id: str, quantity: int) -> bool:
+        if order_id in self._reservations:
+            return True
+        position = self._require(item_id)
+        if quantity <= 0 or self._stock[position] - self._reserved[position] < quantity:
+            return False
+        self._reserved[position] += quantity
+        self._reservations[order_id] = (position, quantity, False)
+        return True
+
+    def reserve(self, order_id: str, item_id: str, quantity: int) -> bool:
+        """Hold units for an order; False if not enough are available. Raises KeyError for unknown items."""
+        with self._lock:
+            return self._reserve(order_id, item_id, quantity)
+
+    def reserve_batch(self, order_ids: Sequence[str], item_ids: Sequence[str],
+                      quantities: Sequence[int]) -> List[bool]:
+        """Reserve for many orders in one critical section, in order."""
+        with self._lock:
+            return [
+                self._reserve(order_id, item_id, int(quantity))
+                for order_id, item_id, quantity in zip(order_ids, item_ids, quantities)
+            ]
+
+    def reserve_lines(self, order_id: str, item_ids: Sequence[str], quantities: Sequence[int]) -> Dict[str, int]:
+        """Hold units for every line of an order, or for none of them.
+
+        Returns the units available for each line that could not be met, by
+        item id; empty means the whole order is held. Lines naming the same
+        item are added together. Raises KeyError for unknown items.
+        """
+        if len(item_ids) == 1:
+            item_id = item_ids[0]
+            with self._lock:
+                if self._reserve(order_id, item_id, int(quantities[0])):
+                    return {}
+                position = self._require(item_id)
+                return {item_id: self._stock[position] - self._reserved[position]}
+
+        # numpy is imported on the first cart, keeping the single-item path free of it
+        import numpy as np
+        with self._lock:
+            if order_id in self._reservations:
+                return {}
+            wanted: Dict[int, int] = {}
+            names: Dict[int, str] = {}
+            for item_id, quantity in zip(item_ids, quantities):
+                position = self._require(item_id)
+                wanted[position] = wanted.get(position, 0) + int(quantity)
+                names[position] = item_id
+            positions = np.fromiter(wanted, dtype=np.int64, count=len(wanted))
+            needed = np.fromiter(wanted.values(), dtype=np.int64, count=len(wanted))
+            # Views over the counters; released before the lock so apply_stock can still grow them
+            available = np.frombuffer(self._stock, dtype=np.int64)[positions] - \
+                np.frombuffer(self._reserved, dtype=np.int64)[positions]
+            short = (needed <= 0) | (available < needed)
+            if short.any():
+                return {names[int(position)]: int(units)
+                        for position, units in zip(positions[short], available[short])}
+            self._add(self._reserved, positions, needed)
+            self._reservations[order_id] = (positions, needed, False)
+            return {}
+
+    @staticmethod
+    def _add(counters: array, position, quantity) -> None:
+        """Add to one counter, or to many at once for a cart's arrays of positions and quantities."""
+        if isinstance(position, int):
+            counters[position] += quantity
+        else:
+            import numpy as np
+            # A cart's positions are distinct (reserve_lines merges repeated items), so a plain += is safe
+            np.frombuffer(counters, dtype=np.int64)[position] += quantity
+
+    def commit(self, order_id: str) -> bool:
+        """Turn an order's hold into a sale, removing the units from stock."""
+        with self._lock:
+            reservation = self._reservations.get(order_id)
+            if reservation is None:
+                return False
+            position, quantity, committed = reservation
+            if not committed:
+                self._add(self._reserved, position, -quantity)
+                self._add(self._stock, position, -quantity)
+                self._reservations[order_id] = (position, quantity, True)
+            return True
+
+    def release(self, order_id: str) -> bool:
+        """Return an order's units, whether held or already sold."""
+        with self._lock:
+            reservation = self._reservations.pop(order_id, None)
+            if reservation is None:
+                return False
+            position, quantity, committed = reservation
+            if committed:
+                self._add(self._stock, position, quantity)
+            else:
+                self._add(self._reserved, position, -quantity)
+            return True
+
+    def expire(self, order_id: str) -> None:
+        """Forget an order that is no longer retained: a sale's entry is dropped, a hold is released."""
+        with self._lock:
+            reservation = self._reservations.pop(order_id, None)
+            if reservation is not None and not reservation[2]:
+                self._add(self._reserved, reservation[0], -reservation[1])
+
+    def apply_stock(self, stock: Dict[str, int], removed: Sequence[str] = ()) -> None:
+        """Apply a catalog reload: set stock for changed items, add new ones, retire removed ones.
+
+        Retired items keep their counters so existing reservations can still
+        be committed or released, but accept no new reservations.
+        """
+        with self._lock:
+            for item_id, units in stock.items():
+                self._retired.discard(item_id)
+                position = self._position(item_id)
+                if position is None:
+                    self._added[item_id] = len(self._stock)
+                    self._stock.append(int(units))
+                    self._reserved.append(0)
+                else:
+                    self._stock[position] = int(units)
+            for item_id in removed:
+                self._added.pop(item_id, None)
+                self._retired.add(item_id)
+
+    def reservation(self, order_id: str) -> Optional[Dict[str, Any]]:
+        reservation = self._reservations.get(order_id)
+        if reservation is None:
+            return None
+        position, quantity, committed = reservation
+        return {"quantity": int(quantity if isinstance(quantity, int) else quantity.sum()), "committed": committed}
+
+
+@once
+def get_inventory_engine() -> InventoryEngine:
+    """Process-wide engine built from the catalog on first use and kept in step with its reloads.
+
+    Sales are kept only while the order store retains their orders, which is
+    as long as they can be cancelled.
+    """
+    from state_manager import state_manager
+    catalog = get_catalog()
+    engine = InventoryEngine.from_table(catalog.current().inventory)
+    catalog.on_stock_change(engine.apply_stock)
+    state_manager.on_drop(engine.expire)
+    return engine
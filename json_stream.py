@@ -0,0 +1,105 @@
+import json
+from typing import Any, Dict
+
+WHITESPACE = " \t\r\n"
+OPENERS = "{["
+CLOSERS = "}]"
+
+
+class ObjectStreamParser:
+    """Parse a JSON object as it streams in, field by field.
+
+    feed() takes the next fragment and returns the top-level fields it
+    completed, so a caller can act on the first field before the rest has
+    arrived. Only the top-level structure is tracked (nesting depth and
+    string escapes), each character is looked at once, and each completed
+    value is decoded with json. A string field completes at its closing
+    quote; other values complete at the following comma or brace.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._state = "start"
+        self._token = []
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        completed = {}
+        for char in text:
+            if self.done:
+                break
+            state = self._state
+            if state == "start":
+                if char == "{":
+                    self._state = "key"
+                elif char not in WHITESPACE:
+                    raise ValueError(f"Expected a JSON object, got {char!r}")
+            elif state == "key":
+                if char == '"':
+                    self._state, self._token = "key_string", ['"']
+                elif char == "}":
+                    self.done = True
+                elif char not in WHITESPACE + ",":
+                    raise ValueError(f"Expected a field name, got {char!r}")
+            elif state == "key_string":
+                self._token.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._key = json.loads("".join(self._token))
+                    self._state = "colon"
+            elif state == "colon":
+                if char == ":":
+                    self._state, self._token = "value", []
+                elif char not in WHITESPACE:
+                    raise ValueError(f"Expected ':' after {self._key!r}, got {char!r}")
+            elif state == "value":
+                self._value_char(char, completed)
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self.done = True
+                elif char not in WHITESPACE:
+                    raise ValueError(f"Expected ',' or '}}' after {self._key!r}, got {char!r}")
+        self.fields.update(completed)
+        return completed
+
+    def _value_char(self, char: str, completed: Dict[str, Any]) -> None:
+        if self._in_string:
+            self._token.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._complete(completed, "after_value")
+            return
+        if self._depth == 0 and char in ",}":
+            self._complete(completed, "key" if char == "," else "end")
+            return
+        if char in WHITESPACE and not self._token:
+            return
+        self._token.append(char)
+        if char == '"':
+            self._in_string = True
+        elif char in OPENERS:
+            self._depth += 1
+        elif char in CLOSERS:
+            self._depth -= 1
+
+    def _complete(self, completed: Dict[str, Any], next_state: str) -> None:
+        completed[self._key] = json.loads("".join(self._token))
+        self._token = []
+        if next_state == "end":
+            self.done = True
+        else:
+            self._state = next_state
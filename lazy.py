@@ -0,0 +1,22 @@
+from functools import wraps
+from threading import Lock
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def once(factory: Callable[[], T]) -> Callable[[], T]:
+    """Memoize a zero-argument factory, running it only once even if first called concurrently."""
+    lock = Lock()
+    instance = []
+
+    @wraps(factory)
+    def get() -> T:
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    get.is_initialized = lambda: bool(instance)
+    return get
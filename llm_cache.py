@@ -0,0 +1,126 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Any, Optional
+
+from config import EXTRACTION_CACHE_SIZE, EXTRACTION_CACHE_TTL, EXTRACTION_CACHE_PATH
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace and case so equivalent requests share a cache entry."""
+    return WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+
+
+class ExtractionCache:
+    """Bounded LRU/TTL cache for LLM extraction results with an optional on-disk tier."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extractions (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(prompt_version: str, query: str) -> str:
+        normalized = normalize_query(query)
+        return hashlib.sha256(f"{prompt_version}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt_version: str, query: str) -> Optional[Dict[str, Any]]:
+        key = self.make_key(prompt_version, query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+
+            value = self._disk_get(key)
+            if value is not None:
+                self._store(key, value, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(value)
+
+            self.misses += 1
+            return None
+
+    def set(self, prompt_version: str, query: str, value: Dict[str, Any]) -> None:
+        key = self.make_key(prompt_version, query)
+        with self._lock:
+            self._store(key, dict(value), time.monotonic())
+            self._disk_set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM extractions")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def _store(self, key: str, value: Dict[str, Any], now: float) -> None:
+        self._entries[key] = (value, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires FROM extractions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        # Disk entries use wall-clock expiry so they survive restarts
+        if row[1] <= time.time():
+            self._db.execute("DELETE FROM extractions WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return json.loads(row[0])
+
+    def _disk_set(self, key: str, value: Dict[str, Any]) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO extractions (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl)
+        )
+        self._db.commit()
+
+
+# Global instance
+extraction_cache = ExtractionCache(
+    max_size=EXTRACTION_CACHE_SIZE,
+    ttl=EXTRACTION_CACHE_TTL,
+    path=EXTRACTION_CACHE_PATH
+)
@@ -0,0 +1,421 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from threading import Lock
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage, AIMessageChunk, BaseMessage, message_to_dict, messages_from_dict
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field, PrivateAttr
+
+from config import (
+    LLM_TIMEOUT, LLM_POOL_SIZE, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY, LLM_HEDGE_MAX_RATIO,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN
+)
+from resilience import CircuitBreaker, ResilientCaller
+from single_flight import SingleFlight
+from order_parser import ORDER_ID_PATTERN, UUID_PATTERN, lenient_parse_order
+
+PROVIDERS = ("openai", "fake", "record", "replay")
+
+# Prompt text the fake model recognizes (see prompts.CATEGORIZE_PROMPT and prompts.CANCEL_PROMPT)
+EXTRACTION_MARKER = "Extract order information"
+CANCEL_MARKER = "Extract the order_id"
+TEXT_PATTERN = re.compile(r"Text:\s*(.*?)(?:\n\s*\n|\Z)", re.DOTALL)
+
+
+class LatencyModel:
+    """Seeded latency distribution for the fake model.
+
+    Specs: "0" or "0.2" (fixed seconds), "uniform:LOW:HIGH",
+    "normal:MEAN:STDEV", "lognormal:MEDIAN:SIGMA", "exponential:MEAN".
+    """
+
+    def __init__(self, spec: str = "0", seed: int = 0):
+        self.spec = spec
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        try:
+            values = [float(value) for value in params.split(":")] if params else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if arity.get(kind) != len(values):
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.kind = kind
+        self.values = values
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.values[0]
+        with self._lock:
+            if self.kind == "uniform":
+                delay = self._random.uniform(*self.values)
+            elif self.kind == "normal":
+                delay = self._random.gauss(*self.values)
+            elif self.kind == "lognormal":
+                median, sigma = self.values
+                delay = median * self._random.lognormvariate(0, sigma)
+            else:
+                delay = self._random.expovariate(1 / self.values[0])
+        return max(0.0, delay)
+
+
+def _last_order_id(text: str) -> Optional[str]:
+    """The order id mentioned last, for requests that correct themselves ("no, the other one")."""
+    order_ids = [match.lower() for match in UUID_PATTERN.findall(text)] or ORDER_ID_PATTERN.findall(text)
+    return order_ids[-1] if order_ids else None
+
+
+def _structured_answer(prompt: str) -> Optional[Dict[str, Any]]:
+    """Fields the extraction prompts ask for, or None for any other prompt."""
+    text_match = TEXT_PATTERN.search(prompt)
+    text = text_match.group(1).strip() if text_match else prompt
+    if EXTRACTION_MARKER in prompt:
+        return lenient_parse_order(text)
+    if CANCEL_MARKER in prompt:
+        return {"order_id": _last_order_id(text)}
+    return None
+
+
+def fake_reply(turns: List[Tuple[str, str]], tools: Optional[List[Dict[str, Any]]] = None) -> AIMessage:
+    """Deterministic answer to one of this project's prompts, given the conversation as (message type, text) pairs.
+
+    With tools bound, an extraction prompt is answered by calling the first
+    tool with the extracted fields; otherwise the reply calls the first tool
+    with the latest human message, or reports the tool's result once the
+    last message is one.
+    """
+    prompt = "\n".join(text for kind, text in turns if kind == "human")
+    answer = _structured_answer(prompt)
+    if tools:
+        kind, text = turns[-1] if turns else ("human", "")
+        if answer is None and kind == "tool":
+            return AIMessage(content=text)
+        query = next((text for kind, text in reversed(turns) if kind == "human"), text)
+        call_id = "call_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        return AIMessage(content="", tool_calls=[{
+            "name": tools[0]["function"]["name"], "args": answer if answer is not None else {"query": query},
+            "id": call_id
+        }])
+    return AIMessage(content=json.dumps(answer) if answer is not None else "OK")
+
+
+def _usage(prompt: str, reply: AIMessage) -> Dict[str, int]:
+    """Approximate token counts at four characters per token, so usage metrics have data offline."""
+    output = len(reply.content) + sum(len(json.dumps(call["args"])) for call in reply.tool_calls)
+    usage = {"input_tokens": len(prompt) // 4, "output_tokens": max(1, output // 4)}
+    usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+    return usage
+
+
+def _message_text(message: BaseMessage) -> str:
+    """Content plus any tool calls (without their per-run ids)."""
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps([{"name": call["name"], "args": call["args"]} for call in tool_calls])
+    return text
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(_message_text(message) for message in messages)
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model that answers this project's prompts by rule after a sampled delay.
+
+    Replies are a pure function of the prompt, so runs are repeatable; only
+    the delay is random, drawn from a seeded LatencyModel. Supports
+    bind_tools and token streaming like the OpenAI model it stands in for.
+    """
+    latency: LatencyModel = Field(default_factory=LatencyModel)
+    chunk_size: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-order-llm"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools) -> ChatResult:
+        prompt = _prompt_text(messages)
+        reply = fake_reply([(message.type, _message_text(message)) for message in messages], tools)
+        reply.usage_metadata = _usage(prompt, reply)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency.sample())
+        return self._reply(messages, tools)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency.sample())
+        return self._reply(messages, tools)
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        # The sampled delay is the time to first token
+        time.sleep(self.latency.sample())
+        prompt = _prompt_text(messages)
+        reply = fake_reply([(message.type, _message_text(message)) for message in messages], tools)
+        if reply.tool_calls:
+            # Arguments arrive in pieces, like a provider streaming a function call
+            for index, call in enumerate(reply.tool_calls):
+                args = json.dumps(call["args"])
+                for start in range(0, len(args), self.chunk_size):
+                    first = start == 0
+                    last = index == len(reply.tool_calls) - 1 and start + self.chunk_size >= len(args)
+                    chunk = ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[{
+                        "name": call["name"] if first else None, "args": args[start:start + self.chunk_size],
+                        "id": call["id"] if first else None, "index": index
+                    }], usage_metadata=_usage(prompt, reply) if last else None))
+                    if run_manager:
+                        run_manager.on_llm_new_token("", chunk=chunk)
+                    yield chunk
+            return
+        for start in range(0, len(reply.content), self.chunk_size):
+            last = start + self.chunk_size >= len(reply.content)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=reply.content[start:start + self.chunk_size],
+                usage_metadata=_usage(prompt, reply) if last else None
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class CassetteMiss(LookupError):
+    """A replayed prompt that was never recorded."""
+
+
+class CassetteChatModel(BaseChatModel):
+    """Record real model responses to a JSON cassette, or replay them offline.
+
+    In "record" mode prompts already on the cassette are replayed and new
+    ones are sent to `inner` and saved. In "replay" mode a prompt missing
+    from the cassette raises CassetteMiss. Prompts are keyed by message
+    type, content (minus per-run message ids) and bound tools.
+    """
+    path: str
+    mode: str = "replay"
+    inner: Optional[BaseChatModel] = None
+    _lock: Any = PrivateAttr(default_factory=Lock)
+    _interactions: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {self.mode}")
+        if self.mode == "record" and self.inner is None:
+            raise ValueError("Recording needs an inner model")
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as cassette:
+                self._interactions = json.load(cassette).get("interactions", {})
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette-{self.mode}"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    @staticmethod
+    def make_key(messages: List[BaseMessage], tools, stop) -> str:
+        request = {
+            "messages": [(message.type, _message_text(message)) for message in messages],
+            "tools": tools or [],
+            "stop": stop or []
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[ChatResult]:
+        interaction = self._interactions.get(key)
+        if interaction is None:
+            if self.mode == "replay":
+                raise CassetteMiss(f"No recorded response for prompt {key[:12]} in {self.path}")
+            return None
+        message = messages_from_dict([interaction["response"]])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _save(self, key: str, messages: List[BaseMessage], response: BaseMessage) -> None:
+        with self._lock:
+            self._interactions[key] = {
+                "request": [message_to_dict(message) for message in messages],
+                "response": message_to_dict(response)
+            }
+            # Write to a temporary file first so an interrupted run keeps the old cassette
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as cassette:
+                json.dump({"version": 1, "interactions": self._interactions}, cassette, indent=1)
+            os.replace(temporary, self.path)
+
+    def _call_kwargs(self, tools, kwargs) -> Dict[str, Any]:
+        return {**kwargs, "tools": tools} if tools else kwargs
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        key = self.make_key(messages, tools, stop)
+        result = self._lookup(key)
+        if result is None:
+            response = self.inner.invoke(messages, stop=stop, **self._call_kwargs(tools, kwargs))
+            self._save(key, messages, response)
+            result = ChatResult(generations=[ChatGeneration(message=response)])
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        key = self.make_key(messages, tools, stop)
+        result = self._lookup(key)
+        if result is None:
+            response = await self.inner.ainvoke(messages, stop=stop, **self._call_kwargs(tools, kwargs))
+            self._save(key, messages, response)
+            result = ChatResult(generations=[ChatGeneration(message=response)])
+        return result
+
+
+class SingleFlightChatModel(BaseChatModel):
+    """Share one in-flight call among concurrent identical requests to `inner`.
+
+    Identical means the same model parameters, prompt (as keyed for
+    cassettes), bound tools, stop words and call options. Sync and async
+    calls coalesce separately, so a blocking caller never waits on a
+    coroutine scheduled on its own event loop. Callers that joined a call
+    receive a copy of its result. This assumes replies are deterministic
+    enough to share, as they are at temperature 0.
+    """
+    inner: BaseChatModel
+    flights: Any = Field(default_factory=lambda: llm_flights)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"single-flight-{self.inner._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _key(self, mode: str, messages, stop, tools, kwargs) -> tuple:
+        params = json.dumps(self.inner._identifying_params, sort_keys=True, default=str)
+        options = json.dumps(kwargs, sort_keys=True, default=str)
+        return mode, params, CassetteChatModel.make_key(messages, tools, stop), options
+
+    def _inner_kwargs(self, stop, tools, kwargs) -> Dict[str, Any]:
+        # The inner call picks up the calling graph node's config from context,
+        # so the graph's streaming handlers still see the leader's tokens
+        options = {**kwargs, "stop": stop}
+        if tools:
+            options["tools"] = tools
+        return options
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        response, shared = self.flights.do(
+            self._key("sync", messages, stop, tools, kwargs),
+            lambda: self.inner.invoke(messages, **self._inner_kwargs(stop, tools, kwargs))
+        )
+        return ChatResult(generations=[ChatGeneration(message=response.model_copy(deep=True) if shared else response)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        response, shared = await self.flights.ado(
+            self._key("async", messages, stop, tools, kwargs),
+            lambda: self.inner.ainvoke(messages, **self._inner_kwargs(stop, tools, kwargs))
+        )
+        return ChatResult(generations=[ChatGeneration(message=response.model_copy(deep=True) if shared else response)])
+
+
+class ResilientChatModel(BaseChatModel):
+    """Call `inner` through a ResilientCaller: deadlines, hedged requests and a circuit breaker.
+
+    The remaining time is passed to `inner` as its request timeout, so an
+    abandoned HTTP request ends at the deadline too. Hedged attempts run
+    without the caller's callbacks, so a duplicate request never streams
+    tokens into the graph or is counted twice in metrics.
+    """
+    inner: BaseChatModel
+    guard: Any = Field(default_factory=lambda: llm_guard)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _attempt_kwargs(self, stop, tools, kwargs, timeout: float, hedge: bool) -> Dict[str, Any]:
+        options = {**kwargs, "stop": stop, "timeout": timeout}
+        if tools:
+            options["tools"] = tools
+        if hedge:
+            options["config"] = {"callbacks": []}
+        return options
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        response = self.guard.call(
+            lambda timeout, hedge: self.inner.invoke(messages, **self._attempt_kwargs(stop, tools, kwargs, timeout, hedge))
+        )
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+        response = await self.guard.acall(
+            lambda timeout, hedge: self.inner.ainvoke(messages, **self._attempt_kwargs(stop, tools, kwargs, timeout, hedge))
+        )
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+def _openai_llm(base_url: Optional[str] = None, timeout: float = 30.0, max_retries: int = 1,
+                pool_size: int = 32) -> BaseChatModel:
+    import httpx
+    from langchain_openai import ChatOpenAI
+
+    # One bounded keep-alive pool per process, shared by every thread that calls the model
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return ChatOpenAI(
+        model="gpt-4-turbo-preview", temperature=0, base_url=base_url, timeout=timeout, max_retries=max_retries,
+        http_client=httpx.Client(limits=limits, timeout=timeout),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=timeout)
+    )
+
+
+def build_llm(provider: str, cassette_path: str = "llm_cassette.json", latency: str = "0", seed: int = 0,
+              base_url: Optional[str] = None, timeout: float = 30.0, max_retries: int = 1,
+              pool_size: int = 32) -> BaseChatModel:
+    """Create the chat model for a provider name (see PROVIDERS).
+
+    base_url points the OpenAI client at another compatible endpoint, such
+    as benchmarks/stub_llm_server.py; timeout, max_retries and pool_size
+    configure its HTTP client.
+    """
+    if provider in ("openai", "record"):
+        openai_llm = _openai_llm(base_url, timeout, max_retries, pool_size)
+        if provider == "openai":
+            return openai_llm
+        return CassetteChatModel(path=cassette_path, mode="record", inner=openai_llm)
+    if provider == "fake":
+        return FakeChatModel(latency=LatencyModel(latency, seed))
+    if provider == "replay":
+        return CassetteChatModel(path=cassette_path, mode="replay")
+    raise ValueError(f"Unknown LLM provider {provider!r}, expected one of {', '.join(PROVIDERS)}")
+
+
+# Global instance: in-flight LLM calls shared by every SingleFlightChatModel
+llm_flights = SingleFlight()
+
+# Global instance: deadline, hedging and breaker state shared by every ResilientChatModel;
+# a missing cassette entry says nothing about the endpoint, so it does not trip the breaker
+llm_guard = ResilientCaller(
+    call_timeout=LLM_TIMEOUT,
+    hedge_percentile=LLM_HEDGE_PERCENTILE,
+    hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+    hedge_max_ratio=LLM_HEDGE_MAX_RATIO,
+    breaker=CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN),
+    pool_size=LLM_POOL_SIZE,
+    ignore=(CassetteMiss,)
+)
@@ -1,30 +1,144 @@
 # New file: logger_config.py
+import atexit
+import json
 import logging
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_FILE, LOG_DEBUG_RATE, LOG_QUEUE_SIZE
+
+LOGGER_NAME = 'OrderManagementSystem'
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+
+# Argument types that cannot change after the call, so formatting them can wait for the log thread
+IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+# Attributes every LogRecord has; anything else was passed through `extra=`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Hand records to the log thread without formatting them on the caller's thread.
+
+    Messages whose arguments are all immutable are formatted by the listener;
+    anything else (order records, dicts) is formatted now, since the caller
+    may change it before the listener runs. The queue is bounded and never
+    blocks: when it is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not all(type(arg) in IMMUTABLE_TYPES for arg in
+                                   (record.args.values() if isinstance(record.args, dict) else record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue is much cheaper to put to than Queue but unbounded, so the bound is checked here
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site for records at or below `level`, so hot-path debug lines cannot flood the log.
+
+    Buckets are updated without a lock; under contention a call site may let
+    a record more or less through, which is fine for sampling.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.level = level
+        self.suppressed = 0
+        self._buckets: Dict[tuple, tuple] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        tokens, last = self._buckets.get(key, (self.burst, record.created))
+        tokens = min(self.burst, tokens + (record.created - last) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, record.created)
+            return True
+        self._buckets[key] = (tokens, record.created)
+        self.suppressed += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed with `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "nodes=INFO,batch=WARNING" into child logger levels."""
+    levels = {}
+    for entry in spec.split(","):
+        name, _, level = entry.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Child logger, e.g. get_logger("nodes"), whose level can be set on its own through LOG_LEVELS."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
 
 def setup_logger():
     # Create logger
-    logger = logging.getLogger('OrderManagementSystem')
-    logger.setLevel(logging.DEBUG)
-
-    # Create console handler with a higher log level
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(LOG_LEVEL.upper())
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        get_logger(name).setLevel(level)
 
-    # Create file handler which logs even debug messages
-    file_handler = logging.FileHandler('order_management.log')
-    file_handler.setLevel(logging.DEBUG)
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
 
-    # Create formatters and add it to the handlers
-    format_str = '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-    formatter = logging.Formatter(format_str)
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+    # Request threads only enqueue records; the listener thread formats and writes them
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue, LOG_QUEUE_SIZE)
+    if LOG_DEBUG_RATE > 0:
+        queue_handler.addFilter(RateLimitFilter(LOG_DEBUG_RATE))
+    logger.addHandler(queue_handler)
 
-    # Add the handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return logger, queue_handler, listener
 
-    return logger
 
-logger = setup_logger()
\ No newline at end of file
+logger, queue_handler, listener = setup_logger()
@@ -0,0 +1,374 @@
+import inspect
+import json
+import sys
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock, Thread
+from typing import Dict, Any, Callable, Iterable, List, Tuple
+
+from config import METRICS_ENABLED, METRICS_LOCK_WAITS
+
+# Latency bucket upper bounds in seconds, from 10us (node bodies) to 60s (slow LLM calls)
+LATENCY_BUCKETS = (
+    1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns (name, labels, value) samples read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram; observe is a bisect plus three increments."""
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (inf past the last bound)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """Process-wide metrics, read by scraping rather than pushed anywhere.
+
+    Hot paths fetch their Histogram/Counter once and keep it, so recording
+    costs no lookups. Figures other modules already keep (cache hit counts,
+    parser and cancel stats) are read by collectors at scrape time instead
+    of being recorded twice.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._collectors: List[Collector] = []
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+        return counter
+
+    def add_collector(self, collector: Collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collected(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        for collector in list(self._collectors):
+            try:
+                samples.extend(collector())
+            except Exception:
+                # A broken collector must not take the whole scrape down
+                continue
+        return samples
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric as plain data, histograms summarized with bucket quantiles."""
+        histograms = []
+        for (name, labels), histogram in list(self._histograms.items()):
+            histograms.append({
+                "name": name, "labels": dict(labels), "count": histogram.count, "sum": histogram.sum,
+                "p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95), "p99": histogram.quantile(0.99)
+            })
+        counters = [{"name": name, "labels": dict(labels), "value": counter.value}
+                    for (name, labels), counter in list(self._counters.items())]
+        gauges = [{"name": name, "labels": labels, "value": value} for name, labels, value in self._collected()]
+        return {"histograms": histograms, "counters": counters, "gauges": gauges}
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), histogram in sorted(list(self._histograms.items())):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), counter in sorted(list(self._counters.items())):
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {counter.value!r}")
+        for name, labels, value in self._collected():
+            declare(name, "gauge")
+            lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a graph node to record its latency and errors (an exception or an "error" in its output)."""
+    if not registry.enabled:
+        return node
+    latency = registry.histogram("order_node_seconds", node=name)
+    errors = registry.counter("order_node_errors_total", node=name)
+
+    if inspect.iscoroutinefunction(node):
+        @wraps(node)
+        async def timed_async(state):
+            start = time.perf_counter()
+            try:
+                result = await node(state)
+            except BaseException:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+            if type(result) is dict and result.get("error"):
+                errors.inc()
+            return result
+        return timed_async
+
+    @wraps(node)
+    def timed(state):
+        start = time.perf_counter()
+        try:
+            result = node(state)
+        except BaseException:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+        if type(result) is dict and result.get("error"):
+            errors.inc()
+        return result
+    return timed
+
+
+class TimedLock:
+    """Lock that records how long callers waited, paying for a clock only when it was already held.
+
+    The with-statement path is inlined into __enter__/__exit__, so an
+    uncontended acquire costs two Python calls over a plain Lock.
+    """
+    __slots__ = ("_lock", "_waits")
+
+    def __init__(self, name: str):
+        self._lock = Lock()
+        self._waits = registry.histogram("lock_wait_seconds", lock=name)
+
+    def _wait(self, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        self._waits.observe(time.perf_counter() - start)
+        return acquired
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            return True
+        return self._wait(timeout) if blocking else False
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        return self._lock.acquire(False) or self._wait()
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self._lock.release()
+
+
+def timed_lock(name: str):
+    """A TimedLock when metrics are enabled (unless METRICS_LOCK_WAITS is false), otherwise a plain Lock."""
+    return TimedLock(name) if registry.enabled and METRICS_LOCK_WAITS else Lock()
+
+
+class timer:
+    """Context manager recording the block's duration, e.g. `with timer("app_render_seconds", kind="token"):`."""
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, name: str, **labels: str):
+        self._histogram = registry.histogram(name, **labels) if registry.enabled else None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._histogram is not None:
+            self._histogram.observe(time.perf_counter() - self._start)
+
+
+def llm_callbacks() -> list:
+    """Callback handlers recording latency, tokens and errors of every LLM call, by graph node."""
+    if not registry.enabled:
+        return []
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._started: Dict[Any, Tuple[float, str]] = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+            self._started[run_id] = (time.perf_counter(), (metadata or {}).get("langgraph_node") or "none")
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            started = self._started.pop(run_id, None)
+            if started is None:
+                return
+            start, node = started
+            registry.histogram("llm_call_seconds", node=node).observe(time.perf_counter() - start)
+            usage = _usage(response)
+            for kind in ("input", "output"):
+                if usage.get(kind):
+                    registry.counter("llm_tokens_total", node=node, kind=kind).inc(usage[kind])
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            started = self._started.pop(run_id, None)
+            node = started[1] if started else "none"
+            registry.counter("llm_errors_total", node=node).inc()
+
+    return [LLMMetricsHandler()]
+
+
+def _usage(response) -> Dict[str, int]:
+    """Token counts from a chat result's usage_metadata, or the OpenAI-style llm_output."""
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {"input": usage.get("input_tokens", 0), "output": usage.get("output_tokens", 0)}
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return {"input": token_usage.get("prompt_tokens", 0), "output": token_usage.get("completion_tokens", 0)}
+
+
+def _order_stats() -> Iterable[Tuple[str, Dict[str, str], float]]:
+    # Read only modules the process already loaded; a scrape must not import the graph
+    llm_cache = sys.modules.get("llm_cache")
+    if llm_cache is not None:
+        stats = llm_cache.extraction_cache.stats()
+        for key in ("hits", "misses", "disk_hits", "size"):
+            yield f"extraction_cache_{key}", {}, stats[key]
+    order_parser = sys.modules.get("order_parser")
+    if order_parser is not None:
+        yield "fast_parser_hits", {}, order_parser.parser_stats.hits
+        yield "fast_parser_misses", {}, order_parser.parser_stats.misses
+    logger_config = sys.modules.get("logger_config")
+    if logger_config is not None:
+        yield "log_records_dropped", {}, logger_config.queue_handler.dropped
+        yield "log_records_suppressed", {}, sum(getattr(log_filter, "suppressed", 0)
+                                                for log_filter in logger_config.queue_handler.filters)
+    llm_provider = sys.modules.get("llm_provider")
+    if llm_provider is not None:
+        stats = llm_provider.llm_flights.stats()
+        yield "llm_single_flight_calls", {}, stats["calls"]
+        yield "llm_coalesced_calls", {}, stats["coalesced"]
+        stats = llm_provider.llm_guard.stats()
+        for key in ("hedges", "hedge_wins", "deadline_exceeded", "circuit_opens", "circuit_rejected"):
+            yield f"llm_{key}", {}, stats[key]
+        yield "llm_circuit_open", {}, int(stats["circuit_state"] != "closed")
+    shipping = sys.modules.get("shipping")
+    if shipping is not None and shipping.get_shipping_engine.is_initialized():
+        for key, value in shipping.get_shipping_engine().stats().items():
+            yield f"shipping_quote_cache_{key}", {}, value
+    extraction = sys.modules.get("extraction")
+    if extraction is not None:
+        for key, value in extraction.extraction_stats.as_dict().items():
+            yield f"extraction_{key}", {}, value
+    tools = sys.modules.get("tools")
+    if tools is not None:
+        for key, value in tools.cancel_stats.as_dict().items():
+            yield f"cancel_{key}", {}, value
+
+
+_server: List[Any] = []
+_server_lock = Lock()
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> None:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; safe to call more than once."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.render(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server:
+            return
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        _server.append(server)
+
+
+# Global instance
+registry = MetricsRegistry(enabled=METRICS_ENABLED)
+registry.add_collector(_order_stats)
@@ -3,377 +3,407 @@ import datetime
 import uuid
 from state_manager import state_manager
 import uuid
-from logger_config import logger
-from typing import Dict, Any, Optional
+from logger_config import get_logger
+from typing import Dict, Any, List, Optional
 from langchain_core.messages import AIMessage, BaseMessage
-from langchain_core.prompts import ChatPromptTemplate
-from config import llm
+from config import get_llm, LLM_FALLBACK_PARSER, LLM_CONTEXT_TOKENS, ORDER_MAX_LINES
+from lazy import once
 from typing import Literal
 from langgraph.graph import END
-import pandas as pd
 
 from state import MessagesState
-from tools import cancel_order
-
-# Load data
-inventory_df = pd.read_csv("data/inventory.csv")
-customers_df = pd.read_csv("data/customers.csv")
-
-# Convert to dictionaries
-inventory = inventory_df.set_index("item_id").T.to_dict()
-customers = customers_df.set_index("customer_id").T.to_dict()
+from tools import cancel_order, cancel_stats, TOOL_LOOP_LLM_CALLS, cancel_by_id
+from order_record import OrderRecord, order_lines
+from order_index import STATUS_FAILED
+from order_parser import fast_parse_order, lenient_parse_order, parser_stats
+from resilience import LLMUnavailable
+from prompts import CATEGORIZE_PROMPT, context_window
+from extraction import OrderExtraction, aextract, extract, get_order_extractor, validated
+from llm_cache import extraction_cache
+from inventory_engine import get_inventory_engine
+from catalog import get_catalog
+from shipping import format_cents, get_shipping_engine
+
+# Cached extractions are keyed by the prompt version
+CATEGORIZE_PROMPT_VERSION = CATEGORIZE_PROMPT.version
+
+# Checks that depend only on the parsed order; they run concurrently and join before payment
+ORDER_CHECK_STAGES = ("ValidateCustomer", "CheckInventory", "ComputeShipping")
 
 # Add tools configuration
 tools_2 = [cancel_order]
-llm_with_tools_2 = llm.bind_tools(tools_2)
 
 
-from logger_config import logger
+@once
+def get_llm_with_tools_2():
+    """LLM bound to the cancellation tools, created on first use."""
+    return get_llm().bind_tools(tools_2)
+
 
 # In nodes.py - Add these imports at the top (with existing imports)
 from state_manager import state_manager
 import uuid
-from logger_config import logger
+
+# Hot-path debug lines use %-style arguments so nothing is formatted when DEBUG is off
+logger = get_logger("nodes")
+
+
+def _merge_lines(parsed_data: Dict[str, Any]) -> None:
+    """Add up cart lines naming the same item; a cart of one item becomes a plain item_id/quantity order."""
+    lines = parsed_data.pop("lines", None)
+    if not lines:
+        return
+    quantities: Dict[str, int] = {}
+    for line in lines:
+        quantities[line["item_id"]] = quantities.get(line["item_id"], 0) + line["quantity"]
+    if len(quantities) > ORDER_MAX_LINES:
+        raise ValueError(f"Too many items in one order: {len(quantities)} (at most {ORDER_MAX_LINES})")
+    if len(quantities) == 1:
+        ((parsed_data["item_id"], parsed_data["quantity"]),) = quantities.items()
+        return
+    # The cart's lines replace any single item the extraction also filled in
+    parsed_data.pop("item_id", None)
+    parsed_data.pop("quantity", None)
+    parsed_data["lines"] = [{"item_id": item_id, "quantity": quantity} for item_id, quantity in quantities.items()]
+
+
+def _validate_extraction(parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Check required PlaceOrder fields, merge cart lines and fill in the default location."""
+    if parsed_data.get("category") == "PlaceOrder":
+        _merge_lines(parsed_data)
+        required_fields = ["customer_id"] if "lines" in parsed_data else ["customer_id", "item_id", "quantity"]
+        missing_fields = [field for field in required_fields if field not in parsed_data]
+        if missing_fields:
+            raise ValueError(f"Missing required fields for PlaceOrder: {', '.join(missing_fields)}")
+
+    if parsed_data.get("category") == "PlaceOrder" and "location" not in parsed_data:
+        parsed_data["location"] = "domestic"
+
+    return parsed_data
+
+
+def _missing_items_error(item_ids: List[str]) -> str:
+    # check_inventory and compute_shipping word this the same, so the merged error reports it once
+    if len(item_ids) == 1:
+        return f"Item {item_ids[0]} not found in inventory"
+    return f"Items {', '.join(item_ids)} not found in inventory"
+
+
+def _stock_error(lines: List[Any], short: Dict[str, int]) -> str:
+    """Error for the lines a reservation could not meet, given the units available for each."""
+    if len(lines) == 1:
+        return f"Insufficient stock. Requested: {lines[0][1]}, Available: {next(iter(short.values()))}"
+    requested = dict(lines)
+    return "Insufficient stock for " + ", ".join(
+        f"{item_id} (requested: {requested[item_id]}, available: {available})" for item_id, available in short.items()
+    )
+
+
+def _fallback_extraction(query: str, error: LLMUnavailable) -> Dict[str, Any]:
+    """Extract with the rule-based parser while the LLM is unavailable.
+
+    The result is not cached, so the same text goes to the LLM again once it recovers.
+    """
+    if not LLM_FALLBACK_PARSER:
+        raise error
+    logger.warning("LLM unavailable (%s), extracting the order with the rule-based parser", error)
+    return validated(lenient_parse_order(query), OrderExtraction)
+
+
+def _extract_with_llm(query: str) -> Dict[str, Any]:
+    """Extract order fields from free-form text with the LLM."""
+    cached = extraction_cache.get(CATEGORIZE_PROMPT_VERSION, query)
+    if cached is not None:
+        logger.debug("Extraction cache hit for categorize_query")
+        return cached
+
+    try:
+        parsed_data = extract(get_order_extractor(), CATEGORIZE_PROMPT.messages(text=query), OrderExtraction)
+    except LLMUnavailable as e:
+        return _fallback_extraction(query, e)
+
+    extraction_cache.set(CATEGORIZE_PROMPT_VERSION, query, parsed_data)
+    return parsed_data
+
+
+async def _aextract_with_llm(query: str) -> Dict[str, Any]:
+    """Async variant of _extract_with_llm using ainvoke."""
+    cached = extraction_cache.get(CATEGORIZE_PROMPT_VERSION, query)
+    if cached is not None:
+        logger.debug("Extraction cache hit for categorize_query")
+        return cached
+
+    try:
+        parsed_data = await aextract(get_order_extractor(), CATEGORIZE_PROMPT.messages(text=query), OrderExtraction)
+    except LLMUnavailable as e:
+        return _fallback_extraction(query, e)
+
+    extraction_cache.set(CATEGORIZE_PROMPT_VERSION, query, parsed_data)
+    return parsed_data
+
+
+def _store_initial_state(messages: list, order_id: str, parsed_data: Dict[str, Any]) -> MessagesState:
+    """Validate extracted fields, store the initial order state and build the node output."""
+    _validate_extraction(parsed_data)
+
+    order_state = OrderRecord(
+        customer_id=parsed_data.get("customer_id"),
+        item_id=parsed_data.get("item_id"),
+        quantity=parsed_data.get("quantity"),
+        lines=parsed_data.get("lines"),
+        location=parsed_data.get("location", "domestic"),
+        category=parsed_data.get("category"),
+        cancel_order_id=parsed_data.get("cancel_order_id"),
+        order_id=order_id,  # Include order_id in state
+        catalog_version=get_catalog().current().version  # Pin the tables this order is priced against
+    )
+
+    # Store in global state; later stages apply their fields to the graph's and the store's copies separately
+    state_manager.set_state(order_id, {
+        "order_state": order_state,
+        "messages": messages
+    })
+
+    logger.debug("Initial state stored for order_id %s: %s", order_id, order_state)
+
+    return {"order_state": order_state}
 
 
 def categorize_query(state: MessagesState) -> MessagesState:
     """Categorize user query and validate basic input."""
     try:
         messages = state.get("messages", [])
-        query = messages[0].content if messages else ""
+        query = messages[-1].content if messages else ""
 
         # Generate unique order ID
         order_id = str(uuid.uuid4())
-        logger.debug(f"Generated new order_id: {order_id}")
+        logger.debug("Generated new order_id: %s", order_id)
 
         if not query:
-            return {
-                "messages": messages,
-                "order_state": None,
-                "error": "Empty query received"
-            }
+            return {"error": "Empty query received"}
 
-        prompt = ChatPromptTemplate.from_template("""
-            Extract order information from this text and return ONLY a valid JSON object without any markdown formatting or backticks.
-
-            Text: {text}
-
-            The JSON must have these exact fields:
-            - category: Either "PlaceOrder" for new orders or "CancelOrder" for cancellations
-            - customer_id: (format: customer_XX) - Required for PlaceOrder
-            - item_id: (format: item_XX) - Required for PlaceOrder
-            - quantity: (number) - Required for PlaceOrder
-            - location: "domestic" (default) - Optional
-
-            Example format:
-            {{
-                "category": "PlaceOrder",
-                "customer_id": "customer_14",
-                "item_id": "item_51",
-                "quantity": 2,
-                "location": "domestic"
-            }}
-
-            Return ONLY the JSON object, no other text, no code blocks, no backticks.
-        """)
-
-        response = prompt.invoke({"text": query})
-        result = llm.invoke(response)
-
-        content = result.content.strip()
-        if content.startswith('```json'):
-            content = content[7:]
-        if content.startswith('```'):
-            content = content[3:]
-        if content.endswith('```'):
-            content = content[:-3]
-        content = content.strip()
-
-        parsed_data = json.loads(content)
-
-        if parsed_data.get("category") == "PlaceOrder":
-            required_fields = ["customer_id", "item_id", "quantity"]
-            missing_fields = [field for field in required_fields if field not in parsed_data]
-            if missing_fields:
-                raise ValueError(f"Missing required fields for PlaceOrder: {', '.join(missing_fields)}")
-
-        if parsed_data.get("category") == "PlaceOrder" and "location" not in parsed_data:
-            parsed_data["location"] = "domestic"
-
-        order_state = {
-            "customer_id": parsed_data.get("customer_id"),
-            "item_id": parsed_data.get("item_id"),
-            "quantity": parsed_data.get("quantity"),
-            "location": parsed_data.get("location", "domestic"),
-            "category": parsed_data.get("category"),
-            "shipping_cost": None,
-            "payment_status": None,
-            "order_id": order_id  # Include order_id in state
-        }
-
-        # Store in global state
-        state_manager.set_state(order_id, {
-            "order_state": order_state,
-            "messages": messages
-        })
+        # Try the deterministic fast path before paying for an LLM round-trip
+        parsed_data = fast_parse_order(query)
+        logger.debug("Fast-path parser %s, hit rate: %.1f%%", "hit" if parsed_data else "miss", parser_stats.hit_rate * 100)
+        if parsed_data is None:
+            parsed_data = _extract_with_llm(query)
 
-        logger.debug(f"Initial state stored for order_id {order_id}: {order_state}")
-
-        return {
-            "messages": messages,
-            "order_state": order_state,
-            "error": None
-        }
+        return _store_initial_state(messages, order_id, parsed_data)
 
     except Exception as e:
         logger.exception(f"Error in categorize_query: {str(e)}")
-        return {
-            "messages": messages,
-            "order_state": None,
-            "error": f"Error processing query: {str(e)}"
-        }
+        return {"error": f"Error processing query: {str(e)}"}
 
 
-def check_inventory(state: MessagesState) -> MessagesState:
-    """Check if the requested item is in stock."""
+async def acategorize_query(state: MessagesState) -> MessagesState:
+    """Async variant of categorize_query that awaits the LLM extraction."""
     try:
         messages = state.get("messages", [])
-        order_state = state.get("order_state", {})
-        order_id = order_state.get('order_id')
+        query = messages[-1].content if messages else ""
+
+        # Generate unique order ID
+        order_id = str(uuid.uuid4())
+        logger.debug("Generated new order_id: %s", order_id)
 
-        logger.debug(f"Checking inventory for order_id: {order_id}")
+        if not query:
+            return {"error": "Empty query received"}
 
-        if order_id:
-            stored_state = state_manager.get_state(order_id)
-            if stored_state:
-                order_state = stored_state.get("order_state", order_state)
-                logger.debug(f"Retrieved stored state for order_id {order_id}: {order_state}")
+        # Try the deterministic fast path before paying for an LLM round-trip
+        parsed_data = fast_parse_order(query)
+        logger.debug("Fast-path parser %s, hit rate: %.1f%%", "hit" if parsed_data else "miss", parser_stats.hit_rate * 100)
+        if parsed_data is None:
+            parsed_data = await _aextract_with_llm(query)
 
-        item_id = order_state.get("item_id")
-        quantity = order_state.get("quantity")
+        return _store_initial_state(messages, order_id, parsed_data)
 
-        if not item_id or not quantity:
-            return {
-                "messages": messages,
-                "order_state": order_state,
-                "error": "Missing item_id or quantity in order state"
-            }
+    except Exception as e:
+        logger.exception(f"Error in acategorize_query: {str(e)}")
+        return {"error": f"Error processing query: {str(e)}"}
 
-        if item_id not in inventory:
-            return {
-                "messages": messages,
-                "order_state": order_state,
-                "error": f"Item {item_id} not found in inventory"
-            }
 
-        if inventory[item_id]["stock"] >= quantity:
-            logger.debug(f"Item {item_id} is in stock. Requested: {quantity}, Available: {inventory[item_id]['stock']}")
+def _missing_fields(order_state: Any, fields: List[str]) -> List[str]:
+    """The given fields the order has not set; a cart's lines stand in for item_id and quantity."""
+    has_lines = bool(order_state.get("lines"))
+    return [field for field in fields
+            if order_state.get(field) in (None, "") and not (has_lines and field in ("item_id", "quantity"))]
 
-            updated_order_state = {
-                **order_state,
-                "inventory_checked": True,
-                "stock_available": inventory[item_id]["stock"]
-            }
 
-            # Update global state
-            state_manager.update_state(order_id, {
-                "order_state": updated_order_state
-            })
+def _stage_result(order_id: Optional[str], fields: Dict[str, Any]) -> MessagesState:
+    """Apply a stage's fields to the stored order and return only them; the state reducer applies them to the graph's copy."""
+    if order_id:
+        state_manager.merge_order_state(order_id, fields)
+        logger.debug("Merged stage fields for order_id %s: %s", order_id, fields)
+    return {"order_state": fields, "error": None}
 
-            logger.debug(f"Updated state for order_id {order_id}: {updated_order_state}")
 
-            return {
-                "messages": messages,
-                "order_state": updated_order_state,
-                "error": None
-            }
-        else:
-            return {
-                "messages": messages,
-                "order_state": order_state,
-                "error": f"Insufficient stock. Requested: {quantity}, Available: {inventory[item_id]['stock']}"
-            }
+def validate_customer(state: MessagesState) -> MessagesState:
+    """Check that the ordering customer exists."""
+    try:
+        order_state = state.get("order_state") or {}
+        order_id = order_state.get("order_id")
+        customer_id = order_state.get("customer_id")
+
+        logger.debug("Validating customer for order_id: %s", order_id)
+
+        if not customer_id:
+            return {"error": "Missing customer_id in order state"}
+
+        tables = get_catalog().get(order_state.get("catalog_version"))
+        if customer_id not in tables.customers:
+            return {"error": f"Customer {customer_id} not found"}
+
+        return _stage_result(order_id, {"customer_validated": True})
 
     except Exception as e:
-        logger.exception(f"Error in check_inventory: {str(e)}")
-        return {
-            "messages": messages,
-            "order_state": order_state,
-            "error": f"Error checking inventory: {str(e)}"
-        }
+        logger.exception(f"Error in validate_customer: {str(e)}")
+        return {"error": f"Error validating customer: {str(e)}"}
 
 
-def compute_shipping(state: MessagesState) -> MessagesState:
-    """Calculate shipping costs."""
+def check_inventory(state: MessagesState) -> MessagesState:
+    """Check that every item of the order is in stock and hold the units."""
     try:
-        messages = state.get("messages", [])
-        order_state = state.get("order_state", {})
-        order_id = order_state.get('order_id')
+        order_state = state.get("order_state") or {}
+        order_id = order_state.get("order_id")
+        lines = order_lines(order_state)
 
-        logger.debug(f"Computing shipping for order_id: {order_id}")
+        logger.debug("Checking inventory for order_id: %s", order_id)
 
-        if order_id:
-            stored_state = state_manager.get_state(order_id)
-            if stored_state:
-                order_state = stored_state.get("order_state", order_state)
-                logger.debug(f"Retrieved stored state for order_id {order_id}: {order_state}")
+        if not lines:
+            return {"error": "Missing item_id or quantity in order state"}
 
-        customer_id = order_state.get("customer_id")
-        item_id = order_state.get("item_id")
-        quantity = order_state.get("quantity")
-        location = order_state.get("location")
+        inventory_engine = get_inventory_engine()
+        missing = [item_id for item_id, _ in lines if item_id not in inventory_engine]
+        if missing:
+            return {"error": _missing_items_error(missing)}
 
-        if not all([customer_id, item_id, quantity, location]):
-            return {
-                "messages": messages,
-                "order_state": order_state,
-                "error": "Missing order details from previous step"
-            }
+        # Hold the units now so concurrent orders cannot pass against the same stock; all lines or none
+        item_ids = [item_id for item_id, _ in lines]
+        short = inventory_engine.reserve_lines(order_id, item_ids, [quantity for _, quantity in lines])
+        if short:
+            return {"error": _stock_error(lines, short)}
 
-        if customer_id not in customers:
-            return {
-                "messages": messages,
-                "order_state": order_state,
-                "error": f"Customer {customer_id} not found"
-            }
+        if len(lines) > 1:
+            logger.debug("Reserved %d lines for order_id %s", len(lines), order_id)
+            return _stage_result(order_id, {"inventory_checked": True})
 
-        weight_per_item = inventory[item_id]["weight"]
-        total_weight = weight_per_item * quantity
+        stock_available = inventory_engine.available(item_ids[0])
+        logger.debug("Reserved %s of %s for order_id %s, Available: %s", lines[0][1], item_ids[0], order_id, stock_available)
+        return _stage_result(order_id, {"inventory_checked": True, "stock_available": stock_available})
 
-        rates = {"local": 5, "domestic": 10, "international": 20}
-        shipping_rate = rates.get(location, rates["domestic"])
-        cost = total_weight * shipping_rate
+    except Exception as e:
+        logger.exception(f"Error in check_inventory: {str(e)}")
+        return {"error": f"Error checking inventory: {str(e)}"}
 
-        logger.debug(f"Shipping calculation complete: Cost: ${cost:.2f}, Location: {location}")
 
-        updated_order_state = {
-            **order_state,
-            "shipping_cost": f"${cost:.2f}",
-            "total_weight": total_weight,
-            "shipping_rate": shipping_rate
-        }
+def compute_shipping(state: MessagesState) -> MessagesState:
+    """Calculate shipping costs from the total weight of the order's items."""
+    try:
+        order_state = state.get("order_state") or {}
+        order_id = order_state.get("order_id")
+        lines = order_lines(order_state)
+        location = order_state.get("location")
 
-        # Update global state
-        state_manager.update_state(order_id, {
-            "order_state": updated_order_state
-        })
+        logger.debug("Computing shipping for order_id: %s", order_id)
 
-        logger.debug(f"Updated state for order_id {order_id}: {updated_order_state}")
+        if not lines or not location:
+            return {"error": "Missing order details for shipping"}
 
-        return {
-            "messages": messages,
-            "order_state": updated_order_state,
-            "error": None
-        }
+        tables = get_catalog().get(order_state.get("catalog_version"))
+        missing = [item_id for item_id, _ in lines if item_id not in tables.inventory]
+        if missing:
+            return {"error": _missing_items_error(missing)}
+
+        shipping_engine = get_shipping_engine()
+        if len(lines) == 1:
+            total_weight, cents = shipping_engine.quote_item(location, lines[0][0], lines[0][1], tables)
+        else:
+            # One gather of the weight column and a dot product over all lines
+            weights = tables.item_values("weight", [item_id for item_id, _ in lines])
+            total_weight = float(weights @ [quantity for _, quantity in lines])
+            cents = shipping_engine.quote(location, total_weight)
+
+        logger.debug("Shipping calculation complete: Cost: %s, Location: %s", format_cents(cents), location)
+
+        return _stage_result(order_id, {
+            "shipping_cents": cents,
+            "shipping_cost": format_cents(cents),
+            "total_weight": total_weight
+        })
 
     except Exception as e:
         logger.exception(f"Error in compute_shipping: {str(e)}")
-        return {
-            "messages": messages,
-            "order_state": order_state,
-            "error": f"Error computing shipping: {str(e)}"
-        }
+        return {"error": f"Error computing shipping: {str(e)}"}
 
 
 def process_payment(state: MessagesState) -> MessagesState:
     """Process payment and maintain order state."""
     try:
-        messages = state.get("messages", [])
-        order_state = state.get("order_state", {})
+        order_state = state.get("order_state") or {}
         order_id = order_state.get('order_id')
 
-        logger.debug(f"Processing payment for order_id: {order_id}")
+        logger.debug("Processing payment for order_id: %s", order_id)
 
-        if order_id:
-            stored_state = state_manager.get_state(order_id)
-            if stored_state:
-                order_state = stored_state.get("order_state", order_state)
-                logger.debug(f"Retrieved stored state for order_id {order_id}: {order_state}")
+        # A failed check stage leaves its error in state; skip payment and let the result node report it
+        if state.get("error"):
+            return {}
 
         customer_id = order_state.get("customer_id")
-        item_id = order_state.get("item_id")
-        quantity = order_state.get("quantity")
-        shipping_cost = order_state.get("shipping_cost")
+        shipping_cents = order_state.get("shipping_cents")
         location = order_state.get("location")
 
-        if not all([customer_id, item_id, quantity, shipping_cost, location]):
-            missing_fields = [field for field in ["customer_id", "item_id", "quantity", "shipping_cost", "location"]
-                              if not order_state.get(field)]
-            return {
-                "messages": messages,
-                "order_state": order_state,
-                "error": f"Missing required order information: {', '.join(missing_fields)}"
-            }
+        if not all([customer_id, order_lines(order_state), location]) or shipping_cents is None:
+            missing_fields = _missing_fields(order_state, ["customer_id", "item_id", "quantity", "shipping_cents", "location"])
+            return {"error": f"Missing required order information: {', '.join(missing_fields)}"}
 
-        logger.debug(f"Payment successful for amount: {shipping_cost}")
+        # Turn the inventory hold into a sale; without one there is nothing to pay for
+        if not get_inventory_engine().commit(order_id):
+            return {"error": "No inventory reserved for this order"}
 
-        updated_order_state = {
-            **order_state,
-            "payment_status": "Success"
-        }
+        logger.debug("Payment successful for amount: %s", format_cents(shipping_cents))
 
-        # Update global state
-        state_manager.update_state(order_id, {
-            "order_state": updated_order_state
-        })
-
-        logger.debug(f"Updated state for order_id {order_id}: {updated_order_state}")
-
-        return {
-            "messages": messages,
-            "order_state": updated_order_state,
-            "error": None
-        }
+        return _stage_result(order_id, {"payment_status": "Success"})
 
     except Exception as e:
         logger.exception(f"Error in process_payment: {str(e)}")
-        return {
-            "messages": messages,
-            "order_state": order_state,
-            "error": f"Payment processing failed: {str(e)}"
-        }
+        return {"error": f"Payment processing failed: {str(e)}"}
 
 
-# UPDATE the process_order_result function in nodes.py:
+def _fail_order(order_state: Any) -> None:
+    """Give back any units a stage held for a rejected order and mark it failed in the store."""
+    order_id = order_state.get("order_id")
+    if not order_id:
+        return
+    get_inventory_engine().release(order_id)
+    # Failed orders get their own index status, so "pending" queries and bulk cancels skip them
+    if order_state.get("category") == "PlaceOrder":
+        state_manager.merge_order_state(order_id, {"payment_status": STATUS_FAILED})
+
 
 def process_order_result(state: MessagesState) -> MessagesState:
     """Format the final order result."""
     try:
-        messages = state.get("messages", [])
-        order_state = state.get("order_state", {})
+        order_state = state.get("order_state") or {}
         order_id = order_state.get('order_id')
 
-        logger.debug(f"Processing final result for order_id: {order_id}")
+        logger.debug("Processing final result for order_id: %s", order_id)
 
-        if order_id:
-            stored_state = state_manager.get_state(order_id)
-            if stored_state:
-                order_state = stored_state.get("order_state", order_state)
-                logger.debug(f"Retrieved stored state for order_id {order_id}: {order_state}")
-
-        if "error" in state and state["error"]:
-            return {
-                "messages": messages + [AIMessage(content=f"Error: {state['error']}")],
-                "order_state": order_state,
-                "error": state["error"]
-            }
+        if state.get("error"):
+            _fail_order(order_state)
+            return {"messages": [AIMessage(content=f"Error: {state['error']}")]}
 
         customer_id = order_state.get("customer_id")
-        item_id = order_state.get("item_id")
-        quantity = order_state.get("quantity")
+        lines = order_state.get("lines")
         location = order_state.get("location")
         shipping_cost = order_state.get("shipping_cost")
         payment_status = order_state.get("payment_status")
 
-        if not all([customer_id, item_id, quantity, location, shipping_cost, payment_status]):
-            missing_fields = [field for field in
-                              ["customer_id", "item_id", "quantity", "location", "shipping_cost", "payment_status"]
-                              if not order_state.get(field)]
+        if not all([customer_id, order_lines(order_state), location, shipping_cost, payment_status]):
+            missing_fields = _missing_fields(
+                order_state, ["customer_id", "item_id", "quantity", "location", "shipping_cost", "payment_status"]
+            )
+            _fail_order(order_state)
             return {
-                "messages": messages + [
-                    AIMessage(content=f"Error: Missing order details - {', '.join(missing_fields)}")
-                ],
-                "order_state": order_state,
+                "messages": [AIMessage(content=f"Error: Missing order details - {', '.join(missing_fields)}")],
                 "error": f"Missing fields: {', '.join(missing_fields)}"
             }
 
@@ -382,57 +412,55 @@ def process_order_result(state: MessagesState) -> MessagesState:
             response_details = {
                 "status": "Order Successfully Placed",
                 "order_id": order_id,
-                "customer_id": customer_id,
-                "item_id": item_id,
-                "quantity": quantity,
+                "customer_id": customer_id
+            }
+            # A cart lists its lines where a single-item order has item_id and quantity
+            if lines:
+                response_details["lines"] = lines
+            else:
+                response_details["item_id"] = order_state.get("item_id")
+                response_details["quantity"] = order_state.get("quantity")
+            response_details.update({
                 "location": location,
                 "shipping_cost": shipping_cost,
                 "payment_status": payment_status
-            }
+            })
 
-            # Store successful order in state manager for future reference
-            state_manager.set_state(order_id, {
+            # Archive successful order in compact form for future reference
+            state_manager.archive_state(order_id, {
                 "order_state": response_details,
-                "messages": messages,
                 "timestamp": datetime.datetime.now().isoformat()
             })
 
-            logger.debug(f"Stored successful order in state manager: {order_id}")
+            logger.debug("Stored successful order in state manager: %s", order_id)
 
-            return {
-                "messages": messages + [
-                    AIMessage(content=f"Order Details:\n{json.dumps(response_details, indent=2)}")
-                ],
-                "order_state": order_state,
-                "error": None
-            }
+            return {"messages": [AIMessage(content=f"Order Details:\n{json.dumps(response_details, indent=2)}")]}
         else:
+            _fail_order(order_state)
             return {
-                "messages": messages + [AIMessage(content="Payment failed. Please try again.")],
-                "order_state": order_state,
+                "messages": [AIMessage(content="Payment failed. Please try again.")],
                 "error": "Payment failed"
             }
 
     except Exception as e:
         logger.exception(f"Error in process_order_result: {str(e)}")
         return {
-            "messages": messages + [AIMessage(content=f"Error processing order: {str(e)}")],
-            "order_state": order_state,
+            "messages": [AIMessage(content=f"Error processing order: {str(e)}")],
             "error": str(e)
         }
 
+
 def route_query_1(state: MessagesState) -> Literal["PlaceOrder", "CancelOrder", "ProcessOrderResult"]:
     """Route the query based on its category."""
     try:
-        messages = state.get("messages", [])
-        order_state = state.get("order_state", {})
+        order_state = state.get("order_state") or {}
 
-        if "error" in state and state["error"]:
+        if state.get("error"):
             logger.debug("Error found in state, routing to ProcessOrderResult")
             return "ProcessOrderResult"
 
         category = order_state.get("category")
-        logger.debug(f"Routing based on category: {category}")
+        logger.debug("Routing based on category: %s", category)
 
         if category == "PlaceOrder":
             logger.debug("Routing to PlaceOrder")
@@ -449,22 +477,55 @@ def route_query_1(state: MessagesState) -> Literal["PlaceOrder", "CancelOrder",
         return "ProcessOrderResult"
 
 
+def fan_out_order(state: MessagesState) -> List[str]:
+    """Route a query; a new order fans out to its independent check stages, which run in parallel.
+
+    A cancellation whose order id is already known skips the LLM tool loop.
+    """
+    route = route_query_1(state)
+    if route == "PlaceOrder":
+        return list(ORDER_CHECK_STAGES)
+    if route == "CancelOrder" and (state.get("order_state") or {}).get("cancel_order_id"):
+        return ["DirectCancel"]
+    return [route]
+
+
+def direct_cancel(state: MessagesState) -> MessagesState:
+    """Cancel the order named in the parsed request straight from the state store."""
+    try:
+        cancel_order_id = state["order_state"].get("cancel_order_id")
+        result = cancel_by_id({"order_id": cancel_order_id})
+        cancel_stats.record(direct=True, calls_avoided=TOOL_LOOP_LLM_CALLS)
+        logger.debug("Direct cancellation of %s", cancel_order_id)
+
+        update = {"messages": [AIMessage(content=json.dumps(result))]}
+        if "error" in result:
+            update["error"] = result["error"]
+        return update
+
+    except Exception as e:
+        logger.exception(f"Error in direct_cancel: {str(e)}")
+        return {"error": f"Error cancelling order: {str(e)}"}
+
+
 def call_model_2(state: MessagesState) -> MessagesState:
     """Use the LLM to process cancellation."""
     try:
         messages = state.get("messages", [])
-        response = llm_with_tools_2.invoke(str(messages))
-        return {
-            "messages": messages + [response],
-            "order_state": state.get("order_state"),
-            "error": None
-        }
+        response = get_llm_with_tools_2().invoke(context_window(messages, LLM_CONTEXT_TOKENS))
+        return {"messages": [response]}
     except Exception as e:
-        return {
-            "messages": messages,
-            "order_state": state.get("order_state"),
-            "error": f"Error in model call: {str(e)}"
-        }
+        return {"error": f"Error in model call: {str(e)}"}
+
+
+async def acall_model_2(state: MessagesState) -> MessagesState:
+    """Async variant of call_model_2."""
+    try:
+        messages = state.get("messages", [])
+        response = await get_llm_with_tools_2().ainvoke(context_window(messages, LLM_CONTEXT_TOKENS))
+        return {"messages": [response]}
+    except Exception as e:
+        return {"error": f"Error in model call: {str(e)}"}
 
 
 def call_tools_2(state: MessagesState) -> Literal["tools_2", "end"]:
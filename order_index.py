@@ -0,0 +1,168 @@
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from order_record import OrderRecord
+
+# Index status of an order that has not been paid for yet, and of one that failed a stage
+STATUS_PENDING = "pending"
+STATUS_SUCCESS = "Success"
+STATUS_FAILED = "failed"
+
+# Order fields the indexes are built from; writes touching none of them skip re-indexing
+INDEXED_FIELDS = frozenset(("category", "customer_id", "item_id", "payment_status", "quantity", "lines"))
+
+# (customer_id, status, ((item_id, quantity), ...)); a cart has one pair per line
+IndexKey = Tuple[Optional[str], str, Tuple[Tuple[str, int], ...]]
+
+
+def _units(quantity: Any) -> int:
+    if quantity.__class__ is int:
+        return quantity
+    try:
+        return int(quantity or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def index_key(order_state: Any) -> Optional[IndexKey]:
+    """The indexed fields of an order_state dict or OrderRecord; None for a cancellation request."""
+    if isinstance(order_state, OrderRecord):
+        category, customer_id, status, lines = (order_state.category, order_state.customer_id,
+                                                order_state.payment_status, order_state.lines)
+        item_id, quantity = order_state.item_id, order_state.quantity
+    else:
+        order_state = order_state or {}
+        category, customer_id, status, lines = (order_state.get("category"), order_state.get("customer_id"),
+                                                order_state.get("payment_status"), order_state.get("lines"))
+        item_id, quantity = order_state.get("item_id"), order_state.get("quantity")
+    if category == "CancelOrder":
+        return None
+    if lines:
+        items = tuple((line["item_id"], _units(line["quantity"])) for line in lines)
+    else:
+        items = ((item_id, _units(quantity)),) if item_id is not None else ()
+    return customer_id, status or STATUS_PENDING, items
+
+
+class OrderIndex:
+    """Secondary indexes over one stripe of the order store.
+
+    Not thread-safe: the owning stripe's lock must be held for every call, so
+    the indexes change atomically with the orders they describe. Buckets are
+    dicts used as ordered sets, giving O(1) add and remove. The time index is
+    an append-only pair of lists searched with bisect; removed orders are
+    skipped on read and compacted away once they make up half of it.
+    """
+    __slots__ = ("keys", "created", "by_customer", "by_item", "by_status", "units", "_times", "_time_ids")
+
+    def __init__(self):
+        self.keys: Dict[str, IndexKey] = {}
+        # Wall-clock time each order was first indexed
+        self.created: Dict[str, float] = {}
+        self.by_customer: Dict[str, Dict[str, None]] = {}
+        self.by_item: Dict[str, Dict[str, None]] = {}
+        self.by_status: Dict[str, Dict[str, None]] = {}
+        # Units per (item_id, status), so quantity totals need no scan
+        self.units: Dict[Tuple[str, str], int] = {}
+        self._times: List[float] = []
+        self._time_ids: List[str] = []
+
+    def update(self, order_id: str, order_state: Any, created: Optional[float] = None) -> None:
+        """Index an order, or re-index it if any indexed field changed; cancellation requests are not indexed.
+
+        created is the time the order was first stored, if not now.
+        """
+        key = index_key(order_state)
+        if key is None:
+            self.remove(order_id)
+            return
+        previous = self.keys.get(order_id)
+        if previous == key:
+            return
+        if previous is None:
+            if created is None:
+                created = time.time()
+            self.created[order_id] = created
+            if not self._times or created >= self._times[-1]:
+                self._times.append(created)
+                self._time_ids.append(order_id)
+            else:
+                # Batched or clock-stepped entries are inserted in place, keeping the time index sorted
+                position = bisect_right(self._times, created)
+                self._times.insert(position, created)
+                self._time_ids.insert(position, order_id)
+        else:
+            self._unlink(order_id, previous)
+        self._link(order_id, key)
+        self.keys[order_id] = key
+
+    def remove(self, order_id: str) -> None:
+        key = self.keys.pop(order_id, None)
+        if key is None:
+            return
+        self._unlink(order_id, key)
+        del self.created[order_id]
+        if len(self._times) > 2 * len(self.created) + 64:
+            self._compact()
+
+    def _link(self, order_id: str, key: IndexKey) -> None:
+        customer_id, status, items = key
+        if customer_id is not None:
+            self.by_customer.setdefault(customer_id, {})[order_id] = None
+        self.by_status.setdefault(status, {})[order_id] = None
+        units = self.units
+        for item_id, quantity in items:
+            self.by_item.setdefault(item_id, {})[order_id] = None
+            if quantity:
+                units[(item_id, status)] = units.get((item_id, status), 0) + quantity
+
+    def _unlink(self, order_id: str, key: IndexKey) -> None:
+        customer_id, status, items = key
+        _discard(self.by_customer, customer_id, order_id)
+        _discard(self.by_status, status, order_id)
+        units = self.units
+        for item_id, quantity in items:
+            _discard(self.by_item, item_id, order_id)
+            if quantity:
+                remaining = units.get((item_id, status), 0) - quantity
+                if remaining:
+                    units[(item_id, status)] = remaining
+                else:
+                    units.pop((item_id, status), None)
+
+    def _compact(self) -> None:
+        live = [(created, order_id) for created, order_id in zip(self._times, self._time_ids)
+                if self.created.get(order_id) == created]
+        self._times = [created for created, _ in live]
+        self._time_ids = [order_id for _, order_id in live]
+
+    def matching(self, customer_id: Optional[str] = None, item_id: Optional[str] = None,
+                 status: Optional[str] = None) -> Iterable[str]:
+        """Order ids matching every given field, read from the smallest bucket."""
+        filters = [index.get(value, {}) for index, value in (
+            (self.by_customer, customer_id), (self.by_item, item_id), (self.by_status, status)
+        ) if value is not None]
+        if not filters:
+            return list(self.keys)
+        filters.sort(key=len)
+        smallest, rest = filters[0], filters[1:]
+        return [order_id for order_id in smallest if all(order_id in bucket for bucket in rest)]
+
+    def between(self, since: Optional[float] = None, until: Optional[float] = None) -> List[Tuple[float, str]]:
+        """(created, order_id) pairs created in [since, until], oldest first."""
+        start = bisect_left(self._times, since) if since is not None else 0
+        stop = bisect_right(self._times, until) if until is not None else len(self._times)
+        return [
+            (created, order_id)
+            for created, order_id in zip(self._times[start:stop], self._time_ids[start:stop])
+            if self.created.get(order_id) == created
+        ]
+
+
+def _discard(index: Dict[str, Dict[str, None]], value: Optional[str], order_id: str) -> None:
+    bucket = index.get(value)
+    if bucket is not None:
+        bucket.pop(order_id, None)
+        if not bucket:
+            del index[value]
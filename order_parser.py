@@ -0,0 +1,199 @@
+import re
+from threading import Lock
+from typing import Dict, Any, List, Optional, Set
+
+# Compiled patterns for the canonical request shapes documented in app.py:
+#   "I want to place an order for item_XX, quantity Y, my customer id is customer_ZZ"
+#   "I want to place an order for item_XX x2, item_YY x1, my customer id is customer_ZZ"
+#   "Cancel order 223"
+CANCEL_PATTERN = re.compile(r"^\W*(?:please\s+)?cancel\b.*\border(?:_id)?\b", re.IGNORECASE | re.DOTALL)
+PLACE_PATTERN = re.compile(r"\b(?:place|buy|purchase)\b", re.IGNORECASE)
+# Words that make a request something other than a plain new order: a cancellation
+# anywhere in the text, a negation, a status question or a change to an existing order
+NOT_PLACE_PATTERN = re.compile(
+    r"\b(?:cancel\w*|not|no|never|\w+n['’]t|dont|wont|cant|stop|instead|status|track\w*|where|when|"
+    r"shipped|delivered|refund\w*|return\w*|change\w*|modify|update)\b|\?",
+    re.IGNORECASE
+)
+ITEM_PATTERN = re.compile(r"\bitem_\w+\b", re.IGNORECASE)
+CUSTOMER_PATTERN = re.compile(r"\bcustomer_\w+\b", re.IGNORECASE)
+QUANTITY_PATTERN = re.compile(
+    r"\bquantity\s*(?:of|is|:|=)?\s*(\d+)\b|\b(\d+)\s*(?:x|units?|pcs|pieces)\b",
+    re.IGNORECASE
+)
+# One cart line: "item_XX x2", "item_XX quantity 2" or "2 x item_XX"
+LINE_PATTERN = re.compile(
+    r"\b(item_\w+)\s*(?:x|\*|,?\s*quantity\s*(?:of|is|:|=)?)\s*(\d+)\b|\b(\d+)\s*(?:x|\*)\s*(item_\w+)\b",
+    re.IGNORECASE
+)
+LOCATION_PATTERN = re.compile(r"\b(local|domestic|international)\b", re.IGNORECASE)
+# Order ids are uuid4 strings; the console also accepts short ids such as "Cancel order 223"
+UUID_PATTERN = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+ORDER_ID_PATTERN = re.compile(
+    r"\border(?:[\s_]*id)?\s*(?:is|:|#|=)?\s*#?([A-Za-z0-9-]*\d[A-Za-z0-9-]*)\b", re.IGNORECASE
+)
+BARE_ID_PATTERN = re.compile(r"^\s*#?([A-Za-z0-9-]*\d[A-Za-z0-9-]*)\s*$")
+CANCEL_WORD_PATTERN = re.compile(r"\bcancel", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"\b(\d+)\b")
+
+
+class ParserStats:
+    """Hit/miss counters for the deterministic fast path."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+parser_stats = ParserStats()
+
+
+def _single(pattern: re.Pattern, text: str) -> Optional[str]:
+    """Return the only distinct match of pattern in text, or None if absent or ambiguous."""
+    matches = {match.lower() for match in pattern.findall(text)}
+    return matches.pop() if len(matches) == 1 else None
+
+
+def parse_order_id(text: str) -> Optional[str]:
+    """Return the one order id named in text, or None if there is none or more than one."""
+    bare = BARE_ID_PATTERN.match(text)
+    if bare:
+        return bare.group(1)
+    # Generated ids are lowercase, so uuids are normalized before the store lookup
+    candidates = {match.lower() for match in UUID_PATTERN.findall(text)}
+    for order_id in ORDER_ID_PATTERN.findall(text):
+        # The id pattern also matches the leading part of a uuid; keep the full uuid only
+        if not any(candidate.startswith(order_id.lower()) for candidate in candidates):
+            candidates.add(order_id)
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+def _stray_numbers(text: str, quantities: Set[int]) -> bool:
+    """True if text has a standalone number that is not one of the quantities, e.g. "2.5" or a second count."""
+    return any(int(number) not in quantities for number in NUMBER_PATTERN.findall(text))
+
+
+def _cart_lines(text: str) -> Optional[List[Dict[str, Any]]]:
+    """Lines of a cart that gives every item it names exactly one quantity, or None."""
+    quantities: Dict[str, int] = {}
+    for item_a, quantity_a, quantity_b, item_b in LINE_PATTERN.findall(text):
+        item_id, quantity = (item_a or item_b).lower(), int(quantity_a or quantity_b)
+        if item_id in quantities or quantity <= 0:
+            return None
+        quantities[item_id] = quantity
+    if set(quantities) != {item_id.lower() for item_id in ITEM_PATTERN.findall(text)}:
+        return None
+    return [{"item_id": item_id, "quantity": quantity} for item_id, quantity in quantities.items()]
+
+
+def _parse_cart(text: str) -> Optional[Dict[str, Any]]:
+    customer_id = _single(CUSTOMER_PATTERN, text)
+    lines = _cart_lines(text)
+    if not customer_id or not lines or _stray_numbers(text, {line["quantity"] for line in lines}):
+        return None
+    return {
+        "category": "PlaceOrder",
+        "customer_id": customer_id,
+        "lines": lines,
+        "location": _single(LOCATION_PATTERN, text) or "domestic"
+    }
+
+
+def _parse(text: str) -> Optional[Dict[str, Any]]:
+    if CANCEL_PATTERN.search(text):
+        parsed = {"category": "CancelOrder"}
+        cancel_order_id = parse_order_id(text)
+        if cancel_order_id:
+            parsed["cancel_order_id"] = cancel_order_id
+        return parsed
+
+    if not PLACE_PATTERN.search(text) or NOT_PLACE_PATTERN.search(text):
+        return None
+
+    if len({match.lower() for match in ITEM_PATTERN.findall(text)}) > 1:
+        return _parse_cart(text)
+
+    item_id = _single(ITEM_PATTERN, text)
+    customer_id = _single(CUSTOMER_PATTERN, text)
+    quantities = {int(a or b) for a, b in QUANTITY_PATTERN.findall(text)}
+    if not item_id or not customer_id or len(quantities) != 1:
+        return None
+
+    quantity = quantities.pop()
+    if quantity <= 0 or _stray_numbers(text, {quantity}):
+        return None
+
+    location = _single(LOCATION_PATTERN, text) or "domestic"
+    return {
+        "category": "PlaceOrder",
+        "customer_id": customer_id,
+        "item_id": item_id,
+        "quantity": quantity,
+        "location": location
+    }
+
+
+def fast_parse_order(text: str) -> Optional[Dict[str, Any]]:
+    """Parse canonical order/cancel requests without the LLM.
+
+    Returns a dict shaped like the LLM extraction output, or None when the
+    text does not match a canonical form and the caller should fall back.
+    """
+    parsed = _parse(text) if text else None
+    parser_stats.record(parsed is not None)
+    return parsed
+
+
+def lenient_parse_order(text: str) -> Dict[str, Any]:
+    """Best-effort rule-based extraction, more lenient than the fast path.
+
+    Takes the first customer, item and number it finds and may leave
+    required fields out; used when the LLM is unavailable and by the
+    offline fake model.
+    """
+    if CANCEL_WORD_PATTERN.search(text):
+        parsed = {"category": "CancelOrder"}
+        cancel_order_id = parse_order_id(text)
+        if cancel_order_id:
+            parsed["cancel_order_id"] = cancel_order_id
+        return parsed
+
+    parsed = {"category": "PlaceOrder"}
+    customer = CUSTOMER_PATTERN.search(text)
+    if customer:
+        parsed["customer_id"] = customer.group(0).lower()
+    # Items written with their own quantities make a cart; the first quantity per item is kept
+    quantities: Dict[str, int] = {}
+    for item_a, quantity_a, quantity_b, item_b in LINE_PATTERN.findall(text):
+        quantities.setdefault((item_a or item_b).lower(), int(quantity_a or quantity_b))
+    if len(quantities) > 1:
+        parsed["lines"] = [{"item_id": item_id, "quantity": quantity} for item_id, quantity in quantities.items()]
+    else:
+        item = ITEM_PATTERN.search(text)
+        if item:
+            parsed["item_id"] = item.group(0).lower()
+        quantity = QUANTITY_PATTERN.search(text)
+        number = NUMBER_PATTERN.search(text)
+        if quantity:
+            parsed["quantity"] = int(quantity.group(1) or quantity.group(2))
+        else:
+            parsed["quantity"] = int(number.group(1)) if number else 1
+    location = LOCATION_PATTERN.search(text)
+    parsed["location"] = location.group(0).lower() if location else "domestic"
+    return parsed
@@ -0,0 +1,129 @@
+from operator import attrgetter
+from typing import Dict, Any, Iterator, List, Mapping, Optional, Tuple
+
+# Every field an order picks up on its way through the graph; new fields go at the end (see _restore).
+# A cart order holds its items in `lines` ([{"item_id", "quantity"}, ...]) instead of item_id/quantity.
+ORDER_FIELDS = (
+    "order_id", "category", "customer_id", "item_id", "quantity", "location",
+    "catalog_version", "customer_validated", "inventory_checked", "stock_available",
+    "shipping_cost", "total_weight", "payment_status", "cancel_order_id",
+    "lines", "shipping_cents"
+)
+_FIELD_SET = frozenset(ORDER_FIELDS)
+# All field values as one tuple, read in C
+_field_values = attrgetter(*ORDER_FIELDS)
+
+# (field values in ORDER_FIELDS order, extras): an immutable copy of a record for the journal
+FrozenRecord = Tuple[Tuple, Optional[Dict[str, Any]]]
+
+
+def _restore(values: Tuple, extras: Optional[Dict[str, Any]]) -> "OrderRecord":
+    record = OrderRecord.__new__(OrderRecord)
+    # Records journaled before a field was added are padded with None
+    values = tuple(values) + (None,) * (len(ORDER_FIELDS) - len(values))
+    for name, value in zip(ORDER_FIELDS, values):
+        setattr(record, name, value)
+    record.extras = extras
+    return record
+
+
+class OrderRecord:
+    """One order's fields as slots instead of a per-order dict.
+
+    A record is not changed once it has been shared: replace returns a copy
+    with a stage's fields applied, so a reader holding a record never sees
+    it half written. The graph state and the state manager each keep their
+    own copy: a stage's fields are applied to both, by the state reducer and
+    by StateManager.merge_order_state, which also journals a frozen copy of
+    the result. It reads like the order_state dicts it replaces (get, [],
+    in, items); fields outside ORDER_FIELDS are kept in `extras`.
+    """
+    __slots__ = ORDER_FIELDS + ("extras",)
+
+    def __init__(self, **fields):
+        for name in ORDER_FIELDS:
+            setattr(self, name, None)
+        self.extras = None
+        self._apply(fields)
+
+    @classmethod
+    def from_mapping(cls, fields: Optional[Mapping[str, Any]]) -> "OrderRecord":
+        return cls(**(fields or {}))
+
+    def replace(self, fields: Mapping[str, Any]) -> "OrderRecord":
+        """A copy of this record with fields applied."""
+        record = _restore(_field_values(self), dict(self.extras) if self.extras else None)
+        record._apply(fields)
+        return record
+
+    def freeze(self) -> FrozenRecord:
+        """The record's values as plain tuples, safe to serialize later on another thread."""
+        return _field_values(self), (dict(self.extras) if self.extras else None)
+
+    @staticmethod
+    def thaw(frozen: FrozenRecord) -> "OrderRecord":
+        return _restore(*frozen)
+
+    def _apply(self, fields: Mapping[str, Any]) -> None:
+        for name, value in fields.items():
+            if name in _FIELD_SET:
+                setattr(self, name, value)
+            else:
+                if self.extras is None:
+                    self.extras = {}
+                self.extras[name] = value
+
+    def get(self, name: str, default: Any = None) -> Any:
+        if name in _FIELD_SET:
+            value = getattr(self, name)
+        elif self.extras is not None:
+            value = self.extras.get(name)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self.get(name) is not None
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Fields that have been set, like dict.items() of the old order_state."""
+        for name in ORDER_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                yield name, value
+        if self.extras:
+            yield from self.extras.items()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __reduce__(self):
+        # Pickle as a flat tuple instead of a per-slot state dict
+        return _restore, (_field_values(self), self.extras)
+
+    def __repr__(self) -> str:
+        return f"OrderRecord({self.as_dict()!r})"
+
+
+def order_lines(order_state: Any) -> List[Tuple[str, int]]:
+    """An order's (item_id, quantity) pairs: its cart lines, or its single item."""
+    lines = order_state.get("lines")
+    if lines:
+        return [(line["item_id"], line["quantity"]) for line in lines]
+    item_id, quantity = order_state.get("item_id"), order_state.get("quantity")
+    return [(item_id, quantity)] if item_id and quantity else []
+
+
+def merge_order_fields(order_state: Any, fields: Mapping[str, Any]) -> "OrderRecord":
+    """A new order record with fields applied, converting a plain dict (e.g. a decoded archive) first."""
+    if not isinstance(order_state, OrderRecord):
+        record = OrderRecord.from_mapping(order_state)
+        record._apply(fields)
+        return record
+    return order_state.replace(fields)
@@ -0,0 +1,204 @@
+import os
+import pickle
+import queue
+import struct
+import threading
+import zlib
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from logger_config import logger
+
+# Journal operations
+OP_SET = "set"
+OP_UPDATE = "update"
+OP_ARCHIVE = "archive"
+OP_CLEAR = "clear"
+
+# Each journal frame is a length + crc32 header followed by a pickled (op, order_id, payload)
+FRAME_HEADER = struct.Struct(">II")
+SNAPSHOT_CHUNK = 10000
+
+_FLUSH = object()
+_STOP = object()
+
+Record = Tuple[str, str, Any]
+
+
+def _encode_frame(record: Record) -> bytes:
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_frames(path: str) -> Iterator[Record]:
+    """Yield journal records, stopping at the first torn or corrupt frame."""
+    with open(path, "rb") as journal:
+        data = journal.read()
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        length, checksum = FRAME_HEADER.unpack_from(data, offset)
+        start = offset + FRAME_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            logger.warning(f"Discarding torn journal tail in {path} at offset {offset}")
+            return
+        yield pickle.loads(payload)
+        offset = start + length
+
+
+class JournalBackend:
+    """Append-only journal with group commit and periodic compacted snapshots.
+
+    Writers only enqueue records; a background thread appends everything queued
+    since its last write in one write+fsync. Every `snapshot_every` records the
+    journal rolls over to a new segment and a snapshot of the whole store is
+    written from another thread, after which older segments are deleted.
+    Recovery loads the snapshot and replays the segments written after it.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 100000, fsync: bool = True):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._segment = 0
+        self._journal = None
+        self._records_since_snapshot = 0
+        self._export: Optional[Callable[[], Iterable[Record]]] = None
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._writer: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot")
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"journal.{segment:08d}")
+
+    def _segments(self) -> list:
+        return sorted(
+            int(name.split(".", 1)[1]) for name in os.listdir(self.directory)
+            if name.startswith("journal.") and name.split(".", 1)[1].isdigit()
+        )
+
+    def recover(self) -> Iterator[Record]:
+        """Yield the records needed to rebuild the store: snapshot first, then the journal tail."""
+        first_segment = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as snapshot:
+                first_segment = pickle.load(snapshot)
+                while True:
+                    try:
+                        chunk = pickle.load(snapshot)
+                    except EOFError:
+                        break
+                    yield from chunk
+
+        for segment in self._segments():
+            if segment >= first_segment:
+                yield from _read_frames(self._segment_path(segment))
+
+    def start(self, export: Callable[[], Iterable[Record]]) -> None:
+        """Open a fresh journal segment and start the writer thread.
+
+        `export` must return the current store contents as set/archive records;
+        it is called from the snapshot thread.
+        """
+        self._export = export
+        segments = self._segments()
+        self._segment = segments[-1] + 1 if segments else 1
+        self._journal = open(self._segment_path(self._segment), "ab")
+        self._writer = threading.Thread(target=self._run, name="state-journal", daemon=True)
+        self._writer.start()
+
+    def append(self, op: str, order_id: str, payload: Any = None) -> None:
+        """Queue a record; never blocks on disk I/O."""
+        self._queue.put((op, order_id, payload))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is durable."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._writer = None
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        self._journal.close()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Group commit: take everything that queued up during the last write
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            frames = []
+            waiters = []
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                elif item[0] is _FLUSH:
+                    waiters.append(item[1])
+                else:
+                    frames.append(_encode_frame(item))
+
+            if frames:
+                self._journal.write(b"".join(frames))
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+                self._records_since_snapshot += len(frames)
+
+            for waiter in waiters:
+                waiter.set()
+
+            if self._records_since_snapshot >= self.snapshot_every and not stopping:
+                self._start_snapshot()
+
+    def _start_snapshot(self) -> None:
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        # Roll over first: every record in older segments is already applied in memory,
+        # so the snapshot taken afterwards covers them, and replaying newer ones is idempotent
+        self._journal.close()
+        self._segment += 1
+        self._journal = open(self._segment_path(self._segment), "ab")
+        self._records_since_snapshot = 0
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot, args=(self._segment,), name="state-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+
+    def _write_snapshot(self, first_segment: int) -> None:
+        try:
+            temp_path = self.snapshot_path + ".tmp"
+            with open(temp_path, "wb") as snapshot:
+                pickle.dump(first_segment, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+                chunk = []
+                for record in self._export():
+                    chunk.append(record)
+                    if len(chunk) >= SNAPSHOT_CHUNK:
+                        pickle.dump(chunk, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+                        chunk = []
+                if chunk:
+                    pickle.dump(chunk, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temp_path, self.snapshot_path)
+
+            for segment in self._segments():
+                if segment < first_segment:
+                    os.remove(self._segment_path(segment))
+            logger.info(f"Wrote state snapshot, journal now starts at segment {first_segment}")
+        except Exception as e:
+            logger.exception(f"Error writing state snapshot: {str(e)}")
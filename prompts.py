@@ -0,0 +1,114 @@
+import inspect
+import json
+from threading import Lock
+from typing import Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+# Rough size of a token in characters; close enough for budgeting without downloading a tokenizer
+CHARS_PER_TOKEN = 4
+# Per-message framing (role, separators) that providers add on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimated tokens a message costs, including any tool calls it makes."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += json.dumps([{"name": call["name"], "args": call["args"]} for call in tool_calls])
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+class Prompt:
+    """A prompt built once: fixed instructions followed by the per-call fields.
+
+    The instructions are dedented and stored as a plain string, and only
+    the short `fields` template is formatted per call. Keeping everything
+    that varies at the end gives every call the same prefix, which
+    provider-side prompt caches can reuse.
+    """
+
+    def __init__(self, name: str, version: str, instructions: str, fields: str):
+        self.name = name
+        self.version = version
+        self.prefix = inspect.cleandoc(instructions) + "\n\n"
+        self.fields = fields
+        self.prefix_tokens = estimate_tokens(self.prefix)
+
+    def format(self, **values: str) -> str:
+        return self.prefix + self.fields.format(**values)
+
+    def messages(self, **values: str) -> List[BaseMessage]:
+        return [HumanMessage(content=self.format(**values))]
+
+
+class PromptRegistry:
+    """Prompts by name, with the version that cached LLM results are keyed by."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._prompts: Dict[str, Prompt] = {}
+
+    def register(self, name: str, version: str, instructions: str, fields: str) -> Prompt:
+        with self._lock:
+            if name in self._prompts:
+                raise ValueError(f"Prompt {name!r} is already registered")
+            prompt = self._prompts[name] = Prompt(name, version, instructions, fields)
+        return prompt
+
+    def get(self, name: str) -> Prompt:
+        return self._prompts[name]
+
+    def versions(self) -> Dict[str, str]:
+        return {name: prompt.version for name, prompt in self._prompts.items()}
+
+
+def context_window(messages: Sequence[BaseMessage], max_tokens: int) -> List[BaseMessage]:
+    """The messages a tool-calling step needs, within about max_tokens.
+
+    That is the latest user request and the tool exchange that followed it;
+    earlier turns are left out. If the exchange does not fit, its oldest
+    rounds (an assistant tool call with its results) are dropped whole, so
+    every tool result still follows its call. The latest round is always kept.
+    """
+    start = max((index for index, message in enumerate(messages) if isinstance(message, HumanMessage)), default=0)
+    if start >= len(messages):
+        return []
+    request = messages[start]
+    rounds: List[List[BaseMessage]] = []
+    for message in messages[start + 1:]:
+        if isinstance(message, AIMessage) or not rounds:
+            rounds.append([message])
+        else:
+            rounds[-1].append(message)
+
+    budget = max_tokens - message_tokens(request)
+    kept: List[List[BaseMessage]] = []
+    for exchange in reversed(rounds):
+        cost = sum(message_tokens(message) for message in exchange)
+        if kept and cost > budget:
+            break
+        kept.append(exchange)
+        budget -= cost
+    return [request] + [message for exchange in reversed(kept) for message in exchange]
+
+
+# Global instance: every prompt the order flow sends, compiled at import
+prompt_registry = PromptRegistry()
+
+# Bump a version when its prompt or schema (see extraction.py) changes so cached extractions are not reused
+CATEGORIZE_PROMPT = prompt_registry.register("categorize", "categorize-v5", """
+    Extract order information from the customer's text below by calling OrderExtraction.
+    Use PlaceOrder for new orders and CancelOrder for cancellations. Leave out any field the text does not give.
+    For an order of several items, list each item with its quantity in lines.
+""", "Text: {text}")
+
+CANCEL_PROMPT = prompt_registry.register("cancel_order_id", "cancel-v3", """
+    Extract the order_id from the text below by calling CancelExtraction.
+    If you see a number or UUID after "order_id" or "order", that's the order_id.
+""", "Text: {text}")
@@ -0,0 +1,313 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from langchain_core.runnables.config import var_child_runnable_config
+
+from logger_config import get_logger
+
+logger = get_logger("llm")
+
+# RunnableConfig "configurable" key holding the order's deadline (time.monotonic() seconds)
+ORDER_DEADLINE_KEY = "order_deadline"
+
+
+class LLMUnavailable(RuntimeError):
+    """The LLM call was not attempted or did not finish in time; callers may degrade instead of failing."""
+
+
+class CircuitOpenError(LLMUnavailable):
+    """The circuit breaker is open, so the call failed fast."""
+
+
+class DeadlineExceeded(LLMUnavailable, TimeoutError):
+    """The call, or the order it was made for, ran out of time."""
+
+
+def order_config(budget: float) -> Dict[str, Any]:
+    """Graph config giving every LLM call made for one order a shared budget of `budget` seconds."""
+    if budget <= 0:
+        return {}
+    return {"configurable": {ORDER_DEADLINE_KEY: time.monotonic() + budget}}
+
+
+def order_deadline() -> Optional[float]:
+    """Deadline of the order being processed, read from the calling graph node's config."""
+    config = var_child_runnable_config.get()
+    return (config or {}).get("configurable", {}).get(ORDER_DEADLINE_KEY)
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for percentile estimates."""
+
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """The `fraction` quantile, or None until there are enough samples to trust it."""
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class CircuitBreaker:
+    """Fail fast after `failure_threshold` consecutive failures, then let one probe through after `cooldown`.
+
+    Closed: calls go through. Open: calls raise CircuitOpenError until the
+    cooldown has passed. Half-open: one probe call goes through while the
+    rest keep failing fast; its success closes the circuit and its failure
+    opens it again. A threshold of 0 disables the breaker.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = Lock()
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_in = self._opened_at + self.cooldown - self.clock()
+            if self.state == self.OPEN and retry_in <= 0:
+                self.state = self.HALF_OPEN
+                return
+            self.rejected += 1
+        if retry_in > 0:
+            raise CircuitOpenError(f"LLM circuit open after repeated failures, retrying in {retry_in:.1f}s")
+        raise CircuitOpenError("LLM circuit half-open, waiting for the probe call")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.warning("LLM circuit closed again after a successful call")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and 0 < self.failure_threshold <= self.failures):
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                self.opens += 1
+                logger.warning("LLM circuit opened after %d consecutive failures", self.failures)
+
+    def release(self) -> None:
+        """Give up a probe that was interrupted without an outcome, so the next call probes instead."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = self.clock() - self.cooldown
+
+
+class ResilientCaller:
+    """Run calls with deadlines, hedged duplicates and a circuit breaker.
+
+    A call is an `attempt(timeout, hedge)` function that makes one request
+    and should give up after `timeout` seconds. Each call gets the smaller of
+    `call_timeout` and what is left of the order's budget (see
+    order_config). If it is still running after the `hedge_percentile`
+    latency of recent calls (and at least `hedge_min_delay`), a second
+    attempt is started and the first result wins; at most `hedge_max_ratio`
+    of calls are hedged, so a slow endpoint does not get double the load.
+    Failures and timeouts feed the circuit breaker; exceptions listed in
+    `ignore` are passed through without counting against the endpoint.
+
+    Sync attempts run on a shared thread pool so the caller can stop waiting
+    at the deadline; an abandoned attempt finishes in the background.
+    """
+
+    def __init__(self, call_timeout: float = 30.0, hedge_percentile: float = 0.95,
+                 hedge_min_delay: float = 0.05, hedge_max_ratio: float = 0.1,
+                 breaker: Optional[CircuitBreaker] = None, pool_size: int = 32,
+                 ignore: Tuple[Type[BaseException], ...] = ()):
+        self.call_timeout = call_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker or CircuitBreaker()
+        self.pool_size = pool_size
+        self.ignore = ignore
+        self.latencies = LatencyWindow()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+        self._lock = Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _time_left(self) -> float:
+        timeout = self.call_timeout
+        deadline = order_deadline()
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                with self._lock:
+                    self.deadline_exceeded += 1
+                raise DeadlineExceeded("Order latency budget used up before the LLM call")
+            timeout = min(timeout, left)
+        return timeout
+
+    def _hedge_at(self, started: float) -> Optional[float]:
+        if not self.hedge_percentile or not self.hedge_max_ratio:
+            return None
+        delay = self.latencies.percentile(self.hedge_percentile)
+        return started + max(self.hedge_min_delay, delay) if delay is not None else None
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges >= self.hedge_max_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def _observe(self, started: float, failed: bool) -> None:
+        if not failed:
+            self.latencies.add(time.monotonic() - started)
+
+    def _begin(self) -> float:
+        timeout = self._time_left()
+        self.breaker.allow()
+        with self._lock:
+            self.calls += 1
+        return timeout
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        if error is None or isinstance(error, self.ignore):
+            self.breaker.record_success()
+        elif isinstance(error, Exception):
+            if isinstance(error, DeadlineExceeded):
+                with self._lock:
+                    self.deadline_exceeded += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _submit(self, attempt: Callable[[float, bool], Any], timeout: float, hedge: bool) -> Future:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.pool_size * 2, thread_name_prefix="llm-call")
+        started = time.monotonic()
+        # Each attempt runs in a copy of the caller's context, so it sees the calling node's config
+        future = self._executor.submit(copy_context().run, attempt, timeout, hedge)
+        future.add_done_callback(lambda done: self._observe(started, done.cancelled() or done.exception() is not None))
+        return future
+
+    def _run_hedged(self, attempt: Callable[[float, bool], Any], timeout: float) -> Any:
+        started = time.monotonic()
+        deadline = started + timeout
+        hedge_at = self._hedge_at(started)
+        primary = self._submit(attempt, timeout, False)
+        pending, error = {primary}, None
+        try:
+            while pending and time.monotonic() < deadline:
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, pending = wait(pending, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is not primary:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if pending and self._may_hedge():
+                        pending.add(self._submit(attempt, deadline - time.monotonic(), True))
+        finally:
+            for future in pending:
+                future.cancel()
+        # The client's own timeout fires at about the deadline; report it as the deadline too
+        if error is not None and not pending and time.monotonic() < deadline:
+            raise error
+        raise DeadlineExceeded(f"LLM call did not finish within {timeout:.2f}s") from error
+
+    def call(self, attempt: Callable[[float, bool], Any]) -> Any:
+        """Run attempt(timeout, hedge) under the deadline, hedging and breaker policies."""
+        timeout = self._begin()
+        try:
+            result = self._run_hedged(attempt, timeout)
+        except BaseException as e:
+            self._finish(e)
+            raise
+        self._finish(None)
+        return result
+
+    async def _arun_hedged(self, attempt: Callable[[float, bool], Awaitable[Any]], timeout: float) -> Any:
+        started = time.monotonic()
+        deadline = started + timeout
+        hedge_at = self._hedge_at(started)
+
+        def start(hedge: bool) -> asyncio.Future:
+            begun = time.monotonic()
+            task = asyncio.ensure_future(attempt(deadline - begun, hedge))
+            task.add_done_callback(lambda done: self._observe(begun, done.cancelled() or done.exception() is not None))
+            return task
+
+        primary = start(False)
+        pending, error = {primary}, None
+        try:
+            while pending and time.monotonic() < deadline:
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if pending and self._may_hedge():
+                        pending.add(start(True))
+        finally:
+            for task in pending:
+                task.cancel()
+        # The client's own timeout fires at about the deadline; report it as the deadline too
+        if error is not None and not pending and time.monotonic() < deadline:
+            raise error
+        raise DeadlineExceeded(f"LLM call did not finish within {timeout:.2f}s") from error
+
+    async def acall(self, attempt: Callable[[float, bool], Awaitable[Any]]) -> Any:
+        """Async variant of call; losing and timed-out attempts are cancelled."""
+        timeout = self._begin()
+        try:
+            result = await self._arun_hedged(attempt, timeout)
+        except BaseException as e:
+            self._finish(e)
+            raise
+        self._finish(None)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "circuit_state": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+            "circuit_rejected": self.breaker.rejected
+        }
@@ -0,0 +1,136 @@
+import csv
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Any, List, Sequence, Tuple
+
+from config import SHIPPING_RATES_PATH, SHIPPING_QUOTE_CACHE_SIZE
+from lazy import once
+
+# numpy is imported where the tariff is loaded, keeping `import shipping` cheap
+if TYPE_CHECKING:
+    import numpy as np
+
+# Zone for locations the tariff does not list
+DEFAULT_ZONE = "domestic"
+# Weights are priced in thousandths of a unit, so all arithmetic is on integers
+WEIGHT_SCALE = 1000
+
+
+def format_cents(cents: int) -> str:
+    """Display form of an amount, e.g. 1250 -> "$12.50"."""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}${abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+class ShippingEngine:
+    """Shipping prices from a zone and weight-band tariff, in integer cents.
+
+    Each tariff row is a band: weights above the previous band's max_weight
+    and up to its own cost base_cents plus cents_per_weight for every unit
+    beyond the band's start. The rows are compiled into zone x band arrays,
+    so quote_batch prices any number of (location, weight) pairs with a few
+    array operations; quote prices one pair from the same bands kept as
+    lists, without numpy's per-call overhead. Single-item quotes are also
+    kept in an LRU cache keyed by location, item, quantity and catalog version.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], cache_size: int = 4096):
+        import numpy as np
+        bands: Dict[str, List[Tuple[float, int, int]]] = {}
+        for row in rows:
+            max_weight, base, rate = float(row["max_weight"]), int(row["base_cents"]), int(row["cents_per_weight"])
+            if max_weight <= 0 or base < 0 or rate < 0:
+                raise ValueError(f"Invalid shipping band: {row}")
+            bands.setdefault(row["zone"], []).append((max_weight, base, rate))
+        if DEFAULT_ZONE not in bands:
+            raise ValueError(f"The shipping tariff has no {DEFAULT_ZONE!r} zone")
+
+        self.zones = {zone: index for index, zone in enumerate(bands)}
+        width = max(len(zone_bands) for zone_bands in bands.values())
+        limit = np.iinfo(np.int64).max
+        # Missing bands are padded with an unreachable bound; last_band caps the lookup per zone
+        self._bounds = np.full((len(bands), width), limit, dtype=np.int64)
+        self._starts = np.zeros((len(bands), width), dtype=np.int64)
+        self._bases = np.zeros((len(bands), width), dtype=np.int64)
+        self._rates = np.zeros((len(bands), width), dtype=np.int64)
+        self._last_band = np.zeros(len(bands), dtype=np.int64)
+        # Per zone: (bounds, starts, bases, rates) lists for scalar quotes
+        self._zone_bands: Dict[str, Tuple[List[int], ...]] = {}
+        for zone, zone_bands in bands.items():
+            index = self.zones[zone]
+            start = 0
+            for band, (max_weight, base, rate) in enumerate(sorted(zone_bands)):
+                bound = limit if max_weight == float("inf") else int(round(max_weight * WEIGHT_SCALE))
+                self._bounds[index, band] = bound
+                self._starts[index, band] = start
+                self._bases[index, band] = base
+                self._rates[index, band] = rate
+                start = bound
+            self._last_band[index] = len(zone_bands) - 1
+            count = len(zone_bands)
+            self._zone_bands[zone] = tuple(table[index, :count].tolist()
+                                           for table in (self._bounds, self._starts, self._bases, self._rates))
+        self._default_zone = self.zones[DEFAULT_ZONE]
+
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._quotes: "OrderedDict[tuple, Tuple[float, int]]" = OrderedDict()
+
+    @classmethod
+    def from_csv(cls, path: str = SHIPPING_RATES_PATH, cache_size: int = SHIPPING_QUOTE_CACHE_SIZE) -> "ShippingEngine":
+        with open(path, newline="", encoding="utf-8") as rates_file:
+            return cls(list(csv.DictReader(rates_file)), cache_size)
+
+    def quote_batch(self, locations: Sequence[str], weights: Sequence[float]) -> "np.ndarray":
+        """Price every (location, total weight) pair; returns int64 cents. Unknown locations use DEFAULT_ZONE."""
+        import numpy as np
+        zones = np.fromiter((self.zones.get(location, self._default_zone) for location in locations),
+                            dtype=np.int64, count=len(locations))
+        scaled = np.rint(np.asarray(weights, dtype=np.float64) * WEIGHT_SCALE).astype(np.int64)
+        if (scaled < 0).any():
+            raise ValueError("Shipping weights cannot be negative")
+        # The band is the first whose bound the weight does not exceed
+        bands = np.minimum((self._bounds[zones] < scaled[:, None]).sum(axis=1), self._last_band[zones])
+        beyond = scaled - self._starts[zones, bands]
+        # Round half up to the cent
+        return self._bases[zones, bands] + (self._rates[zones, bands] * beyond + WEIGHT_SCALE // 2) // WEIGHT_SCALE
+
+    def quote(self, location: str, weight: float) -> int:
+        """Cents to ship `weight` to `location`; same result as quote_batch for one pair."""
+        bounds, starts, bases, rates = self._zone_bands.get(location) or self._zone_bands[DEFAULT_ZONE]
+        scaled = int(round(weight * WEIGHT_SCALE))
+        if scaled < 0:
+            raise ValueError("Shipping weights cannot be negative")
+        band = min(bisect_left(bounds, scaled), len(bounds) - 1)
+        return bases[band] + (rates[band] * (scaled - starts[band]) + WEIGHT_SCALE // 2) // WEIGHT_SCALE
+
+    def quote_item(self, location: str, item_id: str, quantity: int, tables) -> Tuple[float, int]:
+        """(total weight, cents) to ship `quantity` of one item, cached per catalog version."""
+        key = (location, item_id, quantity, tables.version)
+        with self._lock:
+            quote = self._quotes.get(key)
+            if quote is not None:
+                self._quotes.move_to_end(key)
+                self.hits += 1
+                return quote
+            self.misses += 1
+
+        total_weight = tables.inventory[item_id]["weight"] * quantity
+        quote = (total_weight, self.quote(location, total_weight))
+        with self._lock:
+            self._quotes[key] = quote
+            while len(self._quotes) > self.cache_size:
+                self._quotes.popitem(last=False)
+        return quote
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._quotes), "hits": self.hits, "misses": self.misses}
+
+
+@once
+def get_shipping_engine() -> ShippingEngine:
+    """Process-wide engine built from the tariff file on first use."""
+    return ShippingEngine.from_csv()
@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import CancelledError, Future
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+def _settle(future: Future, result: Any = None, exception: BaseException = None) -> None:
+    """Complete the shared future unless it is already done (e.g. cancelled)."""
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers with the same key share its result.
+
+    The first caller (the leader) runs the call; callers arriving while it is
+    in flight wait for it instead of repeating it, and get its result or its
+    exception. The key is released as soon as the call finishes, so later
+    callers start a new call rather than reusing an old result. If an async
+    leader is cancelled, its waiters retry rather than inherit the
+    cancellation.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._flights: Dict[Hashable, Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self.calls += 1
+            return future, True
+
+    def _release(self, key: Hashable) -> None:
+        with self._lock:
+            del self._flights[key]
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result, shared), where shared means another caller's call produced it."""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result(), True
+            except CancelledError:
+                if not future.cancelled():
+                    raise
+
+        try:
+            result = function()
+        except BaseException as e:
+            self._release(key)
+            _settle(future, exception=e)
+            raise
+        self._release(key)
+        _settle(future, result=result)
+        return result, False
+
+    async def ado(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async variant of do; waiting callers do not block the event loop."""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            shared = asyncio.wrap_future(future)
+            try:
+                # Shielded, so cancelling this caller does not cancel the shared future
+                return await asyncio.shield(shared), True
+            except asyncio.CancelledError:
+                # The shared future is still pending when this caller was cancelled; it is only
+                # done and cancelled when the leader was, and then this caller retries. A cancel
+                # of this caller racing the leader's is raised at its next await.
+                if not shared.cancelled():
+                    raise
+
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            self._release(key)
+            future.cancel()
+            raise
+        except BaseException as e:
+            self._release(key)
+            _settle(future, exception=e)
+            raise
+        self._release(key)
+        _settle(future, result=result)
+        return result, False
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._flights)}
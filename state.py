@@ -1,18 +1,32 @@
 # Replace entire state.py content
-from typing import TypedDict, Optional, List, Annotated
+from typing import Any, TypedDict, Optional, List, Annotated
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
-class OrderState(TypedDict):
-    customer_id: Optional[str]
-    item_id: Optional[str]
-    quantity: Optional[int]
-    location: str
-    shipping_cost: Optional[str]
-    payment_status: Optional[str]
-    category: Optional[str]
+from order_record import OrderRecord, merge_order_fields
+
+
+def merge_order_state(current: Optional[OrderRecord], update: Optional[Any]) -> Optional[OrderRecord]:
+    """Apply a stage's partial order_state update to a copy; a whole OrderRecord replaces the current one."""
+    if update is None:
+        return current
+    if isinstance(update, OrderRecord):
+        return update
+    return merge_order_fields(current, update)
+
+
+def merge_errors(current: Optional[str], update: Optional[str]) -> Optional[str]:
+    """Keep the first error once set and append distinct errors from parallel stages."""
+    if not update:
+        return current
+    if not current:
+        return update
+    if update in current.split("; "):
+        return current
+    return f"{current}; {update}"
+
 
 class MessagesState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]  # Ensures message history persistence
-    order_state: Optional[OrderState]
-    error: Optional[str]
\ No newline at end of file
+    order_state: Annotated[Optional[OrderRecord], merge_order_state]
+    error: Annotated[Optional[str], merge_errors]
\ No newline at end of file
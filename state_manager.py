@@ -1,8 +1,111 @@
-from typing import Dict, Any, Optional
+import atexit
+import heapq
+import pickle
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, List, Optional
 from threading import Lock
 
+from config import (
+    STATE_MAX_LIVE_ORDERS, STATE_MAX_ARCHIVED_ORDERS, STATE_MAX_ORDER_AGE,
+    STATE_JOURNAL_DIR, STATE_SNAPSHOT_EVERY, STATE_JOURNAL_FSYNC
+)
+from metrics import timed_lock
+from order_index import OrderIndex, INDEXED_FIELDS, STATUS_FAILED, STATUS_SUCCESS
+from order_record import OrderRecord, merge_order_fields
+from persistence import JournalBackend, OP_SET, OP_UPDATE, OP_ARCHIVE, OP_CLEAR
+
+# Number of lock stripes; must be a power of two
+STRIPE_COUNT = 64
+
+# Field order of archived order records; names are interned once and shared
+ARCHIVE_FIELDS = tuple(sys.intern(field) for field in (
+    "status", "order_id", "customer_id", "item_id", "quantity",
+    "location", "category", "shipping_cost", "payment_status"
+))
+_ARCHIVE_FIELD_SET = frozenset(ARCHIVE_FIELDS)
+
+
+def encode_archived(state: Dict[str, Any]) -> bytes:
+    """Serialize an order to a compact record, dropping chat history."""
+    order_state = state.get("order_state") or {}
+    values = tuple(order_state.get(field) for field in ARCHIVE_FIELDS)
+    extras = {key: value for key, value in order_state.items() if key not in _ARCHIVE_FIELD_SET}
+    return pickle.dumps((values, extras or None, state.get("timestamp")), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _durable(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop message objects, which are not persisted, and freeze the order record for the journal thread."""
+    durable = {key: value for key, value in state.items() if key != "messages"}
+    order_state = durable.get("order_state")
+    if isinstance(order_state, OrderRecord):
+        durable["order_state"] = order_state.freeze()
+    return durable
+
+
+def _revive(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a journaled frozen record back into an OrderRecord."""
+    order_state = state.get("order_state")
+    if isinstance(order_state, tuple):
+        state = {**state, "order_state": OrderRecord.thaw(order_state)}
+    return state
+
+
+def decode_archived(record: bytes) -> Dict[str, Any]:
+    """Rebuild the stored-state shape from a compact record."""
+    values, extras, timestamp = pickle.loads(record)
+    order_state = {field: value for field, value in zip(ARCHIVE_FIELDS, values) if value is not None}
+    if extras:
+        order_state.update(extras)
+    return {"order_state": order_state, "timestamp": timestamp, "archived": True}
+
+
+class _Stripe:
+    """One shard of the order store with its own writer lock."""
+    __slots__ = ("lock", "states", "touched", "archive", "index", "pending", "expires_at")
+
+    def __init__(self):
+        # Records time spent waiting on a held stripe; uncontended acquires are not timed
+        self.lock = timed_lock("state_stripe")
+        self.states: Dict[str, Dict[str, Any]] = {}
+        # Last write time per live order, oldest first
+        self.touched: "OrderedDict[str, float]" = OrderedDict()
+        # Compact records of finished or evicted orders, oldest first
+        self.archive: "OrderedDict[str, tuple]" = OrderedDict()
+        # Customer/item/status/time indexes over both live and archived orders
+        self.index = OrderIndex()
+        # Live orders written since they were last indexed, with the time a new one was first stored;
+        # indexed in one batch before the next query reads this stripe
+        self.pending: Dict[str, Optional[float]] = {}
+        # Earliest time an order here can pass the age limit; writes before it skip the age check
+        self.expires_at = 0.0
+
 
 class StateManager:
+    """Process-wide order store, sharded by order_id.
+
+    Writers serialize per stripe, so orders hashing to different stripes never
+    contend. Stored states and their OrderRecords are replaced rather than
+    mutated (copy-on-write), so get_state can read a consistent snapshot
+    without taking any lock, and updates build their new state before taking
+    the stripe lock, holding it only to check nothing changed and swap.
+
+    Live orders are bounded by count and age; orders past either limit, and
+    finished orders passed to archive_state, are kept as compact records
+    without their message history, which are in turn bounded by count and age.
+    Archived orders past those limits are dropped, and on_drop listeners told.
+
+    With a persistence backend attached, every write is also queued to its
+    journal while the stripe lock is held, so journal order matches memory order.
+
+    Each stripe keeps secondary indexes (customer, item, payment status,
+    creation time). A write only marks its order pending; the stripe's
+    pending orders are indexed in one batch, under its lock, before a query
+    reads it, so an order written several times is indexed once. Queries
+    merge the per-stripe results, so their cost follows the number of
+    matches and stripes, not the size of the store.
+    """
     _instance = None
     _lock = Lock()
 
@@ -10,29 +113,309 @@ class StateManager:
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(StateManager, cls).__new__(cls)
-                cls._instance._state = {}
-                cls._instance._order_states = {}
+                cls._instance._init_storage(STRIPE_COUNT)
             return cls._instance
 
+    def _init_storage(self, stripe_count: int, max_live: int = STATE_MAX_LIVE_ORDERS,
+                      max_archived: int = STATE_MAX_ARCHIVED_ORDERS,
+                      max_age: float = STATE_MAX_ORDER_AGE) -> None:
+        self._state = {}
+        self._stripes = [_Stripe() for _ in range(stripe_count)]
+        self._stripe_mask = stripe_count - 1
+        # Limits are enforced per stripe, which keeps eviction O(1) per write
+        self._max_live_per_stripe = max(1, max_live // stripe_count)
+        self._max_archived_per_stripe = max(1, max_archived // stripe_count)
+        self._max_age = max_age
+        self._backend: Optional[JournalBackend] = None
+        self._drop_listeners: List[Callable[[str], None]] = []
+
+    def _stripe(self, order_id: str) -> _Stripe:
+        return self._stripes[hash(order_id) & self._stripe_mask]
+
+    def _write(self, stripe: _Stripe, order_id: str, state: Dict[str, Any], now: float, reindex: bool = True) -> None:
+        stripe.states[order_id] = state
+        pending = stripe.pending
+        if order_id not in pending:
+            indexed = order_id in stripe.index.keys
+            if reindex or not indexed:
+                pending[order_id] = None if indexed else time.time()
+        stripe.touched[order_id] = now
+        stripe.touched.move_to_end(order_id)
+        stripe.archive.pop(order_id, None)
+        # Only the live count can grow here, so the full check runs just when it or the age limit is due
+        if len(stripe.states) > self._max_live_per_stripe or now >= stripe.expires_at:
+            self._evict(stripe, now)
+
+    def _evict(self, stripe: _Stripe, now: float) -> None:
+        """Archive live orders over the count/age limit and drop archived ones over theirs."""
+        deadline = now - self._max_age
+        while stripe.touched:
+            order_id, touched_at = next(iter(stripe.touched.items()))
+            if len(stripe.states) <= self._max_live_per_stripe and touched_at > deadline:
+                break
+            del stripe.touched[order_id]
+            state = stripe.states[order_id]
+            if order_id in stripe.pending:
+                stripe.index.update(order_id, state.get("order_state"), stripe.pending.pop(order_id))
+            # Archive before removing so lock-free readers always find the order
+            stripe.archive[order_id] = (encode_archived(state), touched_at)
+            del stripe.states[order_id]
+
+        while stripe.archive:
+            order_id, (_, archived_at) = next(iter(stripe.archive.items()))
+            if len(stripe.archive) <= self._max_archived_per_stripe and archived_at > deadline:
+                break
+            del stripe.archive[order_id]
+            stripe.index.remove(order_id)
+            for listener in self._drop_listeners:
+                listener(order_id)
+
+        if not stripe.touched and not stripe.archive:
+            # Nothing stored: the next write checks again and starts the clock
+            stripe.expires_at = 0.0
+            return
+        oldest = min(next(iter(stripe.touched.values()), now), next(iter(stripe.archive.values()), (None, now))[1])
+        stripe.expires_at = oldest + self._max_age
+
+    @staticmethod
+    def _index_pending(stripe: _Stripe) -> OrderIndex:
+        """Index the stripe's pending writes; the stripe lock must be held. Returns the index."""
+        pending = stripe.pending
+        if pending:
+            states, index = stripe.states, stripe.index
+            for order_id, created in pending.items():
+                state = states.get(order_id)
+                if state is not None:
+                    index.update(order_id, state.get("order_state"), created)
+            pending.clear()
+        return stripe.index
+
+    def on_drop(self, callback: Callable[[str], None]) -> None:
+        """Register callback(order_id), called under the stripe lock when an order leaves retention."""
+        self._drop_listeners.append(callback)
+
     def set_state(self, order_id: str, state: Dict[str, Any]) -> None:
-        with self._lock:
-            self._order_states[order_id] = state
+        stripe = self._stripe(order_id)
+        durable = _durable(state) if self._backend is not None else None
+        with stripe.lock:
+            self._write(stripe, order_id, state, time.monotonic())
+            if durable is not None:
+                self._backend.append(OP_SET, order_id, durable)
 
     def get_state(self, order_id: str) -> Optional[Dict[str, Any]]:
-        with self._lock:
-            return self._order_states.get(order_id)
+        # A single dict lookup is atomic, and snapshots are never mutated in place
+        stripe = self._stripe(order_id)
+        state = stripe.states.get(order_id)
+        if state is not None:
+            return state
+        archived = stripe.archive.get(order_id)
+        return decode_archived(archived[0]) if archived is not None else None
+
+    @staticmethod
+    def _current(stripe: _Stripe, order_id: str) -> Dict[str, Any]:
+        current_state = stripe.states.get(order_id)
+        if current_state is None:
+            archived = stripe.archive.get(order_id)
+            current_state = decode_archived(archived[0]) if archived is not None else {}
+        return current_state
 
     def update_state(self, order_id: str, updates: Dict[str, Any]) -> None:
-        with self._lock:
-            current_state = self._order_states.get(order_id, {})
-            current_state.update(updates)
-            self._order_states[order_id] = current_state
+        stripe = self._stripe(order_id)
+        durable = _durable(updates) if self._backend is not None else None
+        # Build the new state before taking the lock; it is rebuilt under the lock only if another write got in
+        seen = stripe.states.get(order_id)
+        state = {**seen, **updates} if seen is not None else None
+        with stripe.lock:
+            if seen is None or stripe.states.get(order_id) is not seen:
+                state = {**self._current(stripe, order_id), **updates}
+            self._write(stripe, order_id, state, time.monotonic(), reindex="order_state" in updates)
+            if durable is not None:
+                self._backend.append(OP_UPDATE, order_id, durable)
+
+    def merge_order_state(self, order_id: str, fields: Dict[str, Any]) -> OrderRecord:
+        """Apply fields to a copy of an order's record and swap it in under the stripe lock; returns the copy.
+
+        Stages running in parallel each pass only their own fields. The copy
+        is made before the lock is taken and made again under it if another
+        write swapped the record in between, so none loses another's fields.
+        """
+        stripe = self._stripe(order_id)
+        seen = stripe.states.get(order_id)
+        if seen is not None:
+            record = merge_order_fields(seen.get("order_state"), fields)
+            state = {**seen, "order_state": record}
+        with stripe.lock:
+            if seen is None or stripe.states.get(order_id) is not seen:
+                current_state = self._current(stripe, order_id)
+                record = merge_order_fields(current_state.get("order_state"), fields)
+                state = {**current_state, "order_state": record}
+            self._write(stripe, order_id, state, time.monotonic(), reindex=not INDEXED_FIELDS.isdisjoint(fields))
+            if self._backend is not None:
+                self._backend.append(OP_UPDATE, order_id, {"order_state": record.freeze()})
+            return record
+
+    def archive_state(self, order_id: str, state: Dict[str, Any]) -> None:
+        """Store a finished order directly in compact form."""
+        self._archive_record(order_id, encode_archived(state), state.get("order_state"))
+
+    def _archive_record(self, order_id: str, record: bytes, order_state: Any = None) -> None:
+        if order_state is None:
+            order_state = decode_archived(record)["order_state"]
+        stripe = self._stripe(order_id)
+        with stripe.lock:
+            now = time.monotonic()
+            stripe.archive[order_id] = (record, now)
+            stripe.index.update(order_id, order_state, stripe.pending.pop(order_id, None))
+            stripe.archive.move_to_end(order_id)
+            stripe.states.pop(order_id, None)
+            stripe.touched.pop(order_id, None)
+            self._evict(stripe, now)
+            if self._backend is not None:
+                self._backend.append(OP_ARCHIVE, order_id, record)
 
     def clear_state(self, order_id: str) -> None:
-        with self._lock:
-            if order_id in self._order_states:
-                del self._order_states[order_id]
+        stripe = self._stripe(order_id)
+        with stripe.lock:
+            self._clear(stripe, order_id)
+
+    def _clear(self, stripe: _Stripe, order_id: str) -> bool:
+        found = stripe.states.pop(order_id, None) is not None
+        stripe.touched.pop(order_id, None)
+        found = stripe.archive.pop(order_id, None) is not None or found
+        stripe.pending.pop(order_id, None)
+        stripe.index.remove(order_id)
+        if self._backend is not None:
+            self._backend.append(OP_CLEAR, order_id)
+        return found
+
+    def clear_states(self, order_ids: Iterable[str]) -> List[str]:
+        """Remove many orders, taking each stripe's lock once; returns the ids that existed."""
+        by_stripe: Dict[int, List[str]] = {}
+        for order_id in order_ids:
+            by_stripe.setdefault(hash(order_id) & self._stripe_mask, []).append(order_id)
+        cleared = []
+        for position, stripe_order_ids in by_stripe.items():
+            stripe = self._stripes[position]
+            with stripe.lock:
+                cleared.extend(order_id for order_id in stripe_order_ids if self._clear(stripe, order_id))
+        return cleared
+
+    def find_orders(self, customer_id: Optional[str] = None, item_id: Optional[str] = None,
+                    status: Optional[str] = None, since: Optional[float] = None,
+                    until: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """Ids of orders matching every given filter, newest first.
+
+        status is the payment status ("Success"), "pending" or "failed" (an
+        order a stage rejected); since/until bound the time (time.time()) at
+        which the order was first stored. Cancellation requests are not orders
+        and never match.
+        """
+        by_field = customer_id is not None or item_id is not None or status is not None
+        matches = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                index = self._index_pending(stripe)
+                if by_field:
+                    created = index.created
+                    found = [(created[order_id], order_id) for order_id in index.matching(customer_id, item_id, status)]
+                    if since is not None or until is not None:
+                        found = [
+                            entry for entry in found
+                            if (since is None or entry[0] >= since) and (until is None or entry[0] <= until)
+                        ]
+                else:
+                    found = index.between(since, until)
+            matches.extend(found)
+        newest = heapq.nlargest(limit, matches) if limit is not None else sorted(matches, reverse=True)
+        return [order_id for _, order_id in newest]
+
+    def last_order(self, customer_id: str) -> Optional[str]:
+        """The customer's most recently stored order that has not failed, or None."""
+        newest = None
+        for stripe in self._stripes:
+            with stripe.lock:
+                index = self._index_pending(stripe)
+                for order_id in index.by_customer.get(customer_id, ()):
+                    if index.keys[order_id][1] != STATUS_FAILED:
+                        entry = (index.created[order_id], order_id)
+                        if newest is None or entry > newest:
+                            newest = entry
+        return newest[1] if newest is not None else None
+
+    def unit_count(self, item_id: str, status: str = STATUS_SUCCESS) -> int:
+        """Units of an item across orders in a payment status; "Success" gives the committed units."""
+        total = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                total += self._index_pending(stripe).units.get((item_id, status), 0)
+        return total
+
+    def sweep(self) -> None:
+        """Apply the age limit to every stripe, including ones that see no writes."""
+        now = time.monotonic()
+        for stripe in self._stripes:
+            with stripe.lock:
+                self._evict(stripe, now)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Gauge of entry counts and approximate bytes held by live and archived orders."""
+        live_orders = archived_orders = live_bytes = archived_bytes = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                live_orders += len(stripe.states)
+                archived_orders += len(stripe.archive)
+                for state in stripe.states.values():
+                    live_bytes += sys.getsizeof(state) + sum(sys.getsizeof(value) for value in state.values())
+                for record, _ in stripe.archive.values():
+                    archived_bytes += sys.getsizeof(record)
+        return {
+            "live_orders": live_orders,
+            "archived_orders": archived_orders,
+            "live_bytes": live_bytes,
+            "archived_bytes": archived_bytes
+        }
+
+
+    def attach_backend(self, backend: JournalBackend) -> int:
+        """Rebuild the store from the backend, then journal every later write to it.
+
+        Returns the number of records replayed.
+        """
+        replay = {
+            OP_SET: lambda order_id, state: self.set_state(order_id, _revive(state)),
+            OP_UPDATE: lambda order_id, updates: self.update_state(order_id, _revive(updates)),
+            OP_ARCHIVE: self._archive_record,
+            OP_CLEAR: lambda order_id, _: self.clear_state(order_id)
+        }
+        replayed = 0
+        for op, order_id, payload in backend.recover():
+            replay[op](order_id, payload)
+            replayed += 1
+        backend.start(self._export_records)
+        self._backend = backend
+        return replayed
+
+    def detach_backend(self) -> None:
+        """Flush and close the attached backend."""
+        backend, self._backend = self._backend, None
+        if backend is not None:
+            backend.close()
+
+    def _export_records(self):
+        """Current contents as set/archive records, copied one stripe at a time."""
+        for stripe in self._stripes:
+            with stripe.lock:
+                live = list(stripe.states.items())
+                archived = [(order_id, record) for order_id, (record, _) in stripe.archive.items()]
+            for order_id, state in live:
+                yield OP_SET, order_id, _durable(state)
+            for order_id, record in archived:
+                yield OP_ARCHIVE, order_id, record
 
 
 # Global instance
-state_manager = StateManager()
\ No newline at end of file
+state_manager = StateManager()
+
+if STATE_JOURNAL_DIR:
+    state_manager.attach_backend(JournalBackend(STATE_JOURNAL_DIR, STATE_SNAPSHOT_EVERY, STATE_JOURNAL_FSYNC))
+    atexit.register(state_manager.detach_backend)
@@ -0,0 +1,93 @@
+import json
+from typing import Any, Dict, Iterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from config import ORDER_LLM_BUDGET
+from json_stream import ObjectStreamParser
+from resilience import order_config
+
+# Console label for each graph node
+STAGE_LABELS = {
+    "RouteQuery": "Route",
+    "ValidateCustomer": "Customer",
+    "CheckInventory": "Inventory",
+    "ComputeShipping": "Shipping",
+    "ProcessPayment": "Payment",
+    "ProcessOrderResult": "Result",
+    "CancelOrder": "Cancel",
+    "DirectCancel": "Cancel",
+    "tools_2": "Cancel",
+}
+
+# Nodes whose structured reply decides the route, and the field that does
+ROUTE_FIELDS = {
+    "RouteQuery": "category",
+}
+
+
+def format_message(content: str) -> str:
+    """Pretty-print JSON message content, leaving anything else as is."""
+    try:
+        return json.dumps(json.loads(content), indent=2)
+    except (TypeError, ValueError):
+        return content
+
+
+def stream_order_events(agent, inputs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Run the graph and yield render events as soon as they are produced.
+
+    Uses per-node update deltas plus LLM token streams instead of full state
+    values, so each message arrives once and the first token reaches the
+    caller while the model is still generating. Events are dicts with a
+    "type" of:
+      - "token":   {"node", "text"}: a fragment of an LLM reply (or of its tool call arguments) in progress
+      - "route":   {"node", "category"}: the routing field of a structured reply, as soon as it has streamed
+      - "stage":   {"node", "stage", "error"}: a node finished
+      - "message": {"node", "content"}: a new assistant message
+    All LLM calls for the order share the ORDER_LLM_BUDGET deadline.
+    """
+    # Incremental parsers for the tool call arguments streaming in, by (LLM run, tool call index)
+    parsers: Dict[Any, ObjectStreamParser] = {}
+
+    for mode, payload in agent.stream(inputs, config=order_config(ORDER_LLM_BUDGET),
+                                      stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            chunk, metadata = payload
+            if not isinstance(chunk, AIMessageChunk):
+                continue
+            node = metadata.get("langgraph_node")
+            if isinstance(chunk.content, str) and chunk.content:
+                yield {"type": "token", "node": node, "text": chunk.content}
+            for call in chunk.tool_call_chunks:
+                if not call.get("args"):
+                    continue
+                yield {"type": "token", "node": node, "text": call["args"]}
+                if node not in ROUTE_FIELDS:
+                    continue
+                parser = parsers.setdefault((chunk.id, call.get("index")), ObjectStreamParser())
+                try:
+                    completed = parser.feed(call["args"])
+                except ValueError:
+                    # Malformed arguments are retried by the node; the stage event still follows
+                    parser.done = True
+                    continue
+                field = ROUTE_FIELDS[node]
+                if field in completed:
+                    yield {"type": "route", "node": node, field: completed[field]}
+            continue
+
+        for node, delta in payload.items():
+            if node not in STAGE_LABELS:
+                continue
+            delta = delta or {}
+            yield {
+                "type": "stage",
+                "node": node,
+                "stage": STAGE_LABELS[node],
+                "error": delta.get("error")
+            }
+            # Nodes return only the messages they add, so each is rendered once as it arrives
+            for message in delta.get("messages") or []:
+                if isinstance(message, AIMessage) and message.content:
+                    yield {"type": "message", "node": node, "content": format_message(message.content)}
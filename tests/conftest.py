@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Tests run offline against the rule-based fake model; config reads these on first import
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("LOG_FILE", "")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CATALOG_RELOAD_INTERVAL", "0")
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
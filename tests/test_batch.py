@@ -0,0 +1,35 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+import batch
+import workflow
+from inventory_engine import get_inventory_engine
+from state_manager import state_manager
+
+ITEM = "item_201"
+
+
+@pytest.mark.parametrize("query", [
+    f"I want to place an order for {ITEM}, quantity 500000, my customer id is customer_999",
+    "I want to place an order for item_999, quantity 2, my customer id is customer_999",
+])
+def test_batch_reports_every_error_like_the_graph(query):
+    graph_error = workflow.create_workflow().invoke({"messages": [HumanMessage(content=query)]})["error"]
+    (result,) = batch.process_order_batch([query])
+    assert result["status"] == "error"
+    assert result["error"] == graph_error
+    assert "; " in graph_error
+
+
+def test_batch_cancels_by_the_extracted_id(monkeypatch):
+    (placed,) = batch.process_order_batch([f"I want to place an order for {ITEM}, quantity 1, "
+                                           f"my customer id is customer_103"])
+    order_id = placed["order"]["order_id"]
+    available = get_inventory_engine().available(ITEM)
+    monkeypatch.setattr(batch, "_extract_batch",
+                        lambda queries: [{"category": "CancelOrder", "cancel_order_id": order_id}])
+
+    (cancelled,) = batch.process_order_batch(["please drop the order I placed a minute ago"])
+    assert cancelled["status"] == "success"
+    assert state_manager.get_state(order_id) is None
+    assert get_inventory_engine().available(ITEM) == available + 1
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from catalog import Catalog
+
+INVENTORY = "item_id,name,stock,weight,price\n" + "".join(
+    f"item_{number},Item {number},{10 + number},1.5,9.99\n" for number in range(20)
+)
+CUSTOMERS = "customer_id,name\ncustomer_1,Ann\ncustomer_2,Bo\n"
+
+
+def write(path, text, version):
+    with open(path, "w") as data_file:
+        data_file.write(text)
+    # Distinct mtimes, so every write is seen as a change even on coarse clocks
+    os.utime(path, ns=(version * 10 ** 9, version * 10 ** 9))
+
+
+@pytest.fixture
+def paths(tmp_path):
+    inventory, customers = str(tmp_path / "inventory.csv"), str(tmp_path / "customers.csv")
+    write(inventory, INVENTORY, 1)
+    write(customers, CUSTOMERS, 1)
+    return inventory, customers, str(tmp_path / "cache")
+
+
+def edited(stock):
+    return INVENTORY.replace("item_3,Item 3,13,", f"item_3,Item 3,{stock},").replace("item_19,Item 19,29,1.5,9.99\n", "")
+
+
+def test_reload_applies_changed_rows(paths):
+    inventory, customers, cache_dir = paths
+    catalog = Catalog(inventory, customers, cache_dir)
+    changes = []
+    catalog.on_stock_change(lambda stock, removed: changes.append((stock, removed)))
+
+    write(inventory, edited(99) + "item_50,New,5,2.0,1.00\n", 2)
+    assert catalog.reload()
+
+    tables = catalog.current()
+    assert tables.version == 2
+    assert tables.inventory["item_3"]["stock"] == 99
+    assert tables.inventory["item_4"]["stock"] == 14
+    assert tables.inventory["item_50"]["stock"] == 5
+    assert "item_19" not in tables.inventory
+    assert len(tables.inventory) == 20
+    assert list(tables.item_values("weight", ["item_3", "item_50"])) == [1.5, 2.0]
+    assert changes == [({"item_3": 99, "item_50": 5}, ["item_19"])]
+    # The pinned version still serves the old rows
+    assert catalog.get(1).inventory["item_3"]["stock"] == 13
+
+
+def test_compiled_tables_do_not_accumulate(paths):
+    inventory, customers, cache_dir = paths
+    catalog = Catalog(inventory, customers, cache_dir)
+    files = sorted(os.listdir(cache_dir))
+
+    for version in range(2, 6):
+        write(inventory, edited(100 + version), version)
+        assert catalog.reload()
+        assert sorted(os.listdir(cache_dir)) == files
+
+    # A restart compiles the edited file once and drops the superseded table
+    superseded = os.path.basename(catalog.current().inventory.path)
+    restarted = Catalog(inventory, customers, cache_dir)
+    assert restarted.current().inventory["item_3"]["stock"] == 105
+    assert len(os.listdir(cache_dir)) == len(files)
+    assert superseded not in os.listdir(cache_dir)
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_failed_reload_changes_nothing_and_is_retried(paths, cache):
+    inventory, customers, cache_dir = paths
+    catalog = Catalog(inventory, customers, cache_dir if cache else None)
+    changes = []
+    catalog.on_stock_change(lambda stock, removed: changes.append(stock))
+    signatures = dict(catalog._signatures)
+
+    write(inventory, edited(99), 2)
+    write(customers, "id,name\ncustomer_1,Ann\n", 2)
+    with pytest.raises(KeyError):
+        catalog.reload()
+    assert catalog.current().version == 1
+    assert catalog.current().inventory["item_3"]["stock"] == 13
+    assert catalog._signatures == signatures
+    assert changes == []
+
+    write(customers, CUSTOMERS + "customer_3,Cy\n", 3)
+    assert catalog.reload()
+    assert catalog.current().version == 2
+    assert catalog.current().inventory["item_3"]["stock"] == 99
+    assert "customer_3" in catalog.current().customers
+    assert changes == [{"item_3": 99}]
+    assert not catalog.reload()
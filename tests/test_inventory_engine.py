@@ -0,0 +1,80 @@
+import uuid
+
+from inventory_engine import InventoryEngine
+from order_record import OrderRecord
+from state_manager import StateManager
+
+
+def engine(stock=10):
+    return InventoryEngine.from_items(["item_1", "item_2"], [stock, stock])
+
+
+def test_reserve_commit_release():
+    inventory = engine()
+    assert inventory.reserve("a", "item_1", 4)
+    assert inventory.available("item_1") == 6
+    assert not inventory.reserve("b", "item_1", 7)
+
+    assert inventory.commit("a")
+    assert inventory.available("item_1") == 6
+    assert inventory.reservation("a") == {"quantity": 4, "committed": True}
+
+    # A cancellation returns units that were already sold
+    assert inventory.release("a")
+    assert inventory.available("item_1") == 10
+    assert not inventory.release("a")
+    assert not inventory.commit("missing")
+
+
+def test_reserve_is_idempotent_per_order():
+    inventory = engine()
+    assert inventory.reserve("a", "item_1", 4)
+    assert inventory.reserve("a", "item_1", 4)
+    assert inventory.available("item_1") == 6
+
+
+def test_reserve_lines_is_all_or_nothing():
+    inventory = engine()
+    assert inventory.reserve_lines("cart", ["item_1", "item_2", "item_1"], [2, 3, 1]) == {}
+    assert inventory.available("item_1") == 7
+    assert inventory.available("item_2") == 7
+
+    assert inventory.reserve_lines("short", ["item_1", "item_2"], [1, 8]) == {"item_2": 7}
+    assert inventory.available("item_1") == 7
+
+    inventory.commit("cart")
+    inventory.release("cart")
+    assert inventory.available("item_1") == 10
+    assert inventory.available("item_2") == 10
+
+
+def test_expire_drops_sales_and_releases_holds():
+    inventory = engine()
+    inventory.reserve("sold", "item_1", 2)
+    inventory.commit("sold")
+    inventory.reserve("held", "item_2", 3)
+
+    inventory.expire("sold")
+    inventory.expire("held")
+    assert inventory.reservation("sold") is None
+    assert inventory.available("item_1") == 8
+    assert inventory.available("item_2") == 10
+
+
+def test_sales_are_forgotten_when_the_store_drops_their_order():
+    manager = object.__new__(StateManager)
+    manager._init_storage(1, max_live=2, max_archived=2, max_age=float("inf"))
+    inventory = InventoryEngine.from_items(["item_1"], [1000])
+    manager.on_drop(inventory.expire)
+
+    for _ in range(50):
+        order_id = str(uuid.uuid4())
+        inventory.reserve(order_id, "item_1", 1)
+        inventory.commit(order_id)
+        manager.set_state(order_id, {"order_state": OrderRecord(
+            order_id=order_id, category="PlaceOrder", customer_id="customer_1",
+            item_id="item_1", quantity=1, payment_status="Success"
+        )})
+
+    assert len(inventory._reservations) <= 4
+    assert inventory.available("item_1") == 950
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from json_stream import ObjectStreamParser
+
+DOCUMENT = {
+    "category": "PlaceOrder",
+    "note": "say \"hi\", then \\ and é {not: nested}",
+    "quantity": 12,
+    "price": -1.5e2,
+    "gift": True,
+    "coupon": None,
+    "lines": [{"item_id": "item_1", "quantity": 2}, {"item_id": "item_2", "quantity": [1, {"x": "]"}]}],
+    "address": {"city": "Oslo", "zip": "0150"},
+}
+
+
+def feed_in_pieces(text, size):
+    parser = ObjectStreamParser()
+    seen = []
+    for start in range(0, len(text), size):
+        seen.extend(parser.feed(text[start:start + size]))
+    return parser, seen
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_fields_survive_any_split(size):
+    text = json.dumps(DOCUMENT, indent=1)
+    parser, seen = feed_in_pieces(text, size)
+    assert parser.done
+    assert parser.fields == DOCUMENT
+    # Fields complete in the order they stream, each exactly once
+    assert seen == list(DOCUMENT)
+
+
+def test_string_field_completes_at_its_closing_quote():
+    parser = ObjectStreamParser()
+    assert parser.feed('{"category": "Cancel') == {}
+    assert parser.feed('Order"') == {"category": "CancelOrder"}
+    assert parser.feed(', "quantity": 3') == {}
+    assert parser.feed("}") == {"quantity": 3}
+    assert parser.done
+
+
+def test_escaped_quote_in_key_and_value():
+    parser = ObjectStreamParser()
+    parser.feed(r'{"a\"b": "c\\", "d": "\"}"}')
+    assert parser.fields == {'a"b': "c\\", "d": '"}'}
+
+
+def test_text_after_the_object_is_ignored():
+    parser = ObjectStreamParser()
+    assert parser.feed('{}{"a": 1}') == {}
+    assert parser.done and parser.fields == {}
+
+
+@pytest.mark.parametrize("text", ["[1, 2]", '{"a" 1}', '{a: 1}', '{"a": 1 "b": 2}'])
+def test_malformed_input_raises(text):
+    with pytest.raises(ValueError):
+        ObjectStreamParser().feed(text)
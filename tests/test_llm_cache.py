@@ -0,0 +1,74 @@
+import llm_cache
+from llm_cache import ExtractionCache
+
+ORDER = {"category": "PlaceOrder", "customer_id": "customer_1", "item_id": "item_1", "quantity": 2}
+
+
+class Clock:
+    """Stands in for the time module so expiry can be stepped."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    cache = ExtractionCache(max_size=4, ttl=10)
+    cache.set("v1", "order 2 of item_1", ORDER)
+
+    clock.now += 9
+    assert cache.get("v1", "order 2 of item_1") == ORDER
+    clock.now += 2
+    assert cache.get("v1", "order 2 of item_1") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ExtractionCache(max_size=2)
+    cache.set("v1", "first", {"n": 1})
+    cache.set("v1", "second", {"n": 2})
+    assert cache.get("v1", "first") == {"n": 1}
+    cache.set("v1", "third", {"n": 3})
+
+    assert cache.get("v1", "second") is None
+    assert cache.get("v1", "first") == {"n": 1}
+    assert cache.get("v1", "third") == {"n": 3}
+
+
+def test_keys_include_prompt_version_and_ignore_spacing_and_case():
+    cache = ExtractionCache()
+    cache.set("v1", "Order  2 of\titem_1 ", ORDER)
+    assert cache.get("v1", "order 2 of item_1") == ORDER
+    assert cache.get("v2", "order 2 of item_1") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_hits_are_copies():
+    cache = ExtractionCache()
+    cache.set("v1", "query", ORDER)
+    cache.get("v1", "query")["quantity"] = 99
+    assert cache.get("v1", "query") == ORDER
+
+
+def test_disk_tier_survives_a_restart_and_expires(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    path = str(tmp_path / "extractions.sqlite")
+    ExtractionCache(ttl=60, path=path).set("v1", "query", ORDER)
+
+    restarted = ExtractionCache(ttl=60, path=path)
+    assert restarted.get("v1", "query") == ORDER
+    assert restarted.stats()["disk_hits"] == 1
+    # Now held in memory, so the second read does not touch disk
+    assert restarted.get("v1", "query") == ORDER
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.now += 61
+    assert ExtractionCache(ttl=60, path=path).get("v1", "query") is None
@@ -0,0 +1,30 @@
+import threading
+import time
+
+from metrics import TimedLock, registry, timed_lock
+
+
+def test_timed_lock_records_only_contended_waits():
+    lock = TimedLock("test_contended")
+    waits = registry.histogram("lock_wait_seconds", lock="test_contended")
+    with lock:
+        pass
+    assert waits.count == 0
+
+    lock.acquire()
+    def wait():
+        with lock:
+            pass
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.02)
+    lock.release()
+    waiter.join()
+    assert waits.count == 1
+    assert waits.sum >= 0.01
+    assert not lock.locked()
+
+
+def test_stripe_locks_are_timed_while_metrics_are_enabled():
+    assert isinstance(timed_lock("test_default"), TimedLock) == registry.enabled
@@ -0,0 +1,53 @@
+import pytest
+
+from order_parser import fast_parse_order, lenient_parse_order
+
+CUSTOMER = "my customer id is customer_103"
+
+
+def test_canonical_order():
+    assert fast_parse_order(f"I want to place an order for item_201, quantity 2, {CUSTOMER}") == {
+        "category": "PlaceOrder", "customer_id": "customer_103", "item_id": "item_201",
+        "quantity": 2, "location": "domestic"
+    }
+
+
+def test_canonical_cart():
+    parsed = fast_parse_order(f"I want to place an order for item_201 x2, item_202 x1, {CUSTOMER}")
+    assert parsed["lines"] == [{"item_id": "item_201", "quantity": 2}, {"item_id": "item_202", "quantity": 1}]
+
+
+def test_canonical_cancel():
+    assert fast_parse_order("Cancel order 223") == {"category": "CancelOrder", "cancel_order_id": "223"}
+
+
+@pytest.mark.parametrize("text", [
+    f"I want to cancel my order for item_201, quantity 2, {CUSTOMER}",
+    f"Do not place an order for item_201, quantity 2, {CUSTOMER}",
+    f"Don't place an order for item_201, quantity 2, {CUSTOMER}",
+    f"What is the status of my order for item_201, quantity 2, {CUSTOMER}",
+    f"Where is the order I placed for item_201, quantity 2, {CUSTOMER}",
+    f"Can I place an order for item_201, quantity 2, {CUSTOMER}?",
+    f"Please change my order for item_201 to quantity 2, {CUSTOMER}",
+    # No place/buy/purchase verb
+    f"My order for item_201, quantity 2, {CUSTOMER}",
+])
+def test_non_orders_go_to_the_llm(text):
+    assert fast_parse_order(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    f"I want to place an order for item_201, quantity 2.5, {CUSTOMER}",
+    f"I want to place an order for item_201, 2.5 units, {CUSTOMER}",
+    f"I want to place an order for item_201, quantity 2, maybe 3, {CUSTOMER}",
+    f"I want to place an order for item_201, quantity 2, 3 units, {CUSTOMER}",
+    f"I want to place an order for item_201 x2.5, item_202 x1, {CUSTOMER}",
+    f"I want to place an order for item_201, quantity 0, {CUSTOMER}",
+])
+def test_decimal_or_ambiguous_quantities_are_rejected(text):
+    assert fast_parse_order(text) is None
+
+
+def test_lenient_parser_keeps_cancellations():
+    parsed = lenient_parse_order(f"I want to cancel my order 223 for item_201, {CUSTOMER}")
+    assert parsed["category"] == "CancelOrder"
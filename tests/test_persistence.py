@@ -0,0 +1,86 @@
+import os
+import uuid
+
+import pytest
+
+from order_record import OrderRecord
+from persistence import JournalBackend
+from state_manager import StateManager
+
+
+def fresh_manager():
+    manager = object.__new__(StateManager)
+    manager._init_storage(4, max_live=1000, max_archived=1000, max_age=float("inf"))
+    return manager
+
+
+def place(manager, **fields):
+    order_id = str(uuid.uuid4())
+    manager.set_state(order_id, {"order_state": OrderRecord(
+        order_id=order_id, category="PlaceOrder", customer_id="customer_1", item_id="item_1", quantity=2, **fields
+    ), "messages": ["not persisted"]})
+    return order_id
+
+
+@pytest.mark.parametrize("snapshot_every", [100000, 3])
+def test_recover_rebuilds_the_store(tmp_path, snapshot_every):
+    manager = fresh_manager()
+    backend = JournalBackend(str(tmp_path), snapshot_every, fsync=False)
+    manager.attach_backend(backend)
+    merged = place(manager)
+    manager.merge_order_state(merged, {"shipping_cents": 1200, "payment_status": "Success"})
+    archived = place(manager)
+    manager.archive_state(archived, {"order_state": {
+        "order_id": archived, "customer_id": "customer_1", "item_id": "item_1", "quantity": 2,
+        "payment_status": "Success"
+    }})
+    cleared = place(manager)
+    manager.clear_state(cleared)
+    for _ in range(5):
+        place(manager)
+        # Separate group commits, so a small snapshot_every rolls the journal over
+        backend.flush()
+    manager.detach_backend()
+
+    recovered = fresh_manager()
+    recovered.attach_backend(JournalBackend(str(tmp_path), snapshot_every, fsync=False))
+    try:
+        record = recovered.get_state(merged)["order_state"]
+        assert isinstance(record, OrderRecord)
+        assert (record.shipping_cents, record.payment_status, record.quantity) == (1200, "Success", 2)
+        assert "messages" not in recovered.get_state(merged)
+        assert recovered.get_state(archived)["archived"]
+        assert recovered.get_state(cleared) is None
+        assert len(recovered.find_orders(customer_id="customer_1")) == 7
+        assert recovered.unit_count("item_1") == 4
+    finally:
+        recovered.detach_backend()
+    if snapshot_every == 3:
+        assert os.path.exists(os.path.join(str(tmp_path), "snapshot"))
+
+
+def test_merge_copies_the_record():
+    manager = fresh_manager()
+    order_id = place(manager)
+    before = manager.get_state(order_id)["order_state"]
+    after = manager.merge_order_state(order_id, {"payment_status": "Success", "note": "extra"})
+
+    assert after is not before
+    assert before.payment_status is None and before.get("note") is None
+    assert manager.get_state(order_id)["order_state"] is after
+    assert after.payment_status == "Success" and after["note"] == "extra"
+
+
+def test_torn_journal_tail_is_discarded(tmp_path):
+    manager = fresh_manager()
+    manager.attach_backend(JournalBackend(str(tmp_path), 100000, fsync=False))
+    kept = place(manager)
+    manager.detach_backend()
+    segment = sorted(name for name in os.listdir(str(tmp_path)) if name.startswith("journal."))[-1]
+    with open(os.path.join(str(tmp_path), segment), "ab") as journal:
+        journal.write(b"\x00\x00\x01\x00garbage")
+
+    recovered = fresh_manager()
+    recovered.attach_backend(JournalBackend(str(tmp_path), 100000, fsync=False))
+    recovered.detach_backend()
+    assert recovered.get_state(kept) is not None
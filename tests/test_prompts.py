@@ -0,0 +1,45 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from prompts import CATEGORIZE_PROMPT, context_window, message_tokens
+
+
+def tool_round(number, size=0):
+    call_id = f"call_{number}"
+    return [
+        AIMessage(content="", tool_calls=[{"name": "cancel_order", "args": {"query": "x" * size}, "id": call_id}]),
+        ToolMessage(content=f"result {number}", tool_call_id=call_id),
+    ]
+
+
+def test_earlier_turns_are_left_out():
+    request = HumanMessage(content="cancel order 123")
+    messages = [HumanMessage(content="place an order"), AIMessage(content="done"), request] + tool_round(1)
+    assert context_window(messages, 10_000) == [request] + tool_round(1)
+
+
+def test_oldest_rounds_are_dropped_whole():
+    request = HumanMessage(content="cancel order 123")
+    rounds = [tool_round(number, size=200) for number in range(3)]
+    messages = [request] + [message for exchange in rounds for message in exchange]
+    budget = message_tokens(request) + 2 * sum(message_tokens(message) for message in rounds[0])
+
+    window = context_window(messages, budget)
+    assert window == [request] + rounds[1] + rounds[2]
+    # Every tool result still follows the call that asked for it
+    assert isinstance(window[1], AIMessage) and isinstance(window[2], ToolMessage)
+
+
+def test_latest_round_is_kept_over_budget():
+    request = HumanMessage(content="cancel order 123")
+    messages = [request] + tool_round(1, size=4000)
+    assert context_window(messages, 10) == messages
+
+
+def test_empty_history():
+    assert context_window([], 100) == []
+
+
+def test_prompt_prefix_is_fixed_and_fields_come_last():
+    first, second = CATEGORIZE_PROMPT.format(text="a"), CATEGORIZE_PROMPT.format(text="b")
+    assert first.startswith(CATEGORIZE_PROMPT.prefix) and second.startswith(CATEGORIZE_PROMPT.prefix)
+    assert first.endswith("Text: a")
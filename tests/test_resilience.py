@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.runnables.config import var_child_runnable_config
+
+from resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, ORDER_DEADLINE_KEY, ResilientCaller
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10, clock=clock)
+    breaker.allow()
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    clock.now = 10
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only the probe goes through while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.rejected == 2
+
+
+def test_failed_probe_reopens_and_interrupted_probe_is_retried():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opens == 2
+
+    clock.now = 20
+    breaker.allow()
+    breaker.release()
+    # The interrupted probe does not restart the cooldown
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_call_past_its_timeout_raises_and_counts_as_a_failure():
+    caller = ResilientCaller(call_timeout=0.05, hedge_percentile=0,
+                             breaker=CircuitBreaker(failure_threshold=1, cooldown=60))
+    with pytest.raises(DeadlineExceeded):
+        caller.call(lambda timeout, hedge: time.sleep(0.3))
+    with pytest.raises(CircuitOpenError):
+        caller.call(lambda timeout, hedge: "never run")
+    assert caller.stats()["deadline_exceeded"] == 1
+
+
+def test_spent_order_budget_skips_the_call():
+    caller = ResilientCaller()
+    token = var_child_runnable_config.set({"configurable": {ORDER_DEADLINE_KEY: time.monotonic() - 1}})
+    try:
+        with pytest.raises(DeadlineExceeded):
+            caller.call(lambda timeout, hedge: pytest.fail("called after the deadline"))
+    finally:
+        var_child_runnable_config.reset(token)
+    assert caller.calls == 0
+
+
+def test_order_budget_caps_the_call_timeout():
+    caller = ResilientCaller(call_timeout=30, hedge_percentile=0)
+    timeouts = []
+    token = var_child_runnable_config.set({"configurable": {ORDER_DEADLINE_KEY: time.monotonic() + 2}})
+    try:
+        caller.call(lambda timeout, hedge: timeouts.append(timeout))
+    finally:
+        var_child_runnable_config.reset(token)
+    assert 0 < timeouts[0] <= 2
+
+
+def test_ignored_errors_pass_through_without_tripping_the_breaker():
+    caller = ResilientCaller(breaker=CircuitBreaker(failure_threshold=1), ignore=(KeyError,))
+
+    def attempt(timeout, hedge):
+        raise KeyError("bad input")
+
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            caller.call(attempt)
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def slow_endpoint_caller():
+    caller = ResilientCaller(call_timeout=5, hedge_percentile=0.5, hedge_min_delay=0.01, hedge_max_ratio=1)
+    for _ in range(caller.latencies.min_samples):
+        caller.latencies.add(0.01)
+    return caller
+
+
+def test_slow_call_is_hedged_and_the_hedge_wins():
+    caller = slow_endpoint_caller()
+
+    def attempt(timeout, hedge):
+        if not hedge:
+            time.sleep(0.3)
+            return "primary"
+        return "hedge"
+
+    assert caller.call(attempt) == "hedge"
+    assert (caller.hedges, caller.hedge_wins) == (1, 1)
+
+
+def test_async_hedge_wins_and_the_loser_is_cancelled():
+    caller = slow_endpoint_caller()
+    cancelled = []
+
+    async def attempt(timeout, hedge):
+        if hedge:
+            return "hedge"
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "primary"
+
+    async def main():
+        result = await caller.acall(attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "hedge"
+    assert cancelled == [True]
+    assert caller.hedge_wins == 1
+
+
+def test_async_call_past_its_timeout_raises():
+    caller = ResilientCaller(call_timeout=0.05, hedge_percentile=0)
+
+    async def attempt(timeout, hedge):
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(caller.acall(attempt))
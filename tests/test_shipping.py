@@ -0,0 +1,30 @@
+import pytest
+
+from config import SHIPPING_RATES_PATH
+from shipping import ShippingEngine, format_cents
+
+# The flat dollars-per-unit rates the tariff replaced
+BASELINE_RATES = {"local": 5, "domestic": 10, "international": 20}
+WEIGHTS = [0, 0.5, 1.2, 1.5, 3.75, 12, 19.99, 20, 20.01, 49.99, 50, 50.5, 75.25, 120, 1000, 12345.67]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return ShippingEngine.from_csv(SHIPPING_RATES_PATH)
+
+
+@pytest.mark.parametrize("location", [*BASELINE_RATES, "mars"])
+def test_default_tariff_matches_baseline_prices(engine, location):
+    rate = BASELINE_RATES.get(location, BASELINE_RATES["domestic"])
+    expected = [f"${weight * rate:.2f}" for weight in WEIGHTS]
+    assert [format_cents(engine.quote(location, weight)) for weight in WEIGHTS] == expected
+    assert [format_cents(int(cents)) for cents in engine.quote_batch([location] * len(WEIGHTS), WEIGHTS)] == expected
+
+
+def test_bands_price_from_their_start():
+    engine = ShippingEngine([
+        {"zone": "domestic", "max_weight": "10", "base_cents": "0", "cents_per_weight": "1000"},
+        {"zone": "domestic", "max_weight": "inf", "base_cents": "10000", "cents_per_weight": "500"},
+    ])
+    assert [engine.quote("domestic", weight) for weight in (4, 10, 12)] == [4000, 10000, 11000]
+    assert engine.quote_batch(["domestic"] * 3, [4, 10, 12]).tolist() == [4000, 10000, 11000]
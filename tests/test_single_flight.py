@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", call)))
+    leader.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(flight.do("key", call))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    while flight.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+
+
+def test_leader_exception_reaches_waiters():
+    flight = SingleFlight()
+
+    async def main():
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flight.ado("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.calls == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_flight():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flight.ado("key", call)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiters[0]
+        return await leader, await asyncio.gather(*waiters[1:])
+
+    leader_result, waiter_results = asyncio.run(main())
+    assert len(calls) == 1
+    assert leader_result == ("answer", False)
+    assert waiter_results == [("answer", True)] * 2
+
+
+def test_cancelled_leader_lets_waiters_retry():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == (2, False)
+    assert len(calls) == 2
@@ -0,0 +1,132 @@
+import uuid
+
+import pytest
+
+from order_index import STATUS_FAILED, STATUS_PENDING, STATUS_SUCCESS
+from order_record import OrderRecord
+from state_manager import StateManager
+
+
+@pytest.fixture
+def manager():
+    # A private store instead of the process-wide singleton
+    manager = object.__new__(StateManager)
+    manager._init_storage(4, max_live=1000, max_archived=1000, max_age=float("inf"))
+    return manager
+
+
+def place(manager, customer_id="customer_1", item_id="item_1", quantity=1, **fields):
+    order_id = str(uuid.uuid4())
+    manager.set_state(order_id, {"order_state": OrderRecord(
+        order_id=order_id, category="PlaceOrder", customer_id=customer_id,
+        item_id=item_id, quantity=quantity, **fields
+    )})
+    return order_id
+
+
+def test_status_follows_payment(manager):
+    order_id = place(manager, quantity=3)
+    assert manager.find_orders(status=STATUS_PENDING) == [order_id]
+    assert manager.unit_count("item_1", STATUS_PENDING) == 3
+
+    manager.merge_order_state(order_id, {"payment_status": STATUS_SUCCESS})
+    assert manager.find_orders(status=STATUS_PENDING) == []
+    assert manager.find_orders(status=STATUS_SUCCESS) == [order_id]
+    assert manager.unit_count("item_1") == 3
+
+
+def test_failed_orders_are_not_pending_or_last(manager):
+    placed = place(manager, quantity=1, payment_status=STATUS_SUCCESS)
+    failed = place(manager, quantity=500)
+    manager.merge_order_state(failed, {"payment_status": STATUS_FAILED})
+
+    assert manager.find_orders(status=STATUS_FAILED) == [failed]
+    assert manager.unit_count("item_1", STATUS_PENDING) == 0
+    assert manager.last_order("customer_1") == placed
+
+
+def test_cancel_requests_are_not_indexed(manager):
+    order_id = place(manager)
+    cancel_id = str(uuid.uuid4())
+    manager.set_state(cancel_id, {"order_state": OrderRecord(
+        order_id=cancel_id, category="CancelOrder", customer_id="customer_1", cancel_order_id=order_id
+    )})
+    assert manager.find_orders(customer_id="customer_1") == [order_id]
+    assert manager.last_order("customer_1") == order_id
+    assert manager.get_state(cancel_id) is not None
+
+
+def test_archived_orders_stay_indexed_until_dropped(manager):
+    order_id = place(manager, quantity=2)
+    manager.archive_state(order_id, {"order_state": {
+        "order_id": order_id, "customer_id": "customer_1", "item_id": "item_1",
+        "quantity": 2, "payment_status": STATUS_SUCCESS
+    }})
+    assert manager.unit_count("item_1") == 2
+    assert manager.clear_states([order_id]) == [order_id]
+    assert manager.unit_count("item_1") == 0
+    assert manager.find_orders(customer_id="customer_1") == []
+
+
+def test_cart_lines_are_indexed_per_item(manager):
+    single = place(manager, item_id="item_201", quantity=1)
+    cart = str(uuid.uuid4())
+    manager.set_state(cart, {"order_state": OrderRecord(
+        order_id=cart, category="PlaceOrder", customer_id="customer_2",
+        lines=[{"item_id": "item_201", "quantity": 3}, {"item_id": "item_202", "quantity": 2}]
+    )})
+
+    assert manager.unit_count("item_201", STATUS_PENDING) == 4
+    assert manager.unit_count("item_202", STATUS_PENDING) == 2
+    assert set(manager.find_orders(item_id="item_201")) == {single, cart}
+    assert manager.find_orders(item_id="item_202", customer_id="customer_2") == [cart]
+
+    manager.merge_order_state(cart, {"payment_status": STATUS_SUCCESS})
+    assert manager.unit_count("item_201", STATUS_PENDING) == 1
+    assert manager.unit_count("item_201") == 3
+
+    manager.clear_state(cart)
+    assert manager.unit_count("item_201") == 0
+    assert manager.find_orders(item_id="item_202") == []
+
+
+def test_pending_writes_are_indexed_with_first_write_time(manager):
+    first = place(manager)
+    second = place(manager)
+    manager.merge_order_state(first, {"payment_status": STATUS_SUCCESS})
+    stripe = manager._stripe(first)
+    assert first in stripe.pending
+
+    assert manager.find_orders(customer_id="customer_1", status=STATUS_SUCCESS) == [first]
+    assert not stripe.pending
+    # Creation order is the order of the first writes, not of the batch
+    assert manager.last_order("customer_1") == second
+
+
+def test_evicted_pending_orders_stay_indexed():
+    manager = object.__new__(StateManager)
+    manager._init_storage(1, max_live=2, max_archived=10, max_age=float("inf"))
+    order_ids = [place(manager, quantity=2) for _ in range(4)]
+    assert len(manager._stripes[0].states) == 2
+    assert manager.unit_count("item_1", STATUS_PENDING) == 8
+    assert sorted(manager.find_orders(customer_id="customer_1")) == sorted(order_ids)
+
+
+def test_concurrent_merges_keep_every_field(manager):
+    import threading
+    order_id = place(manager)
+    fields = ("location", "shipping_cost", "payment_status", "total_weight")
+
+    def merge(field):
+        for number in range(200):
+            manager.merge_order_state(order_id, {field: f"{field}-{number}"})
+            manager.update_state(order_id, {field: number})
+
+    threads = [threading.Thread(target=merge, args=(field,)) for field in fields]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    state = manager.get_state(order_id)
+    assert [getattr(state["order_state"], field) for field in fields] == [f"{field}-199" for field in fields]
+    assert [state[field] for field in fields] == [199] * len(fields)
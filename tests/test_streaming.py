@@ -0,0 +1,16 @@
+from langchain_core.messages import HumanMessage
+
+import workflow
+from streaming import stream_order_events
+
+
+def test_each_message_is_rendered_once():
+    query = "I want to place an order for item_201, quantity 1, my customer id is customer_103"
+    events = list(stream_order_events(workflow.create_workflow(), {"messages": [HumanMessage(content=query)]}))
+
+    messages = [event for event in events if event["type"] == "message"]
+    assert len(messages) == 1
+    assert messages[0]["node"] == "ProcessOrderResult"
+    assert '"status": "Order Successfully Placed"' in messages[0]["content"]
+    stages = [event["stage"] for event in events if event["type"] == "stage"]
+    assert {"Customer", "Inventory", "Shipping", "Payment", "Result"} <= set(stages)
@@ -0,0 +1,36 @@
+from langchain_core.messages import HumanMessage
+
+import tools
+import workflow
+from inventory_engine import get_inventory_engine
+from order_index import STATUS_PENDING
+from state_manager import state_manager
+
+CUSTOMER = "customer_103"
+ITEM = "item_201"
+
+
+def run(agent, text):
+    return agent.invoke({"messages": [HumanMessage(content=text)]})
+
+
+def test_cancel_sentence_does_not_place_an_order():
+    agent = workflow.create_workflow()
+    available = get_inventory_engine().available(ITEM)
+    run(agent, f"I want to cancel my order for {ITEM}, quantity 2, my customer id is {CUSTOMER}")
+    assert get_inventory_engine().available(ITEM) == available
+
+
+def test_failed_order_is_not_the_last_order():
+    agent = workflow.create_workflow()
+    placed = run(agent, f"I want to place an order for {ITEM}, quantity 1, my customer id is {CUSTOMER}")
+    assert not placed.get("error")
+    placed_id = placed["order_state"].get("order_id")
+
+    failed = run(agent, f"I want to place an order for {ITEM}, quantity 500000, my customer id is {CUSTOMER}")
+    assert failed.get("error")
+
+    assert state_manager.last_order(CUSTOMER) == placed_id
+    assert state_manager.unit_count(ITEM, STATUS_PENDING) == 0
+    cancelled = tools.cancel_orders(customer_id=CUSTOMER, status=STATUS_PENDING)
+    assert cancelled["order_ids"] == []
@@ -1,56 +1,139 @@
-from langchain_core.tools import tool
-from config import llm
-from langchain.prompts import ChatPromptTemplate
+from threading import Lock
+from typing import Dict, Any, Optional
+from langchain_core.tools import StructuredTool
 from state_manager import state_manager
+from order_index import STATUS_FAILED, STATUS_PENDING, STATUS_SUCCESS
+from llm_cache import extraction_cache
+from inventory_engine import get_inventory_engine
+from order_parser import parse_order_id
+from prompts import CANCEL_PROMPT
+from extraction import CancelExtraction, ExtractionError, aextract, extract, get_cancel_extractor
 
+# Cached extractions are keyed by the prompt version
+CANCEL_PROMPT_VERSION = CANCEL_PROMPT.version
 
-@tool
-def cancel_order(query: str) -> dict:
+# LLM round-trips in the tool loop: the tool-calling model, the id extraction and the model's reply
+TOOL_LOOP_LLM_CALLS = 3
+
+
+class CancelStats:
+    """Cancellations by how the order id was resolved, and the LLM calls that saved."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.direct = 0
+        self.via_llm = 0
+        self.llm_calls_avoided = 0
+
+    def record(self, direct: bool, calls_avoided: int = 0) -> None:
+        with self._lock:
+            if direct:
+                self.direct += 1
+            else:
+                self.via_llm += 1
+            self.llm_calls_avoided += calls_avoided
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"direct": self.direct, "via_llm": self.via_llm, "llm_calls_avoided": self.llm_calls_avoided}
+
+
+cancel_stats = CancelStats()
+
+
+def cancel_by_id(data: Dict[str, Any]) -> dict:
+    """Cancel the order named in the extracted data."""
+    order_id = data.get("order_id")
+
+    if not order_id:
+        return {"error": "No order ID found in request"}
+
+    # Check if order exists in state
+    order_state = state_manager.get_state(order_id)
+    if not order_state:
+        return {"error": f"Order {order_id} not found"}
+
+    # Cancel order by clearing its state and returning its units to stock
+    state_manager.clear_state(order_id)
+    get_inventory_engine().release(order_id)
+    return {
+        "status": "success",
+        "message": f"Order {order_id} has been cancelled",
+        "order_id": order_id
+    }
+
+
+def cancel_orders(customer_id: Optional[str] = None, item_id: Optional[str] = None,
+                  status: Optional[str] = None) -> dict:
+    """Cancel every order matching the filters, e.g. all pending orders of one customer."""
+    if customer_id is None and item_id is None and status is None:
+        return {"error": "Bulk cancellation needs a customer_id, item_id or status filter"}
+
+    if status == STATUS_FAILED:
+        return {"error": "Failed orders hold no stock and cannot be cancelled"}
+
+    # Without a status filter, only orders that can still be cancelled are matched
+    order_ids = [
+        order_id
+        for matched_status in ([status] if status is not None else [STATUS_PENDING, STATUS_SUCCESS])
+        for order_id in state_manager.find_orders(customer_id=customer_id, item_id=item_id, status=matched_status)
+    ]
+    cancelled = state_manager.clear_states(order_ids)
+    inventory_engine = get_inventory_engine()
+    for order_id in cancelled:
+        inventory_engine.release(order_id)
+    return {
+        "status": "success",
+        "message": f"{len(cancelled)} orders have been cancelled",
+        "order_ids": cancelled
+    }
+
+
+def _cancel_order(query: str) -> dict:
     """Cancel an order by order ID"""
-    prompt = ChatPromptTemplate.from_template("""
-        Extract the order_id from this text and return ONLY a valid JSON object.
+    try:
+        order_id = parse_order_id(query)
+        if order_id:
+            cancel_stats.record(direct=True, calls_avoided=1)
+            return cancel_by_id({"order_id": order_id})
 
-        Text: {text}
+        data = extraction_cache.get(CANCEL_PROMPT_VERSION, query)
+        if data is None:
+            data = extract(get_cancel_extractor(), CANCEL_PROMPT.messages(text=query), CancelExtraction)
+            extraction_cache.set(CANCEL_PROMPT_VERSION, query, data)
+        cancel_stats.record(direct=False)
+        return cancel_by_id(data)
 
-        Rules:
-        - The order_id should be a string
-        - If you see a number or UUID after "order_id" or "order", that's the order_id
-        - Return format must be exactly: {{"order_id": "EXTRACTED_ID"}}
-        - Do not include markdown formatting, backticks, or any other text
-    """)
+    except ExtractionError as e:
+        return {"error": f"Could not read the order id: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Error cancelling order: {str(e)}"}
 
+
+async def _acancel_order(query: str) -> dict:
+    """Cancel an order by order ID"""
     try:
-        # Get LLM response
-        result = llm.invoke(prompt.format(text=query))
-
-        # Clean the response
-        content = result.content.strip()
-        if content.startswith('```'):
-            content = content.split('\n', 1)[1].rsplit('\n', 1)[0]
-        content = content.replace('json', '').strip()
-
-        # Parse JSON
-        import json
-        data = json.loads(content)
-        order_id = data.get("order_id")
-
-        if not order_id:
-            return {"error": "No order ID found in request"}
-
-        # Check if order exists in state
-        order_state = state_manager.get_state(order_id)
-        if not order_state:
-            return {"error": f"Order {order_id} not found"}
-
-        # Cancel order by clearing its state
-        state_manager.clear_state(order_id)
-        return {
-            "status": "success",
-            "message": f"Order {order_id} has been cancelled",
-            "order_id": order_id
-        }
-
-    except json.JSONDecodeError as e:
-        return {"error": f"Invalid JSON format: {str(e)}"}
+        order_id = parse_order_id(query)
+        if order_id:
+            cancel_stats.record(direct=True, calls_avoided=1)
+            return cancel_by_id({"order_id": order_id})
+
+        data = extraction_cache.get(CANCEL_PROMPT_VERSION, query)
+        if data is None:
+            data = await aextract(get_cancel_extractor(), CANCEL_PROMPT.messages(text=query), CancelExtraction)
+            extraction_cache.set(CANCEL_PROMPT_VERSION, query, data)
+        cancel_stats.record(direct=False)
+        return cancel_by_id(data)
+
+    except ExtractionError as e:
+        return {"error": f"Could not read the order id: {str(e)}"}
     except Exception as e:
-        return {"error": f"Error cancelling order: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error cancelling order: {str(e)}"}
+
+
+# Expose both paths so ToolNode awaits the LLM call when the graph runs async
+cancel_order = StructuredTool.from_function(
+    func=_cancel_order,
+    coroutine=_acancel_order,
+    name="cancel_order",
+    description="Cancel an order by order ID"
+)
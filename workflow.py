@@ -1,28 +1,40 @@
 # Replace entire workflow.py
+from functools import lru_cache
 from typing import List
 from langchain_core.messages import BaseMessage
 from nodes import (
-    categorize_query, check_inventory, compute_shipping,
-    process_payment, call_model_2, call_tools_2, route_query_1,
-    process_order_result
+    categorize_query, validate_customer, check_inventory, compute_shipping,
+    process_payment, call_model_2, call_tools_2, fan_out_order,
+    process_order_result, acategorize_query, acall_model_2, direct_cancel, ORDER_CHECK_STAGES
 )
 from tools import cancel_order
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 from state import MessagesState
+from metrics import instrument_node
 from logger_config import logger
 
 
-def create_workflow():
+def create_workflow(async_mode: bool = False):
+    """Build and compile the order graph.
+
+    With async_mode the LLM-bound nodes are coroutines, so the compiled graph
+    should be driven with ainvoke/astream.
+    """
     # Create workflow with proper state definition
     workflow = StateGraph(MessagesState)
 
+    def add_node(name, node):
+        # Every function node records its latency and errors
+        workflow.add_node(name, instrument_node(name, node))
+
     # Add nodes that maintain state
-    workflow.add_node("RouteQuery", categorize_query)
-    workflow.add_node("CheckInventory", check_inventory)
-    workflow.add_node("ComputeShipping", compute_shipping)
-    workflow.add_node("ProcessPayment", process_payment)
-    workflow.add_node("ProcessOrderResult", process_order_result)
+    add_node("RouteQuery", acategorize_query if async_mode else categorize_query)
+    add_node("ValidateCustomer", validate_customer)
+    add_node("CheckInventory", check_inventory)
+    add_node("ComputeShipping", compute_shipping)
+    add_node("ProcessPayment", process_payment)
+    add_node("ProcessOrderResult", process_order_result)
 
     # Add tool nodes
     tools_2 = [cancel_order]
@@ -31,25 +43,22 @@ def create_workflow():
     # Define edges with state propagation
     workflow.add_edge(START, "RouteQuery")
 
-    # Add conditional edges that pass state
+    # A new order fans out to the independent check stages in one step
     workflow.add_conditional_edges(
         "RouteQuery",
-        route_query_1,
-        {
-            "PlaceOrder": "CheckInventory",
-            "CancelOrder": "CancelOrder",
-            "ProcessOrderResult": "ProcessOrderResult"
-        }
+        fan_out_order,
+        [*ORDER_CHECK_STAGES, "DirectCancel", "CancelOrder", "ProcessOrderResult"]
     )
 
-    # Sequential edges
-    workflow.add_edge("CheckInventory", "ComputeShipping")
-    workflow.add_edge("ComputeShipping", "ProcessPayment")
+    # Payment waits for every check stage; their partial order_state updates are merged by the state reducer
+    workflow.add_edge(list(ORDER_CHECK_STAGES), "ProcessPayment")
     workflow.add_edge("ProcessPayment", "ProcessOrderResult")
     workflow.add_edge("ProcessOrderResult", END)
 
-    # Cancel order flow
-    workflow.add_node("CancelOrder", call_model_2)
+    # Cancel order flow: straight to the store when the order id is known, else the LLM tool loop
+    add_node("DirectCancel", direct_cancel)
+    workflow.add_edge("DirectCancel", END)
+    add_node("CancelOrder", acall_model_2 if async_mode else call_model_2)
     workflow.add_node("tools_2", tool_node_2)
 
     workflow.add_conditional_edges(
@@ -63,4 +72,24 @@ def create_workflow():
     workflow.add_edge("tools_2", "CancelOrder")
 
     logger.info("Workflow created with proper state management")
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile()
+
+
+@lru_cache(maxsize=None)
+def get_workflow(async_mode: bool = False):
+    """Compiled graph, built once per mode and shared by every caller."""
+    return create_workflow(async_mode)
+
+
+def warm_up(async_mode: bool = False) -> None:
+    """Build everything the first order would otherwise pay for: graph, catalog, inventory and LLM client."""
+    from catalog import get_catalog
+    from config import get_llm
+    from inventory_engine import get_inventory_engine
+    from nodes import get_llm_with_tools_2
+
+    get_workflow(async_mode)
+    get_catalog()
+    get_inventory_engine()
+    get_llm()
+    get_llm_with_tools_2()